@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, EmailStr
 from app.db import db
-from app.security import create_token, current_user
+from app.security import create_token, current_user, invalidate_user
 from app.plans import ensure_free_on_register, subscription_summary
 from app.config import settings
 import httpx
@@ -76,6 +76,7 @@ async def google(body: GoogleBody):
     # update name on first Google login if missing
     if not user.get("name") and name:
         await db.users.update_one({"_id": user["_id"]}, {"$set": {"name": name}})
+        invalidate_user(uid)
     return {"token": create_token(uid), "user": {"id": uid, "name": user.get("name") or name, "email": email},"subscription": await subscription_summary(uid)}
 
 # ---------- Me ----------
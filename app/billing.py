@@ -4,12 +4,13 @@ from fastapi import APIRouter, Depends, HTTPException, Header, Request, Form
 from pydantic import BaseModel
 from bson import ObjectId
 from fastapi.responses import RedirectResponse, JSONResponse
-import razorpay
 from urllib.parse import quote
 
 from app.config import settings
 from app.security import current_user
 from app.db import db
+from app.gateway import GatewayError, get_gateway
+from app.inbox import WebhookInbox
 from app.plans import PLANS, PlanId, activate_subscription,subscription_summary
 
 router = APIRouter()
@@ -47,17 +48,19 @@ async def create_order(body: CreateOrderBody, user=Depends(current_user)):
     if not settings.razorpay_key_id or not settings.razorpay_key_secret:
         raise HTTPException(500, "Razorpay keys not configured")
 
-    client = razorpay.Client(auth=(settings.razorpay_key_id, settings.razorpay_key_secret))
     amount_paise = int(plan["price_inr"] * 100)
 
     # Tie order to user via receipt (userId|planId|ts)
     receipt = f"{user['id']}|{plan['id']}|{int(datetime.utcnow().timestamp())}"
-    order = client.order.create({
-        "amount": amount_paise,
-        "currency": "INR",
-        "receipt": receipt,
-        "payment_capture": 1
-    })
+    try:
+        order = await get_gateway().create_order({
+            "amount": amount_paise,
+            "currency": "INR",
+            "receipt": receipt,
+            "payment_capture": 1
+        })
+    except GatewayError:
+        raise HTTPException(502, "Payment gateway unavailable, please retry")
 
     # Store order mapping (include receipt for later use)
     await db.orders.insert_one({
@@ -122,8 +125,7 @@ async def verify_payment(
 
     if not user_id or not plan_id:
         try:
-            client = razorpay.Client(auth=(settings.razorpay_key_id, settings.razorpay_key_secret))
-            rzp_order = client.order.fetch(razorpay_order_id)
+            rzp_order = await get_gateway().fetch_order(razorpay_order_id)
             receipt = rzp_order.get("receipt", "")
             if receipt and "|" in receipt:
                 parts = receipt.split("|")
@@ -158,10 +160,14 @@ async def verify_payment(
     # return {"ok": True, "planId": plan_id}
 
 # ---------------------------
-# (Optional) Webhook (kept, with small fix)
+# Webhook: verify, persist to the inbox, ack. Processing happens in the
+# background workers (app/inbox.py), which call process_webhook_event.
 # ---------------------------
+WEBHOOK_EVENTS = {"payment.captured", "order.paid"}
+
 @router.post("/webhook")
-async def razorpay_webhook(request: Request, x_razorpay_signature: str = Header(None)):
+async def razorpay_webhook(request: Request, x_razorpay_signature: str = Header(None),
+                           x_razorpay_event_id: str = Header(None)):
     if not settings.razorpay_webhook_secret:
         raise HTTPException(500, "Webhook secret not configured")
 
@@ -174,9 +180,21 @@ async def razorpay_webhook(request: Request, x_razorpay_signature: str = Header(
 
     payload = await request.json()
     event = payload.get("event")
-    if event not in {"payment.captured", "order.paid"}:
+    if event not in WEBHOOK_EVENTS:
         return {"ok": True}
 
+    # Dedupe on the gateway's event id; otherwise on the payment (or order) id,
+    # so gateway retries and payment.captured + order.paid pairs collapse.
+    payment_entity = payload.get("payload", {}).get("payment", {}).get("entity", {}) or {}
+    order_entity   = payload.get("payload", {}).get("order",   {}).get("entity", {}) or {}
+    key = payment_entity.get("id") or payment_entity.get("order_id") or order_entity.get("id")
+    event_id = f"pay:{key}" if key else (x_razorpay_event_id or hashlib.sha256(raw).hexdigest())
+
+    await webhook_inbox.put(event_id, event, payload)
+    return {"ok": True}
+
+async def process_webhook_event(payload: dict) -> str:
+    """Idempotent handler for one inbox event. Returns an outcome label; raises to retry."""
     payment_entity = payload.get("payload", {}).get("payment", {}).get("entity", {}) or {}
     order_entity   = payload.get("payload", {}).get("order",   {}).get("entity", {}) or {}
 
@@ -186,25 +204,22 @@ async def razorpay_webhook(request: Request, x_razorpay_signature: str = Header(
     currency   = payment_entity.get("currency") or order_entity.get("currency") or "INR"
 
     if not order_id:
-        return {"ok": True}
+        return "no_order"
 
     existing = await db.orders.find_one({"order_id": order_id})
     if existing and existing.get("status") == "paid":
-        return {"ok": True}
+        return "already_paid"
 
     user_id = None
     plan_id = None
     receipt = existing.get("receipt") if existing else None
 
     if not receipt:
-        try:
-            client = razorpay.Client(auth=(settings.razorpay_key_id, settings.razorpay_key_secret))
-            rzp_order = client.order.fetch(order_id)
-            receipt   = rzp_order.get("receipt")
-            amount    = amount or rzp_order.get("amount")
-            currency  = currency or rzp_order.get("currency", "INR")
-        except Exception:
-            return {"ok": True}
+        # GatewayError propagates: the inbox retries with backoff
+        rzp_order = await get_gateway().fetch_order(order_id)
+        receipt   = rzp_order.get("receipt")
+        amount    = amount or rzp_order.get("amount")
+        currency  = currency or rzp_order.get("currency", "INR")
 
     if receipt and "|" in receipt:
         parts = receipt.split("|")
@@ -213,11 +228,11 @@ async def razorpay_webhook(request: Request, x_razorpay_signature: str = Header(
             plan_id = existing.get("planId") if (existing and existing.get("planId")) else parts[1]
 
     if not user_id or not plan_id:
-        return {"ok": True}
+        return "unresolved"
 
     plan = PLANS.get(plan_id)
     if not plan:
-        return {"ok": True}
+        return "unknown_plan"
 
     expected = int(plan["price_inr"] * 100)
     if expected > 0 and isinstance(amount, int) and currency == "INR":
@@ -232,7 +247,7 @@ async def razorpay_webhook(request: Request, x_razorpay_signature: str = Header(
                 }},
                 upsert=True,
             )
-            return {"ok": True}
+            return "mismatch"
 
     await activate_subscription(user_id, plan_id)
 
@@ -253,4 +268,11 @@ async def razorpay_webhook(request: Request, x_razorpay_signature: str = Header(
         upsert=True
     )
 
-    return {"ok": True}
+    return "activated"
+
+webhook_inbox = WebhookInbox(
+    process_webhook_event,
+    workers=settings.webhook_workers,
+    max_attempts=settings.webhook_max_attempts,
+    lease_s=settings.webhook_lease_s,
+)
@@ -12,15 +12,83 @@ class Settings(BaseModel):
     jwt_expire_min: int = int(os.getenv("JWT_EXPIRE_MIN", "43200"))  # 30 days
     google_audience: str | None = os.getenv("GOOGLE_AUDIENCE")
     dev_passwordless: bool = os.getenv("DEV_PASSWORDLESS", "true").lower() == "true"
+    user_cache_ttl_s: int = int(os.getenv("USER_CACHE_TTL_S", "60"))  # 0 disables the principal cache
+    user_cache_max_entries: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+    sub_cache_ttl_s: int = int(os.getenv("SUB_CACHE_TTL_S", "30"))  # 0 disables; also capped by validTill
+    sub_cache_max_entries: int = int(os.getenv("SUB_CACHE_MAX_ENTRIES", "10000"))
+    sub_changes_poll_s: float = float(os.getenv("SUB_CHANGES_POLL_S", "1"))  # cross-worker invalidation; 0 disables
+    usage_cache_ttl_s: int = int(os.getenv("USAGE_CACHE_TTL_S", "10"))  # display only; quota checks bypass it
+    usage_cache_max_entries: int = int(os.getenv("USAGE_CACHE_MAX_ENTRIES", "10000"))
+
+    # 🚦 Per-user rate limit on expensive routes (limits per plan live in PLANS)
+    rate_limit_enabled: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    rate_limit_backend: str = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory | mongo (shared by workers)
+    rate_limit_max_keys: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
 
     # 🤖 LLM
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
     openai_model: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # in-flight LLM calls per worker
+    llm_timeout_s: float = float(os.getenv("LLM_TIMEOUT_S", "12"))  # guard against long hangs
+    llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "1"))
+    # Import engines, open the LLM connection and fill the Mongo pool before serving
+    warmup_on_start: bool = os.getenv("WARMUP_ON_START", "false").lower() == "true"
+    mongo_min_pool_size: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+
+    # 🧊 Enrichment cache (climate is bucketed into bands before keying)
+    enrich_cache_max_entries: int = int(os.getenv("ENRICH_CACHE_MAX_ENTRIES", "4096"))
+    enrich_cache_ttl_s: int = int(os.getenv("ENRICH_CACHE_TTL_S", "3600"))
+    enrich_cache_shared_ttl_s: int = int(os.getenv("ENRICH_CACHE_SHARED_TTL_S", "86400"))
+    enrich_stale_ttl_s: int = int(os.getenv("ENRICH_STALE_TTL_S", "604800"))  # served when the latency budget runs out
+    enrich_coalesce: bool = os.getenv("ENRICH_COALESCE", "true").lower() == "true"  # one LLM call per in-flight key
+    enrich_band_temp_c: float = float(os.getenv("ENRICH_BAND_TEMP_C", "3"))
+    enrich_band_humidity: float = float(os.getenv("ENRICH_BAND_HUMIDITY", "15"))
+    enrich_band_rain_mm: float = float(os.getenv("ENRICH_BAND_RAIN_MM", "25"))
+
+    precomputed_refresh_s: int = int(os.getenv("PRECOMPUTED_REFRESH_S", "600"))  # reload interval for the offline grid
+
+    # 🌾 Crop catalog: JSON/JSONL of CROPS-shaped entries, re-read when the file changes ("" = built-in CROPS)
+    crop_catalog_path: str = os.getenv("CROP_CATALOG_PATH", "")
+    catalog_refresh_s: int = int(os.getenv("CATALOG_REFRESH_S", "30"))
+
+    # 🌦️ Gridded monthly climate normals (app.jobs.build_climate_grid); fills Climate from location
+    climate_grid_path: str = os.getenv("CLIMATE_GRID_PATH", "data/climate_normals.npy")
+    climate_interp: str = os.getenv("CLIMATE_INTERP", "bilinear")  # bilinear | nearest
+
+    # 📈 Mandi prices (app.jobs.ingest_market_prices)
+    market_store_path: str = os.getenv("MARKET_STORE_PATH", "data/market_prices.npz")
+    market_refresh_s: int = int(os.getenv("MARKET_REFRESH_S", "600"))
+    market_trend_window: int = int(os.getenv("MARKET_TREND_WINDOW", "6"))  # months per rolling regression
+    market_trend_pct: float = float(os.getenv("MARKET_TREND_PCT", "1.5"))  # %/month slope for rising/falling
+
+    # 🗜️ History rows reference deduplicated enrichment payloads by content hash
+    enrichment_cache_max_entries: int = int(os.getenv("ENRICHMENT_CACHE_MAX_ENTRIES", "4096"))
+    enrichment_cache_ttl_s: int = int(os.getenv("ENRICHMENT_CACHE_TTL_S", "3600"))
+
+    # 🧊 History retention: hot in Mongo, then compressed archive files, then gone (0 = keep)
+    history_hot_days: int = int(os.getenv("HISTORY_HOT_DAYS", "180"))
+    history_archive_days: int = int(os.getenv("HISTORY_ARCHIVE_DAYS", "0"))
+    history_archive_dir: str = os.getenv("HISTORY_ARCHIVE_DIR", "data/history_archive")
+    history_archive_batch: int = int(os.getenv("HISTORY_ARCHIVE_BATCH", "1000"))
+    history_archive_interval_s: int = int(os.getenv("HISTORY_ARCHIVE_INTERVAL_S", "0"))  # 0: run the job from cron
+
+    # ✍️ Write-behind queue for histories / usage adjustments
+    writeback_queue_max: int = int(os.getenv("WRITEBACK_QUEUE_MAX", "10000"))
+    writeback_batch_max: int = int(os.getenv("WRITEBACK_BATCH_MAX", "200"))
+    writeback_flush_ms: int = int(os.getenv("WRITEBACK_FLUSH_MS", "50"))
+    writeback_max_retries: int = int(os.getenv("WRITEBACK_MAX_RETRIES", "5"))
 
     # Razorpay Links
     razorpay_key_id: str = os.getenv("RAZORPAY_KEY_ID", "")
     razorpay_key_secret: str = os.getenv("RAZORPAY_KEY_SECRET", "")
     razorpay_webhook_secret: str = os.getenv("RAZORPAY_WEBHOOK_SECRET", "")
+    razorpay_api_base: str = os.getenv("RAZORPAY_API_BASE", "https://api.razorpay.com/v1")  # point at a stub in tests
+    gateway_timeout_s: float = float(os.getenv("GATEWAY_TIMEOUT_S", "10"))
+    gateway_max_retries: int = int(os.getenv("GATEWAY_MAX_RETRIES", "2"))
+    gateway_max_connections: int = int(os.getenv("GATEWAY_MAX_CONNECTIONS", "20"))
+    webhook_workers: int = int(os.getenv("WEBHOOK_WORKERS", "4"))
+    webhook_max_attempts: int = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))  # then dead-lettered
+    webhook_lease_s: int = int(os.getenv("WEBHOOK_LEASE_S", "60"))
 
     frontend_base_url: str = os.getenv("FRONTEND_BASE_URL", "http://localhost:5173")
 
@@ -1,8 +1,10 @@
 # app/db.py
-from typing import Optional
+import asyncio, logging
+from typing import Any, Awaitable, Callable, Optional, Sequence
 from fastapi import FastAPI
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.config import settings
+from app.metrics import MongoCommandTimer
 
 class DB:
     client: Optional[AsyncIOMotorClient] = None
@@ -12,52 +14,125 @@ class DB:
     subscriptions = None
     orders = None
     usage = None
+    enrich_cache = None
+    precomputed = None
+    webhook_inbox = None
+    rate_limits = None
+    market_prices = None
+    enrichments = None
+    history_archive = None
 
 db = DB()
 
+log = logging.getLogger(__name__)
+
 async def ensure_indexes():
     # unique email index for users collection
     await db.users.create_index("email", unique=True, name="uniq_email")
-    await db.histories.create_index([("userId", 1), ("createdAt", -1)], name="user_created_idx")
+    # (createdAt, _id) is the keyset for history pagination; supersedes the old user_created_idx
+    await db.histories.create_index([("userId", 1), ("createdAt", -1), ("_id", -1)], name="user_created_id_idx")
     await db.subscriptions.create_index("userId", unique=True, name="uniq_sub_user")
+    await db.subscriptions.create_index("updatedAt", name="updated_idx")  # plans.poll_subscription_changes
     await db.orders.create_index("order_id", unique=True, name="uniq_order_id")
     await db.usage.create_index([("userId", 1), ("monthKey", 1)], unique=True, name="uniq_usage_month")
+    await db.enrich_cache.create_index("expiresAt", expireAfterSeconds=0, name="ttl_expires")
+    await db.webhook_inbox.create_index([("status", 1), ("nextAttemptAt", 1)], name="status_next_idx")
+    await db.rate_limits.create_index("expiresAt", expireAfterSeconds=0, name="ttl_expires")
+    await db.history_archive.create_index("month", name="month_idx")  # bucket expiry
+
+async def connect():
+    """Open the client and bind collections; shared by the app and CLI jobs."""
+    if not settings.mongodb_uri:
+        raise RuntimeError("MONGODB_URI is not set. Add it to .env")
+
+    client = AsyncIOMotorClient(
+        settings.mongodb_uri,
+        serverSelectionTimeoutMS=8000,
+        minPoolSize=settings.mongo_min_pool_size,
+        event_listeners=[MongoCommandTimer()],
+        uuidRepresentation="standard",
+    )
+    db.client = client
+
+    # If DB name present in URI it’s used; otherwise fall back explicitly
+    database = client.get_default_database()
+    if database is None:  # <- explicit None check (no bool test)
+        database = client["ideal_crop_suggester"]
+
+    db.database = database
+    db.users = database["users"]
+    db.histories = database["histories"]
+    db.subscriptions = database["subscriptions"]
+    db.orders = database["orders"]
+    db.usage = database["usage_counters"]
+    db.enrich_cache = database["enrich_cache"]
+    db.precomputed = database["precomputed"]
+    db.webhook_inbox = database["webhook_inbox"]
+    db.rate_limits = database["rate_limits"]
+    db.market_prices = database["market_prices"]
+    db.enrichments = database["enrichments"]
+    db.history_archive = database["history_archive"]
+
+    # Ping to ensure connectivity (raises if Atlas not reachable/allowed)
+    await client.admin.command("ping")
+
+def close():
+    if db.client is not None:
+        db.client.close()
+        db.client = None
+        db.database = None
+        db.users = None
 
-def setup_mongo(app: FastAPI):
+def setup_mongo(app: FastAPI, services: Sequence = ()):
+    """`services` are background workers that need the DB (start()/async stop());
+    they start after connect and stop, in reverse order, before the client closes."""
     @app.on_event("startup")
     async def _startup():
-        if not settings.mongodb_uri:
-            raise RuntimeError("MONGODB_URI is not set. Add it to .env")
-
-        client = AsyncIOMotorClient(
-            settings.mongodb_uri,
-            serverSelectionTimeoutMS=8000,
-            uuidRepresentation="standard",
-        )
-        db.client = client
-
-        # If DB name present in URI it’s used; otherwise fall back explicitly
-        database = client.get_default_database()
-        if database is None:  # <- explicit None check (no bool test)
-            database = client["ideal_crop_suggester"]
-
-        db.database = database
-        db.users = database["users"]
-        db.histories = database["histories"]
-        db.subscriptions = database["subscriptions"]
-        db.orders = database["orders"]
-        db.usage = database["usage_counters"]
-
-        # Ping to ensure connectivity (raises if Atlas not reachable/allowed)
-        await client.admin.command("ping")
+        await connect()
 
         # Ensure indexes AFTER collections are set
         await ensure_indexes()
 
+        for svc in services:
+            svc.start()
+
     @app.on_event("shutdown")
     async def _shutdown():
-        if db.client is not None:
-            db.client.close()
-            db.client = None
-            db.database = None
-            db.users = None
+        # e.g. drain queued history/usage writes before the client goes away
+        for svc in reversed(services):
+            await svc.stop()
+        close()
+
+class PeriodicService:
+    """Calls `run` every `interval_s()` seconds in a background task; a setup_mongo
+    service. `enabled()` is checked at start. A failed run is logged and retried
+    on the next tick. Both are callables so settings changed at runtime apply."""
+
+    def __init__(self, name: str, run: Callable[[], Awaitable[Any]], interval_s: Callable[[], float],
+                 enabled: Callable[[], bool] = lambda: True):
+        self.name = name
+        self._fn = run
+        self._interval_s = interval_s
+        self._enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None and self._enabled():
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._fn()
+            except Exception:
+                log.exception("%s failed; retrying in %ss", self.name, self._interval_s())
+            await asyncio.sleep(self._interval_s())
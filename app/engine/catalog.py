@@ -0,0 +1,280 @@
+import asyncio, hashlib, json, logging, os
+from typing import Any, Dict, List, Optional, Sequence, Tuple, get_args
+import numpy as np
+from app.config import settings
+from app.db import PeriodicService
+from app.schema import Season, Soil
+from app.engine.crops import CROPS
+
+# The crop catalog the scorer ranks: CROPS by default, or the JSON/JSONL file at
+# CROP_CATALOG_PATH (same entry shape, any number of crops and varieties).
+# Entries are compiled into crop-indexed arrays plus inverted indexes of the
+# crops that list each soil / season; anything unlisted sits at DEFAULT_FIT, so
+# a request only scores the crops its soil or season can lift above that (see
+# Catalog.score for when the rest are rescored). `current()` is swapped whole
+# on reload, so a request sees one catalog from start to finish.
+
+log = logging.getLogger(__name__)
+
+SOILS: Tuple[str, ...] = get_args(Soil)
+SEASONS: Tuple[str, ...] = get_args(Season)
+CLIMATE_FIELDS: Tuple[str, ...] = ("tempC", "humidity", "rain_mm")
+DEFAULT_FIT = 0.35
+
+_SOIL_IDX = {s: i for i, s in enumerate(SOILS)}
+_SEASON_IDX = {s: i for i, s in enumerate(SEASONS)}
+_PARTITION_MIN = 256
+_PY_SCORE_MAX = 100   # up to here a plain loop scores one request faster than numpy
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k best scores, best first, ties by position (candidate
+    arrays are in catalog order, so this matches a stable full sort). Large arrays
+    are cut with argpartition first; below _PARTITION_MIN a plain sort is faster."""
+    if len(scores) < _PARTITION_MIN:
+        return np.argsort(-scores, kind="stable")[:k]
+    kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+    keep = np.flatnonzero(scores >= kth)   # every tie at the cut, so position decides
+    return keep[np.argsort(-scores[keep], kind="stable")][:k]
+
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _check_item_fields(c: Dict[str, Any]) -> None:
+    """The fields scorer.to_items copies into a CropItem; a bad one would only
+    surface as a failed request once the crop ranks."""
+    if not isinstance(c["crop"], str) or not c["crop"]:
+        raise ValueError("crop must be a non-empty string")
+    if not isinstance(c["duration"], int) or isinstance(c["duration"], bool):
+        raise ValueError("duration must be an integer number of days")
+    y = c["yield"]
+    if not (isinstance(y, (list, tuple)) and len(y) == 2 and all(map(_is_number, y))):
+        raise ValueError("yield must be a [low, high] pair of numbers")
+
+
+class Catalog:
+    def __init__(self, entries: Sequence[Dict[str, Any]], source: str = "builtin"):
+        self.entries = list(entries)
+        self.source = source
+        self.version = hashlib.sha1(json.dumps(self.entries, sort_keys=True).encode()).hexdigest()[:12]
+
+        n = len(self.entries)
+        self.soil_fit = np.full((n, len(SOILS) + 1), DEFAULT_FIT)  # last column: unknown soil
+        self.season_fit = np.full((n, len(SEASONS) + 1), DEFAULT_FIT)
+        self.lo = np.full((len(CLIMATE_FIELDS), n), -np.inf)
+        self.hi = np.full((len(CLIMATE_FIELDS), n), np.inf)
+        self.bonus = np.zeros((len(CLIMATE_FIELDS), n))
+        self.penalty = np.zeros((len(CLIMATE_FIELDS), n))
+        by_soil: List[List[int]] = [[] for _ in range(len(SOILS) + 1)]
+        by_season: List[List[int]] = [[] for _ in range(len(SEASONS) + 1)]
+        for i, c in enumerate(self.entries):
+            try:
+                _check_item_fields(c)
+                for s, v in c["soils"].items():
+                    self.soil_fit[i, _SOIL_IDX[s]] = v
+                    by_soil[_SOIL_IDX[s]].append(i)
+                for s, v in c["seasons"].items():
+                    self.season_fit[i, _SEASON_IDX[s]] = v
+                    by_season[_SEASON_IDX[s]].append(i)
+                for f, rule in (c.get("climate") or {}).items():
+                    k = CLIMATE_FIELDS.index(f)
+                    r0, r1 = rule["range"]
+                    self.lo[k, i] = -np.inf if r0 is None else r0
+                    self.hi[k, i] = np.inf if r1 is None else r1
+                    self.bonus[k, i] = rule["bonus"]
+                    self.penalty[k, i] = rule["penalty"]
+            except (KeyError, ValueError, TypeError) as e:
+                raise ValueError(f"bad catalog entry {c.get('crop')!r}: {e!r}") from None
+        self.names = [c["crop"] for c in self.entries]
+        self.by_name = dict(zip(self.names, self.entries))
+        if len(self.by_name) != len(self.entries):
+            raise ValueError("duplicate crop names in catalog")
+        self.by_soil = [np.array(ix, np.intp) for ix in by_soil]
+        self.by_season = [np.array(ix, np.intp) for ix in by_season]
+        # climate rules are sparse: per field, only the crops that have one
+        self.rules = []
+        for k in range(len(CLIMATE_FIELDS)):
+            ix = np.flatnonzero((self.bonus[k] != 0) | (self.penalty[k] != 0))
+            self.rules.append((ix, self.lo[k, ix], self.hi[k, ix], self.bonus[k, ix], self.penalty[k, ix]))
+        # the same rules as plain tuples for small catalogs, where a Python loop
+        # beats numpy's per-call overhead (see _score_small)
+        self._rule_list = [(k, i, lo, hi, b, p) for k, (ix, *cols) in enumerate(self.rules)
+                           for i, lo, hi, b, p in zip(ix.tolist(), *(c.tolist() for c in cols))]
+        self._base_lists: Dict[Tuple[int, int], List[float]] = {}
+        # the most any crop gains from climate rules; bounds what an unlisted crop can reach
+        self.max_gain = float(np.maximum(np.maximum(self.bonus, self.penalty), 0).sum(axis=0).max(initial=0))
+        self._all = np.arange(n)
+        # (si, ei) -> (crops listing that soil or season, their base scores, base scores of every crop)
+        self._base: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._climate_free: Dict[Tuple[int, int, Optional[int]], List[Tuple[dict, float]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _bases(self, si: int, ei: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        b = self._base.get((si, ei))
+        if b is None:
+            full = 0.5 * (self.soil_fit[:, si] + self.season_fit[:, ei])
+            cand = np.union1d(self.by_soil[si], self.by_season[ei]).astype(np.intp)
+            b = self._base[(si, ei)] = (cand, full[cand], full)
+        return b
+
+    def candidates(self, si: int, ei: int) -> np.ndarray:
+        """Crops listing this soil or season, in catalog order."""
+        return self._bases(si, ei)[0]
+
+    def _climate_adj(self, x: List[Optional[float]]) -> np.ndarray:
+        """Per-crop climate bonus/penalty sum for one request (0 for crops without rules)."""
+        adj = np.zeros(len(self))
+        for (ix, lo, hi, bonus, penalty), v in zip(self.rules, x):
+            if v is not None and len(ix):
+                adj[ix] += np.where((lo <= v) & (v <= hi), bonus, penalty)
+        return adj
+
+    def _score_small(self, si: int, ei: int, x: List[Optional[float]], k: int) -> List[Tuple[dict, float]]:
+        """score() with climate up to _PY_SCORE_MAX crops: same float operations, in the
+        same order, as the array path (adjustments summed per crop, then added)."""
+        base = self._base_lists.get((si, ei))
+        if base is None:
+            base = self._base_lists[(si, ei)] = self._bases(si, ei)[2].tolist()
+        adj = [0.0] * len(base)
+        for f, i, lo, hi, bonus, penalty in self._rule_list:
+            v = x[f]
+            if v is not None:
+                adj[i] += bonus if lo <= v <= hi else penalty
+        s = [0.0 if v < 0.0 else 1.0 if v > 1.0 else v for v in map(float.__add__, base, adj)]
+        top = sorted(range(len(s)), key=s.__getitem__, reverse=True)[:k]   # stable: ties in catalog order
+        return [(self.entries[i], s[i]) for i in top]
+
+    def score(self, soil: str, season: str, climate: Dict | None = None,
+              k: Optional[int] = None) -> List[Tuple[dict, float]]:
+        """(entry, fit) for the k best crops (all when k is None), best first, ties in catalog order."""
+        si = _SOIL_IDX.get(soil, len(SOILS))
+        ei = _SEASON_IDX.get(season, len(SEASONS))
+        x = [climate.get(f) for f in CLIMATE_FIELDS] if climate else None
+        if x is not None and all(v is None for v in x):
+            x = None
+        if x is None and (si, ei, k) in self._climate_free:
+            return self._climate_free[(si, ei, k)]
+
+        n = len(self)
+        k_ = n if k is None else min(k, n)
+        if x is not None and n <= _PY_SCORE_MAX:
+            return self._score_small(si, ei, x, k_)
+        cand, cand_base, full_base = self._bases(si, ei)
+        adj = self._climate_adj(x) if x is not None else None
+        top = None
+        if k_ < len(cand) < n and n >= _PARTITION_MIN:   # small catalogs: scoring everything is cheaper
+            idx = cand
+            s = np.clip(cand_base + adj[cand] if adj is not None else cand_base, 0.0, 1.0)
+            top = _top_k(s, k_)
+            # unlisted crops score DEFAULT_FIT plus at most max_gain; they only need
+            # scoring if the k-th candidate isn't strictly above that
+            if not s[top[-1]] > DEFAULT_FIT + (self.max_gain if adj is not None else 0.0):
+                top = None
+        if top is None:
+            idx = self._all
+            s = np.clip(full_base + adj if adj is not None else full_base, 0.0, 1.0)
+            top = _top_k(s, k_)
+        fits = s[top].tolist()
+        out = [(self.entries[i], fit) for i, fit in zip(idx[top].tolist(), fits)]
+        if x is None:
+            self._climate_free[(si, ei, k)] = out
+        return out
+
+    def score_many(self, requests: Sequence[Tuple[str, str, Optional[Dict[str, Any]]]]) -> np.ndarray:
+        """(N, crops) fit matrix for N requests in one array pass, columns in catalog order."""
+        if not len(requests):
+            return np.empty((0, len(self)))
+        soils = np.fromiter((_SOIL_IDX.get(r[0], len(SOILS)) for r in requests), dtype=np.intp, count=len(requests))
+        seasons = np.fromiter((_SEASON_IDX.get(r[1], len(SEASONS)) for r in requests), dtype=np.intp,
+                              count=len(requests))
+        s = 0.5 * (self.soil_fit.T[soils] + self.season_fit.T[seasons])
+
+        x = _climate_matrix([r[2] for r in requests])[:, :, None]  # (N, fields, 1)
+        inside = (x >= self.lo) & (x <= self.hi)
+        adj = np.where(inside, self.bonus, self.penalty)
+        adj = np.where(np.isnan(x), 0.0, adj).sum(axis=1)  # missing values don't trigger rules
+        return np.clip(s + adj, 0.0, 1.0)
+
+
+def _climate_matrix(climates: Sequence[Optional[Dict[str, Any]]]) -> np.ndarray:
+    """(N, fields) float matrix; NaN where a value is missing."""
+    out = np.full((len(climates), len(CLIMATE_FIELDS)), np.nan)
+    for r, cl in enumerate(climates):
+        if cl:
+            for k, f in enumerate(CLIMATE_FIELDS):
+                v = cl.get(f)
+                if v is not None:
+                    out[r, k] = v
+    return out
+
+
+def read_entries(path: str) -> List[Dict[str, Any]]:
+    """A JSON array of CROPS-shaped entries, or one entry per line for .jsonl."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+_current = Catalog(CROPS)
+_mtime: Optional[float] = None
+
+def current() -> Catalog:
+    return _current
+
+_MISSING = -1.0   # _mtime of a path that didn't exist
+_error: Optional[str] = None
+
+def reload(path: str | None = None) -> bool:
+    """Load CROP_CATALOG_PATH if it changed since the last load and swap it in.
+    A file that is missing or fails to parse or validate raises and leaves the
+    running catalog in place; it isn't retried until its mtime changes."""
+    global _current, _mtime, _error
+    path = path if path is not None else settings.crop_catalog_path
+    if not path:
+        return False
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = _MISSING
+    if mtime == _mtime:
+        return False
+    _mtime = mtime
+    try:
+        if mtime == _MISSING:
+            raise FileNotFoundError(f"crop catalog {path} not found")
+        new = Catalog(read_entries(path), source=path)
+    except Exception as e:
+        _error = f"{path}: {e!r}"
+        raise
+    _current, _error = new, None   # one reference swap; in-flight requests keep the old object
+    log.info("crop catalog %s: %d crops, version %s", path, len(new), new.version)
+    return True
+
+def reload_safely() -> bool:
+    """reload() for the API workers: a bad file is logged (once per mtime) and the
+    running catalog kept, rather than failing startup or the watcher."""
+    try:
+        return reload()
+    except Exception:
+        log.exception("crop catalog %s failed to load; keeping version %s (%s)",
+                      settings.crop_catalog_path, _current.version, _current.source)
+        return False
+
+def stats() -> Dict[str, Any]:
+    c = _current
+    return {"source": c.source, "crops": len(c), "version": c.version, "load_error": _error,
+            "soil_index": {s: len(ix) for s, ix in zip(SOILS, c.by_soil)},
+            "season_index": {s: len(ix) for s, ix in zip(SEASONS, c.by_season)}}
+
+async def _reload_off_loop() -> None:
+    # parsing a large file is CPU work; keep it off the event loop
+    await asyncio.to_thread(reload_safely)
+
+# re-checks the catalog file every CATALOG_REFRESH_S
+watcher = PeriodicService("catalog-watch", _reload_off_loop, lambda: settings.catalog_refresh_s,
+                          enabled=lambda: bool(settings.crop_catalog_path))
@@ -0,0 +1,162 @@
+import json, math, os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import settings
+from app.engine.scorer import CLIMATE_FIELDS
+
+# Monthly climate normals on a regular lat/lng grid, used to fill in the Climate
+# fields a client didn't send when it sent a location. The array is a plain .npy
+# of shape (lat cells, lng cells, 12 months, CLIMATE_FIELDS), opened memory-mapped
+# so workers share the pages and only touch the cells they read; its extent lives
+# in a JSON sidecar next to it (built by app.jobs.build_climate_grid). A regular
+# grid is its own spatial index: a coordinate maps to its cell arithmetically.
+
+_NAN = float("nan")
+
+
+class ClimateGrid:
+    def __init__(self, values: np.ndarray, lat0: float, lng0: float, step: float,
+                 fields: Sequence[str] = CLIMATE_FIELDS):
+        self.values = values
+        self._arr = np.asarray(values)   # same pages, without np.memmap's per-index overhead
+        self.lat0, self.lng0, self.step = lat0, lng0, step   # centre of cell [0, 0], cell size in degrees
+        self.fields = tuple(fields)
+        self.n_lat, self.n_lng = values.shape[:2]
+        # grid column for each scorer field (NaN column when the dataset lacks it)
+        self._cols = [self.fields.index(f) if f in self.fields else None for f in CLIMATE_FIELDS]
+
+    @classmethod
+    def open(cls, path: str) -> "ClimateGrid":
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        return cls(np.load(path, mmap_mode="r"), meta["lat0"], meta["lng0"], meta["step"], meta["fields"])
+
+    @staticmethod
+    def save(path: str, values: np.ndarray, lat0: float, lng0: float, step: float, fields: Sequence[str]) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.save(path, np.ascontiguousarray(values, dtype=np.float32), allow_pickle=False)
+        with open(path + ".json", "w") as f:
+            json.dump({"lat0": lat0, "lng0": lng0, "step": step, "fields": list(fields),
+                       "shape": list(values.shape)}, f)
+
+    def lookup(self, lat: float, lng: float, month: int, method: str = "bilinear") -> List[float]:
+        """One point in plain Python over a 2x2 slice: a request's lookup shouldn't
+        pay numpy's per-call overhead a dozen times over. Same result as lookup_many."""
+        fi, fj = (lat - self.lat0) / self.step, (lng - self.lng0) / self.step
+        if not (-0.5 <= fi <= self.n_lat - 0.5 and -0.5 <= fj <= self.n_lng - 0.5):
+            return [_NAN] * len(CLIMATE_FIELDS)
+        if method == "nearest" or self.n_lat < 2 or self.n_lng < 2:
+            i = min(max(round(fi), 0), self.n_lat - 1)
+            j = min(max(round(fj), 0), self.n_lng - 1)
+            return self._fields(self._arr[i, j, month - 1].tolist())
+        i0 = min(max(math.floor(fi), 0), self.n_lat - 2)
+        j0 = min(max(math.floor(fj), 0), self.n_lng - 2)
+        ti, tj = min(max(fi - i0, 0.0), 1.0), min(max(fj - j0, 0.0), 1.0)
+        (c00, c01), (c10, c11) = self._arr[i0:i0 + 2, j0:j0 + 2, month - 1].tolist()
+        corners = ((c00, (1 - ti) * (1 - tj)), (c01, (1 - ti) * tj), (c10, ti * (1 - tj)), (c11, ti * tj))
+        out = []
+        for k in range(len(self.fields)):
+            acc = wsum = 0.0
+            for v, w in corners:
+                if v[k] == v[k]:          # skip NaN corners
+                    acc += w * v[k]
+                    wsum += w
+            out.append(acc / wsum if wsum > 0 else _NAN)
+        return self._fields(out)
+
+    def _fields(self, vals: List[float]) -> List[float]:
+        return vals if self.fields == CLIMATE_FIELDS else [_NAN if c is None else vals[c] for c in self._cols]
+
+    def lookup_many(self, lat: np.ndarray, lng: np.ndarray, month: np.ndarray,
+                    method: str = "bilinear") -> np.ndarray:
+        """(N, CLIMATE_FIELDS) normals for N points; NaN outside the grid or where
+        every contributing cell is empty (sea, missing data)."""
+        lat, lng = np.asarray(lat, float), np.asarray(lng, float)
+        m = np.asarray(month, np.intp) - 1
+        fi, fj = (lat - self.lat0) / self.step, (lng - self.lng0) / self.step
+        # cells are centred on the grid points, so the grid reaches half a cell past them
+        inside = (fi >= -0.5) & (fi <= self.n_lat - 0.5) & (fj >= -0.5) & (fj <= self.n_lng - 0.5)
+        out = np.full((len(lat), len(self.fields)), np.nan)
+        if inside.any():
+            fi, fj, m = fi[inside], fj[inside], m[inside]
+            if method == "nearest" or self.n_lat < 2 or self.n_lng < 2:
+                i = np.clip(np.rint(fi), 0, self.n_lat - 1).astype(np.intp)
+                j = np.clip(np.rint(fj), 0, self.n_lng - 1).astype(np.intp)
+                out[inside] = self._arr[i, j, m]
+            else:
+                out[inside] = self._bilinear(fi, fj, m)
+        return out if self.fields == CLIMATE_FIELDS else self._reorder(out)
+
+    def _bilinear(self, fi: np.ndarray, fj: np.ndarray, m: np.ndarray) -> np.ndarray:
+        i0 = np.clip(np.floor(fi), 0, self.n_lat - 2).astype(np.intp)
+        j0 = np.clip(np.floor(fj), 0, self.n_lng - 2).astype(np.intp)
+        ti = np.clip(fi - i0, 0.0, 1.0)[:, None]
+        tj = np.clip(fj - j0, 0.0, 1.0)[:, None]
+        acc = np.zeros((len(fi), len(self.fields)))
+        wsum = np.zeros_like(acc)
+        for di, wi in ((0, 1 - ti), (1, ti)):
+            for dj, wj in ((0, 1 - tj), (1, tj)):
+                v = self._arr[i0 + di, j0 + dj, m]
+                w = np.where(np.isnan(v), 0.0, wi * wj)   # empty corners drop out, the rest are reweighted
+                acc += w * np.nan_to_num(v)
+                wsum += w
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(wsum > 0, acc / wsum, np.nan)
+
+    def _reorder(self, out: np.ndarray) -> np.ndarray:
+        """Dataset columns -> CLIMATE_FIELDS order, NaN for fields it doesn't have."""
+        res = np.full((len(out), len(CLIMATE_FIELDS)), np.nan)
+        for k, c in enumerate(self._cols):
+            if c is not None:
+                res[:, k] = out[:, c]
+        return res
+
+
+_grid: Optional[ClimateGrid] = None
+
+def load(path: str | None = None) -> bool:
+    """Open the grid at CLIMATE_GRID_PATH; without one, requests keep only what clients send."""
+    global _grid
+    path = path or settings.climate_grid_path
+    _grid = ClimateGrid.open(path) if os.path.exists(path) else None
+    return _grid is not None
+
+def _missing(climate: Optional[Dict[str, Any]]) -> bool:
+    return not climate or any(climate.get(f) is None for f in CLIMATE_FIELDS)
+
+def fill_many(rows: Sequence[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, float]], Optional[int]]]
+              ) -> List[Optional[Dict[str, Any]]]:
+    """(climate, location, month) -> climate with the client's values kept and the
+    gaps filled from the grid for that month (June when unset, as in the prompt).
+    All rows needing a lookup resolve in one vectorized pass."""
+    out = [dict(c) if c else None for c, _, _ in rows]
+    if _grid is None:
+        return out
+    todo = [r for r, (c, loc, _) in enumerate(rows) if loc is not None and _missing(c)]
+    if not todo:
+        return out
+    if len(todo) == 1:
+        _, loc, month = rows[todo[0]]
+        normals = [[round(v, 1) for v in _grid.lookup(loc["lat"], loc["lng"], month or 6, settings.climate_interp)]]
+    else:
+        lat = np.fromiter((rows[r][1]["lat"] for r in todo), float, len(todo))
+        lng = np.fromiter((rows[r][1]["lng"] for r in todo), float, len(todo))
+        month = np.fromiter((rows[r][2] or 6 for r in todo), np.intp, len(todo))
+        normals = np.round(_grid.lookup_many(lat, lng, month, settings.climate_interp), 1).tolist()
+    for r, vals in zip(todo, normals):
+        filled = dict(out[r] or {})
+        for f, v in zip(CLIMATE_FIELDS, vals):
+            if filled.get(f) is None and v == v:   # NaN: no data for that cell
+                filled[f] = v
+        out[r] = filled or None
+    return out
+
+def fill(climate: Optional[Dict[str, Any]], location: Optional[Dict[str, float]],
+         month: Optional[int]) -> Optional[Dict[str, Any]]:
+    return fill_many([(climate, location, month)])[0]
+
+def stats() -> Dict[str, Any]:
+    if _grid is None:
+        return {"loaded": False}
+    return {"loaded": True, "shape": list(_grid.values.shape), "fields": list(_grid.fields),
+            "step": _grid.step, "interp": settings.climate_interp}
@@ -0,0 +1,13 @@
+import asyncio
+from typing import Optional
+from app.config import settings
+
+# One semaphore per process caps how many LLM calls are in flight at once,
+# shared by every engine so a burst on one route can't starve the others.
+_llm_sem: Optional[asyncio.Semaphore] = None
+
+def llm_slot() -> asyncio.Semaphore:
+    global _llm_sem
+    if _llm_sem is None:
+        _llm_sem = asyncio.Semaphore(max(1, settings.llm_max_concurrency))
+    return _llm_sem
@@ -1,6 +1,10 @@
+# Optional "climate" rules: when the request carries that field, add "bonus" if the
+# value lies inside the inclusive "range" (None = open end), else add "penalty".
 CROPS = [
-    {"crop":"paddy",    "soils":{"clay":0.95,"loamy":0.75,"silt":0.7}, "seasons":{"kharif":0.95,"rabi":0.35}, "duration":120, "yield":[18,30]},
-    {"crop":"wheat",    "soils":{"loamy":0.9,"sandy":0.65,"clay":0.55}, "seasons":{"rabi":0.95},              "duration":110, "yield":[12,20]},
+    {"crop":"paddy",    "soils":{"clay":0.95,"loamy":0.75,"silt":0.7}, "seasons":{"kharif":0.95,"rabi":0.35}, "duration":120, "yield":[18,30],
+     "climate":{"rain_mm":{"range":[50,None],"bonus":0.05,"penalty":-0.03}}},
+    {"crop":"wheat",    "soils":{"loamy":0.9,"sandy":0.65,"clay":0.55}, "seasons":{"rabi":0.95},              "duration":110, "yield":[12,20],
+     "climate":{"tempC":{"range":[10,25],"bonus":0.04,"penalty":-0.02}}},
     {"crop":"maize",    "soils":{"loamy":0.85,"sandy":0.75,"black":0.7},"seasons":{"kharif":0.8,"rabi":0.6},  "duration":100, "yield":[10,18]},
     {"crop":"soybean",  "soils":{"black":0.95,"loamy":0.75},            "seasons":{"kharif":0.85},            "duration":105, "yield":[8,15]},
     {"crop":"cotton",   "soils":{"black":0.9,"loamy":0.7},              "seasons":{"kharif":0.8},             "duration":150, "yield":[8,14]},
@@ -10,4 +14,3 @@ CROPS = [
     {"crop":"pigeon pea","soils":{"black":0.85,"loamy":0.7},            "seasons":{"kharif":0.8},             "duration":160, "yield":[6,11]},
     {"crop":"groundnut","soils":{"sandy":0.9,"loamy":0.75},             "seasons":{"kharif":0.8},             "duration":110, "yield":[7,12]},
 ]
-    
\ No newline at end of file
@@ -0,0 +1,201 @@
+import asyncio, math
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+from app.cache import TTLCache
+from app.config import settings
+from app.db import db
+from app.engine.llm_batch import abatch_enrich, fallback
+from app.metrics import ENRICH_FLIGHTS, ENRICH_RESULTS, STAGE, timed
+
+# L1: per-worker LRU. L2: shared Mongo collection with a TTL index (see db.ensure_indexes).
+_local = TTLCache(settings.enrich_cache_max_entries, settings.enrich_cache_ttl_s)
+_shared = {"hits": 0, "stale_hits": 0, "misses": 0, "errors": 0}
+# Last good result per key, kept well past freshness for requests whose budget runs out.
+_last_good = TTLCache(settings.enrich_cache_max_entries, settings.enrich_stale_ttl_s)
+# Strong refs to LLM calls that outlived their request's budget (asyncio keeps only weak ones).
+_background: Set[asyncio.Task] = set()
+_outcomes = {"fresh": 0, "stale": 0, "fallback": 0, "background_stored": 0}
+# Single flight: the one LLM call per key currently running; concurrent misses on
+# the same key await it instead of sending an identical prompt.
+_inflight: Dict[str, asyncio.Task] = {}
+_flights = {"leader": 0, "follower": 0}
+
+def _bucket(value: Optional[float], width: float) -> Optional[int]:
+    if value is None or width <= 0:
+        return None
+    return math.floor(value / width)
+
+def enrichment_key(
+    crops: List[Dict[str, Any]],
+    soil: str,
+    season: str,
+    month: int | None,
+    climate: Dict[str, Any] | None,
+) -> str:
+    """Quantized cache key; climates that fall into the same bands share an entry."""
+    c = climate or {}
+    return "|".join(str(p) for p in (
+        soil,
+        season,
+        month or 6,  # the prompt defaults missing months to June
+        ",".join(x["crop"] for x in crops),
+        _bucket(c.get("tempC"), settings.enrich_band_temp_c),
+        _bucket(c.get("humidity"), settings.enrich_band_humidity),
+        _bucket(c.get("rain_mm"), settings.enrich_band_rain_mm),
+    ))
+
+async def _shared_get(key: str, stale_ok: bool = False) -> Optional[Dict[str, Any]]:
+    """Docs are fresh until `freshUntil` and kept (stale) until the TTL index drops
+    them at `expiresAt`; docs written before freshUntil existed are fresh until expiresAt."""
+    if db.enrich_cache is None:
+        return None
+    try:
+        doc = await db.enrich_cache.find_one({"_id": key})
+    except Exception:
+        _shared["errors"] += 1
+        return None
+    # the TTL monitor only sweeps once a minute, so check expiry ourselves
+    now = datetime.utcnow()
+    if not doc or doc.get("expiresAt", datetime.min) <= now:
+        _shared["misses"] += 1
+        return None
+    if doc.get("freshUntil", doc["expiresAt"]) <= now:
+        if not stale_ok:
+            _shared["misses"] += 1
+            return None
+        _shared["stale_hits"] += 1
+    else:
+        _shared["hits"] += 1
+    return {"items": doc["items"]}
+
+async def _shared_set(key: str, value: Dict[str, Any]) -> None:
+    if db.enrich_cache is None:
+        return
+    now = datetime.utcnow()
+    try:
+        await db.enrich_cache.update_one(
+            {"_id": key},
+            {"$set": {"items": value["items"],
+                      "freshUntil": now + timedelta(seconds=settings.enrich_cache_shared_ttl_s),
+                      "expiresAt": now + timedelta(seconds=max(settings.enrich_stale_ttl_s,
+                                                               settings.enrich_cache_shared_ttl_s))}},
+            upsert=True,
+        )
+    except Exception:
+        _shared["errors"] += 1
+
+async def lookup(key: str) -> Optional[Dict[str, Any]]:
+    hit = _local.get(key)
+    if hit is not None:
+        return hit
+    hit = await _shared_get(key)
+    if hit is not None:
+        _local.set(key, hit)
+        _last_good.set(key, hit)
+    return hit
+
+async def lookup_stale(key: str) -> Optional[Dict[str, Any]]:
+    """Last good result for `key`, however old (up to ENRICH_STALE_TTL_S)."""
+    hit = _last_good.get(key)
+    if hit is not None:
+        return hit
+    hit = await _shared_get(key, stale_ok=True)
+    if hit is not None:
+        _last_good.set(key, hit)
+    return hit
+
+async def store(key: str, value: Dict[str, Any]) -> None:
+    _local.set(key, value)
+    _last_good.set(key, value)
+    await _shared_set(key, value)
+
+async def _enrich_and_store(key: str, **kw) -> Dict[str, Any]:
+    res = await abatch_enrich(**kw)
+    if not res.get("fallback"):
+        await store(key, res)
+    return res
+
+def inflight(key: str) -> Optional[asyncio.Task]:
+    """The running enrichment for `key`, if any (await it shielded)."""
+    return _inflight.get(key)
+
+def _flight(key: str, **kw) -> asyncio.Task:
+    task = _inflight.get(key) if settings.enrich_coalesce else None
+    if task is not None:
+        role = "follower"
+    else:
+        role = "leader"
+        task = asyncio.ensure_future(_enrich_and_store(key, **kw))
+        if settings.enrich_coalesce:
+            _inflight[key] = task
+            task.add_done_callback(lambda _: _inflight.pop(key, None))
+    _flights[role] += 1
+    ENRICH_FLIGHTS.inc(role)
+    return task
+
+def _stored_late(task: asyncio.Task) -> None:
+    _background.discard(task)
+    if not task.cancelled() and task.exception() is None and not task.result().get("fallback"):
+        _outcomes["background_stored"] += 1
+
+def _answer(res: Dict[str, Any], freshness: str) -> Dict[str, Any]:
+    _outcomes[freshness] += 1
+    ENRICH_RESULTS.inc(freshness)
+    return {"items": res["items"], "freshness": freshness}
+
+@timed(STAGE, "enrich")
+async def cached_enrich(
+    crops: List[Dict[str, Any]],
+    soil: str,
+    season: str,
+    month: int | None,
+    climate: Dict[str, Any] | None,
+    budget_s: float | None = None,
+) -> Dict[str, Any]:
+    """abatch_enrich behind the two cache tiers, answered within `budget_s`.
+
+    The result carries "freshness": "fresh" (cache hit or LLM answer), "stale"
+    (the budget ran out; last good result for the same key) or "fallback"
+    (deterministic items). When the budget runs out the LLM call keeps going in
+    the background and stores its answer for the next request. Fallback results
+    are never cached. Concurrent misses on one key share a single LLM call.
+    """
+    key = enrichment_key(crops, soil, season, month, climate)
+    hit = await lookup(key)
+    if hit is not None:
+        return _answer(hit, "fresh")
+    task = _flight(key, crops=crops, soil=soil, season=season, month=month, climate=climate)
+    try:
+        # shield: a timeout (or this request going away) abandons the wait, not the
+        # call, which followers may be sharing
+        res = await asyncio.wait_for(asyncio.shield(task), budget_s)
+    except asyncio.TimeoutError:
+        if task not in _background:
+            _background.add(task)
+            task.add_done_callback(_stored_late)
+        res = fallback(crops, soil, season)
+    except Exception:
+        # the shared call itself blew up: every waiter takes the fallback path
+        res = fallback(crops, soil, season)
+    if not res.get("fallback"):
+        return _answer(res, "fresh")
+    # out of time, or the LLM failed. Another request may have stored a fresh
+    # answer for this key while we waited; failing that, an older real answer
+    # beats the canned one
+    hit = await lookup(key)
+    if hit is not None:
+        return _answer(hit, "fresh")
+    stale = await lookup_stale(key)
+    if stale is not None:
+        return _answer(stale, "stale")
+    return _answer(res, "fallback")
+
+def stats() -> Dict[str, Any]:
+    return {"local": _local.stats(), "shared": dict(_shared), "last_good": _last_good.stats(),
+            "outcomes": dict(_outcomes), "background_inflight": len(_background),
+            "coalescing": {**_flights, "inflight": len(_inflight), "ratio": coalescing_ratio()}}
+
+def coalescing_ratio() -> float:
+    """Share of cache-miss enrichments that joined a call already in flight."""
+    total = _flights["leader"] + _flights["follower"]
+    return round(_flights["follower"] / total, 4) if total else 0.0
@@ -1,7 +1,7 @@
 from typing import Dict
 from langchain_core.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
-from app.config import settings
+from app.engine import registry
+from app.engine.concurrency import llm_slot
 
 _prompt = PromptTemplate.from_template(
     "You are an agriculture advisor. Given soil='{soil}', season='{season}', crop='{crop}', "
@@ -9,26 +9,51 @@ _prompt = PromptTemplate.from_template(
     "and expected yield {yield_min}-{yield_max} q/acre. Avoid guarantees and keep it simple."
 )
 
-_llm = ChatOpenAI(model=settings.openai_model, temperature=0.2, api_key=settings.openai_api_key)
+# shared per-worker client (see registry); assign _llm to override
+_llm = None
 
-def explain(item: Dict, soil: str, season: str) -> str:
+def _model():
+    return _llm or registry.chat_model()
+
+def _inputs(item: Dict, soil: str, season: str) -> Dict:
+    y0, y1 = item["expected_yield_qpa"]
+    return {
+        "soil": soil,
+        "season": season,
+        "crop": item["crop"],
+        "duration_days": item["duration_days"],
+        "yield_min": y0,
+        "yield_max": y1
+    }
+
+def _text(resp) -> str:
+    text = getattr(resp, "content", None) or (resp if isinstance(resp, str) else "")
+    return (text or "").strip()
+
+def _fallback(item: Dict, soil: str, season: str) -> str:
     y0, y1 = item["expected_yield_qpa"]
+    return (f"{item['crop'].title()} suits {soil} soil in {season}. "
+            f"Duration {item['duration_days']} days; expected {y0}–{y1} q/acre.")
+
+def explain(item: Dict, soil: str, season: str) -> str:
     try:
-        chain = _prompt | _llm
-        resp = chain.invoke({
-            "soil": soil,
-            "season": season,
-            "crop": item["crop"],
-            "duration_days": item["duration_days"],
-            "yield_min": y0,
-            "yield_max": y1
-        })
-        text = getattr(resp, "content", None) or (resp if isinstance(resp, str) else "")
-        text = (text or "").strip()
+        chain = _prompt | _model()
+        text = _text(chain.invoke(_inputs(item, soil, season)))
         if text:
             return text
     except Exception:
         pass
     # Fallback
-    return (f"{item['crop'].title()} suits {soil} soil in {season}. "
-            f"Duration {item['duration_days']} days; expected {y0}–{y1} q/acre.")
+    return _fallback(item, soil, season)
+
+async def aexplain(item: Dict, soil: str, season: str) -> str:
+    try:
+        chain = _prompt | _model()
+        async with llm_slot():
+            resp = await chain.ainvoke(_inputs(item, soil, season))
+        text = _text(resp)
+        if text:
+            return text
+    except Exception:
+        pass
+    return _fallback(item, soil, season)
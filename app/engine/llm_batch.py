@@ -1,26 +1,27 @@
-import json
-from typing import Any, Dict, List
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
+import hashlib
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Tuple
+from pydantic import ValidationError
 from app.config import settings
+from app.engine import llm_json, registry
+from app.engine.concurrency import llm_slot
+from app.metrics import ENRICH_FALLBACKS, LLM_CALLS, LLM_PARSE_FAILURES, LLM_SECONDS, record_llm
+from app.schema import Enrichment, EnrichmentBatch
 
-# Fast, small model and JSON response
-_llm = ChatOpenAI(
-    model=settings.openai_model,                 # e.g. "gpt-4o-mini"
-    temperature=0.2,
-    api_key=settings.openai_api_key,
-    model_kwargs={"response_format": {"type": "json_object"}},
-    timeout=12,                                  # guard against long hangs
-    max_retries=1
-)
+# Fast, small model and JSON response: the shared client (registry.json_model),
+# resolved on first call. Assign _llm to swap in another model (benches do).
+_llm = None
 
+def _model():
+    return _llm or registry.json_model()
+
+# Market data is not asked for: it comes from mandi prices (engine/market.py).
+# Plain strings so the fingerprint (read at startup by precomputed) doesn't pull
+# in langchain; the template itself is built on first use.
 # IMPORTANT: escape literal JSON braces with {{ }}
-_PROMPT = ChatPromptTemplate.from_messages([
-    ("system",
-     "You are an agriculture advisor for Indian farming contexts. "
-     "Be concise, practical, and avoid guarantees. Respond ONLY with valid JSON."),
-    ("user",
-     """Given these inputs, enrich each crop with fields.
+_SYSTEM = ("You are an agriculture advisor for Indian farming contexts. "
+           "Be concise, practical, and avoid guarantees. Respond ONLY with valid JSON.")
+_USER = """Given these inputs, enrich each crop with fields.
 
 Inputs:
 - soil: {soil}
@@ -36,17 +37,6 @@ Return EXACT JSON (no commentary) with this schema:
       "crop": "string (must match input)",
       "explanation": "1-2 sentences",
       "best_practices": ["short bullet", "short bullet", "short bullet"],
-      "market": {{
-        "trend": "rising|steady|falling",
-        "last6m": [
-          {{ "month": int (1-12), "price": float }},
-          {{ "month": int, "price": float }},
-          {{ "month": int, "price": float }},
-          {{ "month": int, "price": float }},
-          {{ "month": int, "price": float }},
-          {{ "month": int, "price": float }}
-        ]
-      }},
       "pest_disease": {{
         "risks": [
           {{ "name": "string", "likelihood": "low|medium|high", "tip": "short actionable" }},
@@ -56,16 +46,70 @@ Return EXACT JSON (no commentary) with this schema:
     }}
   ]
 }}"""
+
+@lru_cache(maxsize=1)
+def _prompt():
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([("system", _SYSTEM), ("user", _USER)])
+
+# Changes whenever the prompt text or model does; precomputed results keyed on it go stale.
+PROMPT_FINGERPRINT = hashlib.sha1(
+    (settings.openai_model + "\n" + _SYSTEM + "\n" + _USER).encode()
+).hexdigest()[:12]
+
+def _messages(crops, soil, season, month, climate):
+    return _prompt().format_messages(
+        soil=soil,
+        season=season,
+        month=month or 6,
+        climate=climate or {},
+        crops=crops
     )
-])
 
-def _safe_json(s: str) -> Dict[str, Any]:
-    s = s.strip()
-    if s.startswith("```"):
-        s = s.strip("`")
-        if s.startswith("json"):
-            s = s[4:]
-    return json.loads(s or "{}")
+def _parse(content: str) -> Dict[str, Any]:
+    try:
+        batch = llm_json.parse(EnrichmentBatch, content).items
+    except ValidationError:
+        # salvage the well-formed items; merge() defaults the rest
+        LLM_PARSE_FAILURES.inc("batch", "salvaged")
+        batch = llm_json.parse_items(Enrichment, llm_json.loads(content).get("items"))
+    return {"items": [it.model_dump() for it in batch]}
+
+def fallback(crops: List[Dict[str, Any]], soil: str, season: str) -> Dict[str, Any]:
+    # Minimal safe fallback for entire batch
+    out = []
+    for c in crops:
+        y0, y1 = c["expected_yield_qpa"]
+        out.append({
+            "crop": c["crop"],
+            "explanation": f"{c['crop'].title()} suits {soil} in {season}. "
+                           f"Duration {c['duration_days']} days; expected {y0}–{y1} q/acre.",
+            "best_practices": [
+                "Use certified seeds and recommended spacing.",
+                "Apply balanced NPK based on soil test.",
+                "Weed early during the first 3–4 weeks."
+            ],
+            "pest_disease": {
+                "risks": [
+                    {"name":"General pests","likelihood":"medium","tip":"Scout weekly; keep field clean."}
+                ]
+            }
+        })
+    return {"items": out, "fallback": True}
+
+def _complete(resp, crops: List[Dict[str, Any]], soil: str, season: str) -> Dict[str, Any]:
+    record_llm("batch", resp)
+    try:
+        return _parse(getattr(resp, "content", "") or "")
+    except Exception:
+        LLM_PARSE_FAILURES.inc("batch", "invalid")
+        ENRICH_FALLBACKS.inc("batch")
+        return fallback(crops, soil, season)
+
+def _failed(crops: List[Dict[str, Any]], soil: str, season: str) -> Dict[str, Any]:
+    LLM_CALLS.inc("batch", "error")
+    ENRICH_FALLBACKS.inc("batch")
+    return fallback(crops, soil, season)
 
 def batch_enrich(
     crops: List[Dict[str, Any]],
@@ -74,51 +118,102 @@ def batch_enrich(
     month: int | None,
     climate: Dict[str, Any] | None,
 ) -> Dict[str, Any]:
-    """One OpenAI call that returns enrichment for all crops."""
-    msg = _PROMPT.format_messages(
-        soil=soil,
-        season=season,
-        month=month or 6,
-        climate=climate or {},
-        crops=crops
-    )
+    """One OpenAI call that returns enrichment for all crops (blocking; scripts only)."""
+    msg = _messages(crops, soil, season, month, climate)
     try:
-        resp = _llm.invoke(msg)
-        content = getattr(resp, "content", "") or ""
-        data = _safe_json(content)
-        items = data.get("items") or []
-
-        # Clamp sizes defensively
-        for it in items:
-            it["best_practices"] = (it.get("best_practices") or [])[:3]
-            # Ensure market structure exists
-            it.setdefault("market", {"trend": "steady", "last6m": []})
-            it["market"]["last6m"] = (it["market"].get("last6m") or [])[:6]
-            it.setdefault("pest_disease", {"risks": []})
-            it["pest_disease"]["risks"] = (it["pest_disease"].get("risks") or [])[:3]
-        return {"items": items}
+        with LLM_SECONDS.time("batch"):
+            resp = _model().invoke(msg)
     except Exception:
-        # Minimal safe fallback for entire batch
+        return _failed(crops, soil, season)
+    return _complete(resp, crops, soil, season)
+
+async def abatch_enrich(
+    crops: List[Dict[str, Any]],
+    soil: str,
+    season: str,
+    month: int | None,
+    climate: Dict[str, Any] | None,
+) -> Dict[str, Any]:
+    """Async variant of batch_enrich for request handlers; never blocks the event loop."""
+    msg = _messages(crops, soil, season, month, climate)
+    try:
+        async with llm_slot():
+            with LLM_SECONDS.time("batch"):
+                resp = await _model().ainvoke(msg)
+    except Exception:
+        return _failed(crops, soil, season)
+    return _complete(resp, crops, soil, season)
+
+class _ItemScanner:
+    """Pulls complete objects out of the streamed `"items": [...]` array as they close."""
+
+    def __init__(self):
+        self.buf = ""
+        self.pos = -1       # scan position; -1 until the array has opened
+        self.depth = 0
+        self.start = 0
+        self.in_str = False
+        self.escape = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self.buf += chunk
+        if self.pos < 0:
+            at = self.buf.find('"items"')
+            br = self.buf.find("[", at) if at >= 0 else -1
+            if br < 0:
+                return []
+            self.pos = br + 1
         out = []
-        for c in crops:
-            y0, y1 = c["expected_yield_qpa"]
-            out.append({
-                "crop": c["crop"],
-                "explanation": f"{c['crop'].title()} suits {soil} in {season}. "
-                               f"Duration {c['duration_days']} days; expected {y0}–{y1} q/acre.",
-                "best_practices": [
-                    "Use certified seeds and recommended spacing.",
-                    "Apply balanced NPK based on soil test.",
-                    "Weed early during the first 3–4 weeks."
-                ],
-                "market": {
-                    "trend": "steady",
-                    "last6m": [{"month": i, "price": 3000.0 + 10*i} for i in range(1,7)]
-                },
-                "pest_disease": {
-                    "risks": [
-                        {"name":"General pests","likelihood":"medium","tip":"Scout weekly; keep field clean."}
-                    ]
-                }
-            })
-        return {"items": out}
+        while self.pos < len(self.buf):
+            ch = self.buf[self.pos]
+            if self.in_str:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_str = False
+            elif ch == '"':
+                self.in_str = True
+            elif ch == "{":
+                if self.depth == 0:
+                    self.start = self.pos
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    out.append(llm_json.loads(self.buf[self.start:self.pos + 1]))
+            self.pos += 1
+        return out
+
+async def astream_enrich(
+    crops: List[Dict[str, Any]],
+    soil: str,
+    season: str,
+    month: int | None,
+    climate: Dict[str, Any] | None,
+) -> AsyncIterator[Tuple[Dict[str, Any], bool]]:
+    """Stream (item, is_fallback) pairs, each as soon as its JSON object closes.
+
+    Crops the model never delivered (error or truncated output) are filled in
+    from the deterministic fallback at the end.
+    """
+    msg = _messages(crops, soil, season, month, climate)
+    seen = set()
+    try:
+        scanner = _ItemScanner()
+        async with llm_slot():
+            with LLM_SECONDS.time("stream"):
+                async for chunk in _model().astream(msg):
+                    for it in llm_json.parse_items(Enrichment, scanner.feed(getattr(chunk, "content", "") or "")):
+                        if it.crop and it.crop not in seen:
+                            seen.add(it.crop)
+                            yield it.model_dump(), False
+        LLM_CALLS.inc("stream", "ok")
+    except Exception:
+        LLM_CALLS.inc("stream", "error")
+    missing = [c for c in crops if c["crop"] not in seen]
+    if missing:
+        ENRICH_FALLBACKS.inc("stream")
+    for it in fallback(missing, soil, season)["items"] if missing else []:
+        yield it, True
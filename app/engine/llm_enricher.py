@@ -1,14 +1,13 @@
-import json
 from typing import Dict, Any
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from app.config import settings
+from app.engine import llm_json, registry
+from app.engine.concurrency import llm_slot
 
-_llm = ChatOpenAI(
-    model=settings.openai_model,
-    temperature=0.2,
-    api_key=settings.openai_api_key,
-)
+# shared per-worker client (see registry); assign _llm to override
+_llm = None
+
+def _model():
+    return _llm or registry.chat_model()
 
 # NOTE: All literal JSON braces are doubled {{ ... }} to escape them.
 _PROMPT = ChatPromptTemplate.from_messages([
@@ -39,13 +38,52 @@ Return JSON with this exact schema (no extra fields, no commentary):
     )
 ])
 
-def _safe_json(s: str) -> Dict[str, Any]:
-    s = s.strip()
-    if s.startswith("```"):
-        s = s.strip("`")
-        if s.startswith("json"):
-            s = s[4:]
-    return json.loads(s)
+def _messages(item, soil, season, climate):
+    return _PROMPT.format_messages(
+        crop=item["crop"],
+        soil=soil,
+        season=season,
+        climate=climate or {}
+    )
+
+def _parse(content: str, item: Dict[str, Any], soil: str, season: str) -> Dict[str, Any]:
+    data = llm_json.loads(content)
+
+    expl = (data.get("explanation") or "").strip()
+    bp = (data.get("best_practices") or [])[:3]
+    market = data.get("market") or {}
+    trend = market.get("trend") if market else None
+    pests = data.get("pest_disease") or {}
+    risks = (pests.get("risks") or [])[:3]
+
+    return {
+        "explanation": expl or f"{item['crop'].title()} suits {soil} soil in {season}.",
+        "best_practices": bp or [
+            "Use certified seeds and recommended spacing.",
+            "Apply balanced NPK based on soil test.",
+            "Weed early during the first 3–4 weeks."
+        ],
+        "market_trend": trend if trend in ("rising","steady","falling") else "steady",
+        "pest_risks": risks or [
+            {"name": "General pests", "likelihood": "medium", "tip": "Scout weekly; keep field clean."}
+        ]
+    }
+
+def _fallback(item: Dict[str, Any], soil: str, season: str) -> Dict[str, Any]:
+    y0, y1 = item["expected_yield_qpa"]
+    return {
+        "explanation": (f"{item['crop'].title()} suits {soil} soil in {season}. "
+                        f"Duration {item['duration_days']} days; expected {y0}–{y1} q/acre."),
+        "best_practices": [
+            "Use certified seeds and recommended spacing.",
+            "Apply balanced NPK based on soil test.",
+            "Weed early during the first 3–4 weeks."
+        ],
+        "market_trend": "steady",
+        "pest_risks": [
+            {"name": "General pests", "likelihood": "medium", "tip": "Scout weekly; keep field clean."}
+        ],
+    }
 
 def llm_enrich(
     item: Dict[str, Any],
@@ -53,49 +91,23 @@ def llm_enrich(
     season: str,
     climate: Dict[str, Any] | None
 ) -> Dict[str, Any]:
-    climate_in = climate or {}
-    msg = _PROMPT.format_messages(
-        crop=item["crop"],
-        soil=soil,
-        season=season,
-        climate=climate_in
-    )
+    msg = _messages(item, soil, season, climate)
     try:
-        resp = _llm.invoke(msg)
-        content = getattr(resp, "content", "") or ""
-        data = _safe_json(content)
-
-        expl = (data.get("explanation") or "").strip()
-        bp = (data.get("best_practices") or [])[:3]
-        market = data.get("market") or {}
-        trend = market.get("trend") if market else None
-        pests = data.get("pest_disease") or {}
-        risks = (pests.get("risks") or [])[:3]
+        resp = _model().invoke(msg)
+        return _parse(getattr(resp, "content", "") or "", item, soil, season)
+    except Exception:
+        return _fallback(item, soil, season)
 
-        return {
-            "explanation": expl or f"{item['crop'].title()} suits {soil} soil in {season}.",
-            "best_practices": bp or [
-                "Use certified seeds and recommended spacing.",
-                "Apply balanced NPK based on soil test.",
-                "Weed early during the first 3–4 weeks."
-            ],
-            "market_trend": trend if trend in ("rising","steady","falling") else "steady",
-            "pest_risks": risks or [
-                {"name": "General pests", "likelihood": "medium", "tip": "Scout weekly; keep field clean."}
-            ]
-        }
+async def allm_enrich(
+    item: Dict[str, Any],
+    soil: str,
+    season: str,
+    climate: Dict[str, Any] | None
+) -> Dict[str, Any]:
+    msg = _messages(item, soil, season, climate)
+    try:
+        async with llm_slot():
+            resp = await _model().ainvoke(msg)
+        return _parse(getattr(resp, "content", "") or "", item, soil, season)
     except Exception:
-        y0, y1 = item["expected_yield_qpa"]
-        return {
-            "explanation": (f"{item['crop'].title()} suits {soil} soil in {season}. "
-                            f"Duration {item['duration_days']} days; expected {y0}–{y1} q/acre."),
-            "best_practices": [
-                "Use certified seeds and recommended spacing.",
-                "Apply balanced NPK based on soil test.",
-                "Weed early during the first 3–4 weeks."
-            ],
-            "market_trend": "steady",
-            "pest_risks": [
-                {"name": "General pests", "likelihood": "medium", "tip": "Scout weekly; keep field clean."}
-            ],
-        }
+        return _fallback(item, soil, season)
@@ -0,0 +1,34 @@
+from typing import Any, List, Type, TypeVar
+import orjson
+from pydantic import BaseModel, ValidationError
+
+# One decoding path for everything the model sends back.
+
+M = TypeVar("M", bound=BaseModel)
+
+def strip_fences(s: str) -> str:
+    """Drop a ```json ... ``` wrapper the model sometimes adds despite JSON mode."""
+    s = s.strip()
+    if s.startswith("```"):
+        s = s.strip("`")
+        if s.startswith("json"):
+            s = s[4:]
+    return s
+
+def loads(s: str | bytes) -> Any:
+    return orjson.loads(strip_fences(s) if isinstance(s, str) else s)
+
+def parse(model: Type[M], content: str) -> M:
+    """Decode and validate in one pass (pydantic's JSON parser, no intermediate dicts)."""
+    return model.model_validate_json(strip_fences(content) or "{}")
+
+def parse_items(item_model: Type[M], raw_items: List[Any]) -> List[M]:
+    """Per-item validation for when the one-pass parse rejected the document:
+    a single malformed entry shouldn't cost the others."""
+    out = []
+    for raw in raw_items or []:
+        try:
+            out.append(item_model.model_validate(raw))
+        except ValidationError:
+            pass
+    return out
@@ -1,72 +1,52 @@
-import json
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
+import time
+from typing import Any, Dict, Optional
 from app.config import settings
+from app.db import PeriodicService, db
 
-_llm = ChatOpenAI(
-    model=settings.openai_model,
-    temperature=0.2,
-    api_key=settings.openai_api_key,
-)
+# MarketInfo comes from mandi prices, not the model: app.jobs.ingest_market_prices
+# aggregates the price files (engine/market_store.py) and publishes one row per
+# crop to `market_prices`; workers hold those rows in memory, so a lookup is a
+# dict read, and `refresher` re-reads them every MARKET_REFRESH_S.
 
-# Escape all literal JSON braces with doubled {{ }}
-_PROMPT = ChatPromptTemplate.from_messages([
-    ("system",
-     "You are an agricultural economist. "
-     "Be practical and concise. Respond ONLY with JSON, no commentary. "
-     "Prices should be plausible INR/quintal values (typical mandis), not extremes. "
-     "Return exactly in the schema given."),
-    ("user",
-     """Provide market analysis for the given crop.
+NO_DATA = {"trend": "steady", "last6m": []}
 
-Input:
-- crop: {crop}
-- season: {season}
-- month: {month}
+_table: Dict[str, Dict[str, Any]] = {}
+_loaded_at = 0.0
 
-Return JSON:
-{{
-  "trend": "rising|steady|falling",
-  "last6m": [
-    {{ "month": int (1-12), "price": float }},
-    {{ "month": int, "price": float }},
-    {{ "month": int, "price": float }},
-    {{ "month": int, "price": float }},
-    {{ "month": int, "price": float }},
-    {{ "month": int, "price": float }}
-  ]
-}}"""
-    )
-])
+async def load() -> int:
+    global _table, _loaded_at
+    if db.market_prices is None:
+        _loaded_at = time.monotonic()
+        return 0
+    table = {}
+    async for doc in db.market_prices.find({}, {"trend": 1, "last6m": 1, "asOf": 1}):
+        table[doc["_id"]] = {"trend": doc["trend"], "last6m": doc.get("last6m", []), "asOf": doc.get("asOf")}
+    _table, _loaded_at = table, time.monotonic()  # swap in one step
+    return len(table)
 
-def _safe_json(s: str) -> Dict[str, Any]:
-    s = s.strip()
-    if s.startswith("```"):
-        s = s.strip("`")
-        if s.startswith("json"):
-            s = s[4:]
-    return json.loads(s)
+def lookup(crop: str) -> Optional[Dict[str, Any]]:
+    row = _table.get(crop)
+    if row is None:
+        return None
+    return {"trend": row["trend"], "last6m": [dict(p) for p in row["last6m"]]}
 
+def market_for(crop: str) -> Dict[str, Any]:
+    """lookup() or the no-data answer (steady, no points)."""
+    return lookup(crop) or {"trend": NO_DATA["trend"], "last6m": []}
+
+# Kept for callers of the old LLM engine; season/month don't change the answer.
 def get_market_info(crop: str, season: str, month: int | None) -> Dict[str, Any]:
-    try:
-        msg = _PROMPT.format_messages(
-            crop=crop,
-            season=season,
-            month=month or 6
-        )
-        resp = _llm.invoke(msg)
-        content = getattr(resp, "content", "") or ""
-        data = _safe_json(content)
+    return market_for(crop)
+
+async def aget_market_info(crop: str, season: str, month: int | None) -> Dict[str, Any]:
+    return market_for(crop)
+
+def stats() -> Dict[str, Any]:
+    return {
+        "crops": len(_table),
+        "as_of": {crop: row["asOf"] for crop, row in _table.items()},
+        "age_s": round(time.monotonic() - _loaded_at, 1) if _loaded_at else None,
+    }
 
-        trend = data.get("trend") or "steady"
-        last6m = data.get("last6m") or []
-        # Optional: light validation – keep exactly 6 points
-        last6m = last6m[:6]
-        return {"trend": trend, "last6m": last6m}
-    except Exception:
-        # Safe fallback
-        return {
-            "trend": "steady",
-            "last6m": [{"month": i, "price": 3000.0 + i*10} for i in range(1, 7)]
-        }
+# background reload; a failed one keeps the previous table
+refresher = PeriodicService("market-refresh", load, lambda: settings.market_refresh_s)
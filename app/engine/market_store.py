@@ -0,0 +1,224 @@
+import csv, os, re
+from functools import lru_cache
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from app.engine.catalog import current as current_catalog
+
+# Columnar store of daily mandi modal prices (INR/quintal) and the monthly
+# aggregates / trend classification derived from it. Used by
+# app.jobs.ingest_market_prices; the serving side only sees the per-crop
+# summaries it publishes (see engine/market.py).
+
+# Commodity names as they appear in mandi files -> our crop keys. Matched as
+# whole words against the lower-cased name in this order, first match wins
+# ("red gram" before "gram").
+_ALIASES: List[Tuple[str, str]] = [
+    ("paddy", "paddy"), ("dhan", "paddy"),
+    ("wheat", "wheat"),
+    ("maize", "maize"), ("corn", "maize"),
+    ("soyabean", "soybean"), ("soybean", "soybean"),
+    ("cotton", "cotton"), ("kapas", "cotton"),
+    ("mustard", "mustard"), ("rapeseed", "mustard"),
+    ("arhar", "pigeon pea"), ("tur", "pigeon pea"), ("red gram", "pigeon pea"), ("pigeon pea", "pigeon pea"),
+    ("bengal gram", "chickpea"), ("chana", "chickpea"), ("chickpea", "chickpea"), ("gram", "chickpea"),
+    ("jowar", "sorghum"), ("sorghum", "sorghum"),
+    ("groundnut", "groundnut"),
+]
+def crop_of(commodity: str) -> Optional[str]:
+    name = commodity.strip().lower()
+    if name in current_catalog().by_name:
+        return name
+    for alias, crop in _ALIASES:
+        if re.search(rf"\b{re.escape(alias)}\b", name):
+            return crop
+    return None
+
+_EPOCH = date(1970, 1, 1)
+
+def _day(value: Any) -> int:
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return (value - _EPOCH).days
+    return _parse_day(str(value).strip())
+
+@lru_cache(maxsize=8192)  # a file has a few hundred distinct dates over many rows
+def _parse_day(s: str) -> int:
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d-%b-%Y"):
+        try:
+            return (datetime.strptime(s, fmt).date() - _EPOCH).days
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised date: {s!r}")
+
+def _norm(header: str) -> str:
+    return re.sub(r"[^a-z]+", "_", header.lower().replace("_x0020_", "_")).strip("_")
+
+_COLUMNS = {
+    "commodity": ("commodity", "crop"),
+    "date": ("arrival_date", "date", "price_date", "reported_date"),
+    "price": ("modal_price", "modal_price_rs_quintal", "price"),
+    "state": ("state",), "district": ("district",), "market": ("market", "mandi"),
+}
+
+def _pick(row: Dict[str, Any], field: str) -> Any:
+    for name in _COLUMNS[field]:
+        if name in row:
+            return row[name]
+    return None
+
+def read_price_file(path: str) -> Iterator[Dict[str, Any]]:
+    """Rows of an Agmarknet-style CSV or Parquet file with normalised column names.
+    Parquet needs pyarrow (optional, not in requirements.txt)."""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("reading Parquet needs pyarrow: pip install pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches():
+            cols = {_norm(k): v for k, v in batch.to_pydict().items()}
+            for i in range(batch.num_rows):
+                yield {k: v[i] for k, v in cols.items()}
+        return
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [_norm(h) for h in next(reader)]
+        for rec in reader:
+            yield dict(zip(header, rec))
+
+
+class PriceStore:
+    """Parallel columns (crop code, market code, day, price), one row per
+    crop x market x day; later rows for the same key replace earlier ones."""
+
+    def __init__(self):
+        self.crops: List[str] = []
+        self.markets: List[str] = []
+        self.crop = np.zeros(0, np.int16)
+        self.market = np.zeros(0, np.int32)
+        self.day = np.zeros(0, np.int32)         # days since 1970-01-01
+        self.price = np.zeros(0, np.float32)
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    @classmethod
+    def load(cls, path: str) -> "PriceStore":
+        store = cls()
+        if os.path.exists(path):
+            with np.load(path, allow_pickle=False) as z:
+                store.crops, store.markets = list(z["crops"]), list(z["markets"])
+                store.crop, store.market, store.day, store.price = z["crop"], z["market"], z["day"], z["price"]
+        return store
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(tmp, crops=np.array(self.crops, dtype=str), markets=np.array(self.markets, dtype=str),
+                            crop=self.crop, market=self.market, day=self.day, price=self.price)
+        os.replace(tmp, path)  # readers never see a half-written store
+
+    def append(self, rows: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        crop_ix = {c: i for i, c in enumerate(self.crops)}
+        market_ix = {m: i for i, m in enumerate(self.markets)}
+        cs, ms, ds, ps = [], [], [], []
+        crop_cache: Dict[str, Optional[str]] = {}
+        counts = {"read": 0, "unknown_crop": 0, "bad_row": 0}
+        for row in rows:
+            counts["read"] += 1
+            commodity = str(_pick(row, "commodity") or "")
+            crop = crop_cache.get(commodity, "")
+            if crop == "":
+                crop = crop_cache[commodity] = crop_of(commodity)
+            if crop is None:
+                counts["unknown_crop"] += 1
+                continue
+            try:
+                day, price = _day(_pick(row, "date")), float(_pick(row, "price"))
+            except (TypeError, ValueError):
+                counts["bad_row"] += 1
+                continue
+            if price <= 0:
+                counts["bad_row"] += 1
+                continue
+            mkt = "|".join(str(_pick(row, k) or "").strip().lower() for k in ("state", "district", "market"))
+            if crop not in crop_ix:
+                crop_ix[crop] = len(self.crops)
+                self.crops.append(crop)
+            if mkt not in market_ix:
+                market_ix[mkt] = len(self.markets)
+                self.markets.append(mkt)
+            cs.append(crop_ix[crop]); ms.append(market_ix[mkt]); ds.append(day); ps.append(price)
+
+        before = len(self)
+        crop = np.concatenate([self.crop, np.asarray(cs, np.int16)])
+        market = np.concatenate([self.market, np.asarray(ms, np.int32)])
+        day = np.concatenate([self.day, np.asarray(ds, np.int32)])
+        price = np.concatenate([self.price, np.asarray(ps, np.float32)])
+        # keep the last row per (crop, market, day)
+        key = (crop.astype(np.int64) << 48) | (market.astype(np.int64) << 20) | day.astype(np.int64)
+        _, first_from_end = np.unique(key[::-1], return_index=True)
+        keep = np.sort(len(key) - 1 - first_from_end)
+        self.crop, self.market, self.day, self.price = crop[keep], market[keep], day[keep], price[keep]
+        counts["stored"] = len(cs)
+        counts["replaced"] = before + len(cs) - len(self)
+        counts["total_rows"] = len(self)
+        return counts
+
+    def monthly(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(months, means): months as months-since-1970 for each column, means as a
+        crops x months matrix of mean modal price, NaN where a crop has no data."""
+        if not len(self):
+            return np.zeros(0, np.int64), np.zeros((len(self.crops), 0))
+        month = self.day.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        m0, n_months = month.min(), int(month.max() - month.min()) + 1
+        flat = self.crop.astype(np.int64) * n_months + (month - m0)
+        size = len(self.crops) * n_months
+        sums = np.bincount(flat, weights=self.price, minlength=size)
+        counts = np.bincount(flat, minlength=size)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, sums / counts, np.nan)
+        return np.arange(m0, m0 + n_months), means.reshape(len(self.crops), n_months)
+
+
+def rolling_slopes(means: np.ndarray, window: int) -> np.ndarray:
+    """Least-squares slope of every `window`-month run, relative to the run's mean
+    (fraction per month). Gaps are carried forward; runs touching months before
+    a crop's first observation are NaN. Shape: crops x (months - window + 1)."""
+    n_crops, n_months = means.shape
+    if n_months < window:
+        return np.full((n_crops, 0), np.nan)
+    have = ~np.isnan(means)
+    idx = np.maximum.accumulate(np.where(have, np.arange(n_months), 0), axis=1)
+    filled = means[np.arange(n_crops)[:, None], idx]           # forward fill (leading gaps stay NaN)
+    runs = np.lib.stride_tricks.sliding_window_view(filled, window, axis=1)
+    x = np.arange(window) - (window - 1) / 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (runs @ x) / (x @ x) / runs.mean(axis=-1)
+
+
+def summarize(store: PriceStore, window: int, threshold: float) -> Dict[str, Dict[str, Any]]:
+    """Per-crop MarketInfo (trend + last six monthly means) as of each crop's latest month."""
+    months, means = store.monthly()
+    slopes = rolling_slopes(means, window)
+    out = {}
+    for c, crop in enumerate(store.crops):
+        seen = np.flatnonzero(~np.isnan(means[c]))
+        if not len(seen):
+            continue
+        last = seen[-1]
+        start = last - window + 1
+        slope = slopes[c, start] if 0 <= start < slopes.shape[1] else np.nan
+        trend = "steady"
+        if not np.isnan(slope):
+            trend = "rising" if slope > threshold else "falling" if slope < -threshold else "steady"
+        recent = [m for m in range(max(0, last - 5), last + 1) if not np.isnan(means[c, m])]
+        as_of = int(months[last])
+        out[crop] = {
+            "trend": trend,
+            "last6m": [{"month": int(months[m] % 12) + 1, "price": round(float(means[c, m]), 2)} for m in recent],
+            "slopePct": None if np.isnan(slope) else round(float(slope) * 100, 2),
+            "asOf": f"{1970 + as_of // 12:04d}-{as_of % 12 + 1:02d}",
+        }
+    return out
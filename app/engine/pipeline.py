@@ -0,0 +1,35 @@
+from typing import Any, Dict, List, Tuple
+from app.engine.market import market_for
+from app.engine.scorer import score, to_items
+
+# Deterministic steps around the LLM call, shared by the routes and offline jobs.
+
+def rank(soil: str, season: str, climate: Dict[str, Any] | None) -> Tuple[List[dict], List[dict]]:
+    """Top-3 base items plus the trimmed crop list the enrichment prompt takes."""
+    base_items = to_items(score(soil, season, climate, k=3))
+
+    crop_min = [
+        {
+            "crop": it["crop"],
+            "duration_days": it["duration_days"],
+            "expected_yield_qpa": it["expected_yield_qpa"]
+        }
+        for it in base_items
+    ]
+    return base_items, crop_min
+
+def merge(base_items: List[dict], enriched: List[dict]) -> List[dict]:
+    enrich_by_crop = {e["crop"]: e for e in enriched}
+
+    final = []
+
+    for it in base_items:
+        e = enrich_by_crop.get(it["crop"], {})
+        final.append({
+            **it,
+            "explanation": e.get("explanation", ""),
+            "best_practices": e.get("best_practices", []),
+            "market": market_for(it["crop"]),  # mandi data, never the model's guess
+            "pest_disease": e.get("pest_disease", {"risks":[]}),
+        })
+    return final
@@ -0,0 +1,81 @@
+import hashlib, json, time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from app.config import settings
+from app.db import PeriodicService, db
+from app.engine import catalog
+from app.engine.llm_batch import PROMPT_FINGERPRINT
+from app.engine.market import market_for
+from app.engine.pipeline import rank
+from app.engine.scorer import SEASONS, SOILS
+from app.metrics import STAGE, timed
+
+# Climate-free recommendations are a pure function of (soil, season, month), so
+# app.jobs.precompute fills the `precomputed` collection for the whole grid and
+# workers serve it from memory. Each row carries a fingerprint of the catalog
+# entries it ranked and of the prompt; rows whose fingerprint no longer matches
+# the running code are ignored. Market data is overlaid at lookup so rows
+# don't go stale when prices do. `refresher` reloads the table in the
+# background, so a lookup is only a dict read.
+
+_table: Dict[str, List[dict]] = {}
+_loaded_at = 0.0
+_version = ""   # catalog version the table was checked against
+
+def grid() -> Iterator[Tuple[str, str, int]]:
+    for soil in SOILS:
+        for season in SEASONS:
+            for month in range(1, 13):
+                yield soil, season, month
+
+def combo_key(soil: str, season: str, month: int | None) -> str:
+    return f"{soil}|{season}|{month or 6}"  # the prompt defaults missing months to June
+
+def fingerprint(base_items: List[dict]) -> str:
+    by_name = catalog.current().by_name
+    entries = [by_name[it["crop"]] for it in base_items]
+    raw = json.dumps([entries, [it["fit_score"] for it in base_items], PROMPT_FINGERPRINT], sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+def current_fingerprints() -> Dict[str, str]:
+    out = {}
+    for soil, season, month in grid():
+        base_items, _ = rank(soil, season, None)
+        out[combo_key(soil, season, month)] = fingerprint(base_items)
+    return out
+
+async def load() -> int:
+    """(Re)load the grid into memory, keeping only rows valid for this code version."""
+    global _table, _loaded_at, _version
+    version = catalog.current().version
+    if db.precomputed is None:
+        _loaded_at, _version = time.monotonic(), version
+        return 0
+    want = current_fingerprints()
+    table = {}
+    async for doc in db.precomputed.find({}, {"items": 1, "fingerprint": 1}):
+        if want.get(doc["_id"]) == doc.get("fingerprint"):
+            table[doc["_id"]] = doc["items"]
+    _table, _loaded_at, _version = table, time.monotonic(), version  # swap in one step
+    return len(table)
+
+@timed(STAGE, "precomputed")
+async def lookup(soil: str, season: str, month: int | None) -> Optional[List[dict]]:
+    if _version != catalog.current().version:
+        return None   # rows were checked against another catalog; the refresher catches up
+    items = _table.get(combo_key(soil, season, month))
+    return [{**it, "market": market_for(it["crop"])} for it in items] if items is not None else None
+
+def stats() -> Dict[str, Any]:
+    return {"rows": len(_table), "grid": len(SOILS) * len(SEASONS) * 12,
+            "catalog_current": _version == catalog.current().version,
+            "age_s": round(time.monotonic() - _loaded_at, 1) if _loaded_at else None}
+
+async def _refresh() -> None:
+    # a catalog reload changes the fingerprints; re-check rows on the next tick
+    # rather than waiting out PRECOMPUTED_REFRESH_S
+    if time.monotonic() - _loaded_at > settings.precomputed_refresh_s or _version != catalog.current().version:
+        await load()
+
+# a failed reload keeps serving the previous table
+refresher = PeriodicService("precomputed-refresh", _refresh,
+                            lambda: min(settings.precomputed_refresh_s, settings.catalog_refresh_s))
@@ -0,0 +1,49 @@
+import asyncio, importlib
+from functools import lru_cache
+from types import ModuleType
+from app.config import settings
+
+# Engines and the model client are built on first use: langchain/openai add
+# most of a worker's import time and memory, and most requests never need
+# more than the batch engine (often not even that, see precomputed/enrich_cache).
+
+ENGINES = {
+    "batch": "app.engine.llm_batch",
+    "enricher": "app.engine.llm_enricher",
+    "explainer": "app.engine.explainer",
+}
+
+def engine(name: str) -> ModuleType:
+    return importlib.import_module(ENGINES[name])
+
+@lru_cache(maxsize=1)
+def chat_model():
+    """The one ChatOpenAI (and HTTP connection pool) per worker, shared by every engine."""
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=settings.openai_model,
+        temperature=0.2,
+        api_key=settings.openai_api_key,
+        timeout=settings.llm_timeout_s,
+        max_retries=settings.llm_max_retries,
+    )
+
+@lru_cache(maxsize=1)
+def json_model():
+    """chat_model() in JSON mode; a binding, so it reuses the same client."""
+    return chat_model().bind(response_format={"type": "json_object"})
+
+async def warm_up() -> None:
+    """Pay the cold-start costs before the first request does (WARMUP_ON_START)."""
+    from app.db import db
+    for name in ENGINES:
+        engine(name)
+    if db.client is not None:
+        # concurrent pings check out (and so open) that many pooled connections
+        await asyncio.gather(*[db.client.admin.command("ping")
+                               for _ in range(max(1, settings.mongo_min_pool_size))])
+    try:
+        # GET /models is free and leaves a TLS connection in the client's pool
+        await chat_model().root_async_client.models.list()
+    except Exception:
+        pass
@@ -1,26 +1,20 @@
-from typing import Dict, List, Tuple
-from .crops import CROPS
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.engine.catalog import CLIMATE_FIELDS, SEASONS, SOILS, current  # noqa: F401  (re-exported)
 
-def score(soil: str, season: str, climate: Dict | None = None) -> List[Tuple[dict, float]]:
-    out: List[Tuple[dict, float]] = []
-    for c in CROPS:
-        soil_fit = c["soils"].get(soil, 0.35)
-        season_fit = c["seasons"].get(season, 0.35)
-        s = 0.5 * (soil_fit + season_fit)
+# Fit scoring against the current crop catalog; engine/catalog.py holds the
+# compiled arrays and the soil/season indexes.
 
-        if climate:
-            temp = climate.get("tempC")
-            rain = climate.get("rain_mm")
-            if c["crop"] == "paddy" and rain is not None:
-                s += 0.05 if rain >= 50 else -0.03
-            if c["crop"] == "wheat" and temp is not None:
-                s += 0.04 if 10 <= temp <= 25 else -0.02
+def score_many(requests: Sequence[Tuple[str, str, Optional[Dict[str, Any]]]]) -> np.ndarray:
+    """Score N (soil, season, climate) requests in one array pass.
 
-        s = max(0.0, min(1.0, s))
-        out.append((c, s))
+    Returns an (N, crops) matrix of fit scores in [0, 1], columns in catalog order.
+    """
+    return current().score_many(requests)
 
-    out.sort(key=lambda x: x[1], reverse=True)
-    return out
+def score(soil: str, season: str, climate: Dict | None = None, k: int | None = None) -> List[Tuple[dict, float]]:
+    """Best-first (entry, fit) pairs; only the top k are selected when k is given."""
+    return current().score(soil, season, climate, k)
 
 def to_items(scored: List[Tuple[dict, float]]) -> List[dict]:
     return [{
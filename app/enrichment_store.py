@@ -0,0 +1,100 @@
+# app/enrichment_store.py
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import orjson
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.cache import TTLCache
+from app.config import settings
+from app.db import db
+
+# Content-addressed enrichment payloads for histories. A history row keeps the
+# request and the ranked crops (name, score, duration, yield) and points at the
+# rest of each item -- explanation, practices, market, pests -- by hash in the
+# `enrichments` collection, where every distinct payload is stored once. Payloads
+# never change once written, so both directions cache freely.
+
+RANKED_FIELDS = ("crop", "fit_score", "duration_days", "expected_yield_qpa")
+
+# hashes this worker has already written (or seen written): skip the upsert
+_known = TTLCache(settings.enrichment_cache_max_entries, settings.enrichment_cache_ttl_s)
+# hash -> payload for rehydration
+_payloads = TTLCache(settings.enrichment_cache_max_entries, settings.enrichment_cache_ttl_s)
+_counters = {"compacted": 0, "payloads_written": 0, "payload_writes_skipped": 0, "rehydrated": 0, "missing": 0}
+
+def content_hash(payload: List[Dict[str, Any]]) -> str:
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()[:32]
+
+def compact(doc: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Tuple[str, List[Dict[str, Any]]]]]:
+    """Split a full history doc into the row to store and its (hash, payload)."""
+    items = doc.get("items") or []
+    if "enrichment" in doc or not items:
+        return doc, None
+    ranked = [{k: it[k] for k in RANKED_FIELDS if k in it} for it in items]
+    payload = [{k: v for k, v in it.items() if k not in RANKED_FIELDS} for it in items]
+    h = content_hash(payload)
+    _counters["compacted"] += 1
+    return {**doc, "items": ranked, "enrichment": h}, (h, payload)
+
+def inline(doc: Dict[str, Any], payload: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The uncompacted form of a compacted row (used when its payload can't be written)."""
+    row = {k: v for k, v in doc.items() if k != "enrichment"}
+    row["items"] = [{**it, **extra} for it, extra in zip(doc["items"], payload)]
+    return row
+
+async def save(entries: Iterable[Tuple[str, List[Dict[str, Any]]]]) -> None:
+    """Upsert payloads not yet known to be stored. Call before inserting the rows
+    that reference them, so a row never points at nothing."""
+    todo: Dict[str, List[Dict[str, Any]]] = {}
+    for h, payload in entries:
+        if _known.get(h) is None and h not in todo:
+            todo[h] = payload
+        else:
+            _counters["payload_writes_skipped"] += 1
+    if not todo:
+        return
+    now = datetime.utcnow()
+    try:
+        await db.enrichments.bulk_write(
+            [UpdateOne({"_id": h}, {"$setOnInsert": {"items": p, "createdAt": now}}, upsert=True)
+             for h, p in todo.items()],
+            ordered=False,
+        )
+    except BulkWriteError as e:
+        # two workers upserting the same new hash: the loser's duplicate key error
+        # means the (identical) payload is there
+        if not all(err.get("code") == 11000 for err in e.details.get("writeErrors", [])) \
+                or e.details.get("writeConcernErrors"):
+            raise
+    for h, p in todo.items():
+        _known.set(h, True)
+        _payloads.set(h, p)
+    _counters["payloads_written"] += len(todo)
+
+async def rehydrate(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Put the referenced payloads back into each row's items, in place; rows
+    written before compaction pass through untouched."""
+    refs = {d["enrichment"] for d in docs if d.get("enrichment")}
+    if not refs:
+        return docs
+    found = {h: p for h in refs if (p := _payloads.get(h)) is not None}
+    missing = [h for h in refs if h not in found]
+    if missing:
+        async for e in db.enrichments.find({"_id": {"$in": missing}}):
+            found[e["_id"]] = e["items"]
+            _payloads.set(e["_id"], e["items"])
+    for d in docs:
+        h = d.pop("enrichment", None)
+        if h is None:
+            continue
+        payload = found.get(h)
+        if payload is None:
+            _counters["missing"] += 1   # keep serving the ranked crops
+            continue
+        d["items"] = [{**it, **extra} for it, extra in zip(d.get("items") or [], payload)]
+        _counters["rehydrated"] += 1
+    return docs
+
+def stats() -> Dict[str, Any]:
+    return {**_counters, "known": _known.stats(), "payloads": _payloads.stats()}
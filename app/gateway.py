@@ -0,0 +1,95 @@
+# app/gateway.py
+import asyncio
+from typing import Any, Dict, Optional
+import httpx
+from app.config import settings
+
+
+class GatewayError(Exception):
+    """Payment gateway unreachable or returned an error."""
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+class RazorpayGateway:
+    """Async Razorpay Orders API client on one pooled, keep-alive httpx client.
+
+    GETs are retried on timeouts, transport errors, 429 and 5xx. POSTs are only
+    retried when the connection was never established, so an order is never
+    created twice.
+    """
+
+    def __init__(self, base_url: str, key_id: str, key_secret: str,
+                 timeout_s: float, max_retries: int, max_connections: int):
+        self.base_url = base_url.rstrip("/")
+        self.auth = (key_id, key_secret)
+        self.timeout = httpx.Timeout(timeout_s, connect=min(timeout_s, 5.0))
+        self.max_retries = max_retries
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, auth=self.auth,
+                                             timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    async def _request(self, method: str, path: str, idempotent: bool, **kw) -> Dict[str, Any]:
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            try:
+                r = await self._http().request(method, path, **kw)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                if last:
+                    raise GatewayError(f"gateway unreachable: {e!r}")
+            except httpx.HTTPError as e:
+                if last or not idempotent:
+                    raise GatewayError(f"gateway request failed: {e!r}")
+            else:
+                if r.status_code < 400:
+                    return r.json()
+                if last or not idempotent or not (r.status_code == 429 or r.status_code >= 500):
+                    raise GatewayError(f"gateway returned {r.status_code}: {r.text[:200]}", r.status_code)
+            await asyncio.sleep(0.2 * 2 ** attempt)
+        raise GatewayError("unreachable")  # pragma: no cover
+
+    async def create_order(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._request("POST", "/orders", idempotent=False, json=payload)
+
+    async def fetch_order(self, order_id: str) -> Dict[str, Any]:
+        return await self._request("GET", f"/orders/{order_id}", idempotent=True)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_gateway: Optional[RazorpayGateway] = None
+
+
+def get_gateway() -> RazorpayGateway:
+    global _gateway
+    if _gateway is None:
+        _gateway = RazorpayGateway(
+            base_url=settings.razorpay_api_base,
+            key_id=settings.razorpay_key_id,
+            key_secret=settings.razorpay_key_secret,
+            timeout_s=settings.gateway_timeout_s,
+            max_retries=settings.gateway_max_retries,
+            max_connections=settings.gateway_max_connections,
+        )
+    return _gateway
+
+
+def set_gateway(gateway: Optional[RazorpayGateway]) -> None:
+    """Swap the process-wide client (stub servers in tests/benchmarks)."""
+    global _gateway
+    _gateway = gateway
+
+
+async def close_gateway() -> None:
+    if _gateway is not None:
+        await _gateway.aclose()
@@ -1,11 +1,20 @@
+import base64, json
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List, Optional
+from typing import List, Literal, Optional
 from bson import ObjectId
 from app.db import db
+from app.enrichment_store import rehydrate
+from app import history_archive
 from app.security import current_user
 
 router = APIRouter()
 
+# view=summary: request inputs plus crop names/scores, enough for a list screen.
+# Stored rows only hold the ranked crops; view=full rehydrates the enrichment
+# payloads they reference (see enrichment_store).
+SUMMARY_PROJECTION = {"userId": 1, "request": 1, "createdAt": 1, "items.crop": 1, "items.fit_score": 1}
+
 def _serialize(doc):
     if not doc:
         return None
@@ -15,15 +24,41 @@ def _serialize(doc):
         doc["userId"] = str(doc["userId"])
     return doc
 
-@router.get("/", summary="List my history")
+def _encode_cursor(doc) -> str:
+    raw = json.dumps({"t": doc["createdAt"].isoformat(), "id": str(doc["_id"])})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(token: str):
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return datetime.fromisoformat(raw["t"]), ObjectId(raw["id"])
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+@router.get("/", summary="List my history",
+            description="Hot rows only (the last HISTORY_HOT_DAYS); archived rows stay reachable by id.")
 async def list_history(
     user = Depends(current_user),
     limit: int = Query(20, ge=1, le=100),
-    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="`next` from the previous page"),
+    view: Literal["full", "summary"] = Query("full"),
+    skip: int = Query(0, ge=0, deprecated=True),
 ):
-    cursor = db.histories.find({"userId": ObjectId(user["id"])}).sort("createdAt", -1).skip(skip).limit(limit)
-    items = [_serialize(x) async for x in cursor]
-    return {"items": items}
+    flt = {"userId": ObjectId(user["id"])}
+    if cursor:
+        t, oid = _decode_cursor(cursor)
+        flt["$or"] = [{"createdAt": {"$lt": t}}, {"createdAt": t, "_id": {"$lt": oid}}]
+    proj = SUMMARY_PROJECTION if view == "summary" else None
+    q = db.histories.find(flt, proj).sort([("createdAt", -1), ("_id", -1)])
+    if skip and not cursor:
+        q = q.skip(skip)
+    docs = await q.limit(limit + 1).to_list(limit + 1)
+    more = len(docs) > limit
+    docs = docs[:limit]
+    if view == "full":
+        await rehydrate(docs)
+    nxt = _encode_cursor(docs[-1]) if more and isinstance(docs[-1].get("createdAt"), datetime) else None
+    return {"items": [_serialize(x) for x in docs], "next": nxt}
 
 @router.get("/{history_id}", summary="Get one history item")
 async def get_history(history_id: str, user = Depends(current_user)):
@@ -32,6 +67,13 @@ async def get_history(history_id: str, user = Depends(current_user)):
     except Exception:
         raise HTTPException(400, "Invalid history id")
     doc = await db.histories.find_one({"_id": oid, "userId": ObjectId(user["id"])})
+    if not doc:
+        # past HISTORY_HOT_DAYS: moved to the archive
+        try:
+            doc = await history_archive.lookup(oid, ObjectId(user["id"]))
+        except history_archive.ArchiveUnavailable:
+            raise HTTPException(503, "This history item is archived and the archive isn't reachable from this server")
     if not doc:
         raise HTTPException(404, "Not found")
+    await rehydrate([doc])
     return _serialize(doc)
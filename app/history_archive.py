@@ -0,0 +1,182 @@
+# app/history_archive.py
+import asyncio, fcntl, gzip, logging, os, shutil, time, zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId, json_util
+from pymongo import UpdateOne
+from app.config import settings
+from app.db import PeriodicService, db
+
+# Cold tier for histories. Rows older than HISTORY_HOT_DAYS leave Mongo for
+# compressed NDJSON files on local disk, one per user-month:
+#
+#     HISTORY_ARCHIVE_DIR/2026-03/<userId>.ndjson.zst   (.gz without zstandard)
+#
+# Each archive run appends one compressed frame per bucket, so a file is a valid
+# multi-frame stream (`zstd -dc` / `zcat` read it whole). `history_archive` maps
+# each archived history id to its file, frame offset and frame length: a lookup
+# is one _id read plus one seek and one frame to decompress. Order is frame ->
+# index -> delete from `histories`, so a crash at any point leaves every row
+# readable; a row archived twice just leaves an unreferenced frame behind.
+# Buckets older than HISTORY_ARCHIVE_DAYS (if set) are deleted outright.
+
+log = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:   # optional, not in requirements.txt
+    zstandard = None
+
+_counters = {"runs": 0, "archived": 0, "frames": 0, "bytes_in": 0, "bytes_out": 0, "expired_buckets": 0,
+             "lookups": 0, "hits": 0, "misses": 0, "unreadable": 0}
+# missing file, truncated or corrupt frame, codec not installed
+_READ_ERRORS = (OSError, EOFError, RuntimeError, zlib.error) + ((zstandard.ZstdError,) if zstandard else ())
+
+class ArchiveUnavailable(Exception):
+    """The row is indexed but its archive file can't be read on this host."""
+
+def _ext() -> str:
+    return ".ndjson.zst" if zstandard is not None else ".ndjson.gz"
+
+def _compress(data: bytes) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+def _decompress(path: str, frame: bytes) -> bytes:
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(frame)
+    return gzip.decompress(frame)
+
+def _month(doc: Dict[str, Any]) -> str:
+    t = doc.get("createdAt")
+    if not isinstance(t, datetime):   # legacy rows: the insert time in the ObjectId
+        t = doc["_id"].generation_time
+    return t.strftime("%Y-%m")
+
+def _append(root: str, rel: str, lines: List[bytes]) -> Tuple[int, int]:
+    """Append one frame to root/rel; (offset, length) of the frame. Blocking."""
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frame = _compress(b"".join(lines))
+    with open(path, "ab") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)   # another archiver appending to the same bucket
+        try:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(frame)
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+    return offset, len(frame)
+
+def _read_frame(root: str, rel: str, offset: int, length: int) -> bytes:
+    path = os.path.join(root, rel)
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return _decompress(path, f.read(length))
+
+async def archive_batch(cutoff: datetime, batch: int, root: Optional[str] = None) -> int:
+    """Archive up to `batch` of the oldest rows created before `cutoff`; rows moved."""
+    root = root or settings.history_archive_dir
+    # ObjectIds are time-ordered, so the _id index finds old rows without a createdAt index
+    docs = await db.histories.find({"_id": {"$lt": ObjectId.from_datetime(cutoff)}}) \
+        .sort("_id", 1).limit(batch).to_list(batch)
+    if not docs:
+        return 0
+    buckets: Dict[str, List[Dict[str, Any]]] = {}
+    for d in docs:
+        buckets.setdefault(f"{_month(d)}/{d['userId']}{_ext()}", []).append(d)
+
+    ops = []
+    for rel, rows in buckets.items():
+        lines = [json_util.dumps(r).encode() + b"\n" for r in rows]
+        offset, length = await asyncio.to_thread(_append, root, rel, lines)
+        _counters["frames"] += 1
+        _counters["bytes_in"] += sum(map(len, lines))
+        _counters["bytes_out"] += length
+        month = rel.split("/", 1)[0]
+        ops += [UpdateOne({"_id": r["_id"]},
+                          {"$set": {"userId": r["userId"], "path": rel, "offset": offset, "length": length,
+                                    "month": month}}, upsert=True) for r in rows]
+    await db.history_archive.bulk_write(ops, ordered=False)
+    await db.histories.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+    _counters["archived"] += len(docs)
+    return len(docs)
+
+async def expire(before_month: str, root: Optional[str] = None) -> int:
+    """Drop archive buckets for months before `before_month` ("YYYY-MM"); buckets removed."""
+    root = root or settings.history_archive_dir
+    if not os.path.isdir(root):
+        return 0
+    months = sorted(m for m in os.listdir(root) if m < before_month)
+    for m in months:
+        # index first: a row must never point at a file that's gone
+        await db.history_archive.delete_many({"month": m})
+        await asyncio.to_thread(shutil.rmtree, os.path.join(root, m), True)
+    _counters["expired_buckets"] += len(months)
+    return len(months)
+
+async def run_once(now: Optional[datetime] = None) -> Dict[str, int]:
+    """One pass over both tiers: archive everything past HISTORY_HOT_DAYS, then
+    expire buckets past HISTORY_ARCHIVE_DAYS. Either is off at 0."""
+    now = now or datetime.utcnow()
+    moved = expired = 0
+    if settings.history_hot_days > 0:
+        cutoff = now - timedelta(days=settings.history_hot_days)
+        while n := await archive_batch(cutoff, settings.history_archive_batch):
+            moved += n
+    if settings.history_archive_days > 0:
+        expired = await expire((now - timedelta(days=settings.history_archive_days)).strftime("%Y-%m"))
+    _counters["runs"] += 1
+    return {"archived": moved, "expired_buckets": expired}
+
+async def lookup(history_id: ObjectId, user_id: ObjectId) -> Optional[Dict[str, Any]]:
+    """The archived row for `history_id` if it belongs to `user_id`, else None.
+    ArchiveUnavailable if it's indexed but its file can't be read here."""
+    _counters["lookups"] += 1
+    if db.history_archive is None:
+        return None
+    ref = await db.history_archive.find_one({"_id": history_id, "userId": user_id})
+    if ref is None:
+        _counters["misses"] += 1
+        return None
+    try:
+        data = await asyncio.to_thread(_read_frame, settings.history_archive_dir, ref["path"], ref["offset"],
+                                       ref["length"])
+    except _READ_ERRORS as e:
+        # the index is shared but files live on the host that archived them
+        # (or the codec isn't installed here)
+        _counters["unreadable"] += 1
+        log.error("history %s: archive file %s unreadable here: %r", history_id, ref["path"], e)
+        raise ArchiveUnavailable(ref["path"]) from e
+    needle = str(history_id).encode()
+    for line in data.splitlines():
+        if needle in line:
+            doc = json_util.loads(line)
+            if doc["_id"] == history_id:
+                _counters["hits"] += 1
+                return doc
+    _counters["misses"] += 1
+    log.error("history %s indexed in %s@%d but not in the frame", history_id, ref["path"], ref["offset"])
+    return None
+
+def stats() -> Dict[str, Any]:
+    out = {**_counters, "codec": "zstd" if zstandard is not None else "gzip",
+           "hot_days": settings.history_hot_days, "archive_days": settings.history_archive_days}
+    if _counters["bytes_out"]:
+        out["compression_ratio"] = round(_counters["bytes_in"] / _counters["bytes_out"], 2)
+    return out
+
+async def _scheduled_run() -> None:
+    t0 = time.perf_counter()
+    res = await run_once()
+    if res["archived"] or res["expired_buckets"]:
+        log.info("history archive: %s in %.1fs", res, time.perf_counter() - t0)
+
+# Off by default: the archive is local disk, so enable HISTORY_ARCHIVE_INTERVAL_S
+# on one worker per host (or run app.jobs.archive_histories from cron instead).
+archiver = PeriodicService("history-archive", _scheduled_run, lambda: settings.history_archive_interval_s,
+                           enabled=lambda: settings.history_archive_interval_s > 0)
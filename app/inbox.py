@@ -0,0 +1,120 @@
+# app/inbox.py
+import asyncio, logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.db import db
+from app.metrics import WEBHOOK_EVENTS
+
+log = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[str]]
+
+
+class WebhookInbox:
+    """Durable inbox: verified events are stored once (deduplicated on `_id`) and
+    processed by a pool of background workers.
+
+    A worker claims an event with a lease; if it crashes, the lease expires and
+    another worker picks the event up again, so the handler must be idempotent.
+    Failures are retried with exponential backoff and dead-lettered
+    (status "dead") after `max_attempts`.
+    """
+
+    def __init__(self, handler: Handler, workers: int, max_attempts: int, lease_s: int):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self.lease = timedelta(seconds=lease_s)
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self.counters: Dict[str, int] = {"received": 0, "duplicates": 0, "processed": 0,
+                                         "retried": 0, "dead": 0}
+        self.outcomes: Dict[str, int] = {}
+
+    async def put(self, event_id: str, event: str, payload: Dict[str, Any]) -> bool:
+        """Persist an event; False if it was already in the inbox."""
+        now = datetime.utcnow()
+        try:
+            await db.webhook_inbox.insert_one({
+                "_id": event_id, "event": event, "payload": payload,
+                "status": "pending", "attempts": 0, "nextAttemptAt": now,
+                "createdAt": now, "updatedAt": now,
+            })
+        except DuplicateKeyError:
+            self.counters["duplicates"] += 1
+            WEBHOOK_EVENTS.inc("duplicate")
+            return False
+        self.counters["received"] += 1
+        WEBHOOK_EVENTS.inc("received")
+        if self._wake is not None:
+            self._wake.set()
+        return True
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work(), name=f"webhook-inbox-{i}") for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return await db.webhook_inbox.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "nextAttemptAt": {"$lte": now}},
+                {"status": "processing", "lockedUntil": {"$lte": now}},  # lease expired
+            ]},
+            {"$set": {"status": "processing", "lockedUntil": now + self.lease, "updatedAt": now},
+             "$inc": {"attempts": 1}},
+            sort=[("nextAttemptAt", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                doc = await self._claim()
+                if doc is not None:
+                    await self._process(doc)
+                    continue
+            except Exception:
+                # Mongo trouble claiming or recording an outcome: the lease brings
+                # the event back, so keep this worker alive and try again
+                log.exception("webhook inbox worker error")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process(self, doc: Dict[str, Any]) -> None:
+        now = datetime.utcnow()
+        try:
+            outcome = await self.handler(doc["payload"])
+        except Exception as e:
+            dead = doc["attempts"] >= self.max_attempts
+            self.counters["dead" if dead else "retried"] += 1
+            WEBHOOK_EVENTS.inc("dead" if dead else "retried")
+            await db.webhook_inbox.update_one({"_id": doc["_id"]}, {"$set": {
+                "status": "dead" if dead else "pending",
+                "nextAttemptAt": now + timedelta(seconds=min(2 ** doc["attempts"], 3600)),
+                "lastError": repr(e)[:500],
+                "updatedAt": now,
+            }})
+            return
+        self.counters["processed"] += 1
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        WEBHOOK_EVENTS.inc(outcome)
+        await db.webhook_inbox.update_one({"_id": doc["_id"]}, {"$set": {
+            "status": "done", "outcome": outcome, "processedAt": now, "updatedAt": now,
+        }})
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "outcomes": dict(self.outcomes), "workers": sum(not t.done() for t in self._tasks)}
@@ -0,0 +1,40 @@
+"""Move histories past HISTORY_HOT_DAYS into the archive; expire old buckets.
+
+    python -m app.jobs.archive_histories [--hot-days 180] [--archive-days 0] [--dry-run]
+
+For cron, when HISTORY_ARCHIVE_INTERVAL_S leaves the in-app archiver off.
+Safe to re-run or interrupt (see app.history_archive). The archive directory
+is local to this host: run it where the API workers read HISTORY_ARCHIVE_DIR.
+"""
+import argparse, asyncio, time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from app import history_archive
+from app.config import settings
+from app.db import close, connect, db, ensure_indexes
+
+
+async def main(dry_run: bool):
+    await connect()
+    try:
+        if dry_run:
+            cutoff = datetime.utcnow() - timedelta(days=settings.history_hot_days)
+            n = await db.histories.count_documents({"_id": {"$lt": ObjectId.from_datetime(cutoff)}})
+            print(f"would archive {n} history rows created before {cutoff:%Y-%m-%d}")
+            return
+        await ensure_indexes()
+        t0 = time.perf_counter()
+        res = await history_archive.run_once()
+        print(f"{res} in {time.perf_counter() - t0:.1f}s; {history_archive.stats()}")
+    finally:
+        close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--hot-days", type=int, default=settings.history_hot_days)
+    ap.add_argument("--archive-days", type=int, default=settings.history_archive_days)
+    ap.add_argument("--dry-run", action="store_true")
+    a = ap.parse_args()
+    settings.history_hot_days, settings.history_archive_days = a.hot_days, a.archive_days
+    asyncio.run(main(a.dry_run))
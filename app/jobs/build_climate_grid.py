@@ -0,0 +1,61 @@
+"""Build the climate normals grid from a point table.
+
+    python -m app.jobs.build_climate_grid normals.csv [--step 0.25] [--out data/climate_normals.npy]
+
+Input: one row per grid point and month with columns lat, lng (or lon), month
+(1-12) and any of tempC, humidity, rain_mm -- e.g. a WorldClim/IMD gridded
+product exported to CSV. Points must sit on a regular grid; the step is
+inferred from the coordinates unless given. Cells with no rows (sea, gaps)
+are stored as NaN and drop out of lookups. Workers pick the new file up on
+restart.
+"""
+import argparse, csv, time
+import numpy as np
+from app.config import settings
+from app.engine.climate_grid import ClimateGrid
+from app.engine.scorer import CLIMATE_FIELDS
+
+_ALIASES = {"lon": "lng", "long": "lng", "longitude": "lng", "latitude": "lat",
+            "temp_c": "tempC", "tavg": "tempC", "rh": "humidity", "prec": "rain_mm", "rain": "rain_mm"}
+
+
+def read(path: str):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [_ALIASES.get(h.strip().lower(), h.strip()) for h in next(reader)]
+        fields = [f for f in CLIMATE_FIELDS if f in header]
+        cols = [header.index(c) for c in ("lat", "lng", "month", *fields)]
+        rows = np.array([[float(rec[c]) if rec[c].strip() else np.nan for c in cols] for rec in reader])
+    return fields, rows
+
+
+def grid_step(coords: np.ndarray) -> float:
+    d = np.diff(np.unique(np.round(coords, 6)))
+    return float(d.min()) if len(d) else 1.0
+
+
+def build(rows: np.ndarray, fields, step: float | None):
+    lat, lng, month = rows[:, 0], rows[:, 1], rows[:, 2].astype(np.intp)
+    step = step or min(grid_step(lat), grid_step(lng))
+    lat0, lng0 = float(lat.min()), float(lng.min())
+    i = np.rint((lat - lat0) / step).astype(np.intp)
+    j = np.rint((lng - lng0) / step).astype(np.intp)
+    values = np.full((i.max() + 1, j.max() + 1, 12, len(fields)), np.nan, dtype=np.float32)
+    values[i, j, month - 1] = rows[:, 3:]
+    return values, lat0, lng0, step
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("path")
+    ap.add_argument("--step", type=float, help="cell size in degrees (default: inferred)")
+    ap.add_argument("--out", default=settings.climate_grid_path)
+    a = ap.parse_args()
+
+    t0 = time.perf_counter()
+    fields, rows = read(a.path)
+    values, lat0, lng0, step = build(rows, fields, a.step)
+    ClimateGrid.save(a.out, values, lat0, lng0, step, fields)
+    filled = np.isfinite(values[..., 0]).any(axis=-1).mean()
+    print(f"{a.out}: {values.shape[0]}x{values.shape[1]} cells of {step} deg from ({lat0}, {lng0}), "
+          f"fields {fields}, {filled:.0%} with data, {values.nbytes / 1e6:.1f} MB, {time.perf_counter() - t0:.1f}s")
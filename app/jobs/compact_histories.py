@@ -0,0 +1,77 @@
+"""Move enrichment payloads out of existing `histories` rows into `enrichments`.
+
+    python -m app.jobs.compact_histories [--batch 500] [--dry-run]
+
+Each row keeps its request and ranked crops and gains an `enrichment` hash
+(see app.enrichment_store); identical payloads are stored once. Payloads are
+written before the rows that reference them, so an interrupted run leaves
+only whole rows behind. Safe to re-run: compacted rows are skipped.
+"""
+import argparse, asyncio
+from pymongo import UpdateOne
+from app import enrichment_store
+from app.db import close, connect, db
+
+
+async def _sizes() -> dict:
+    out = {}
+    for name in ("histories", "enrichments"):
+        try:
+            s = await db.database.command("collStats", name)
+            out[name] = {"size": s.get("size", 0), "storageSize": s.get("storageSize", 0)}
+        except Exception:   # enrichments doesn't exist before the first run
+            out[name] = {"size": 0, "storageSize": 0}
+    return out
+
+
+async def migrate(batch: int, dry_run: bool) -> int:
+    done, last = 0, None
+    while True:
+        flt = {"enrichment": {"$exists": False}}
+        if last is not None:
+            flt["_id"] = {"$gt": last}
+        docs = await db.histories.find(flt, {"items": 1}).sort("_id", 1).limit(batch).to_list(batch)
+        if not docs:
+            break
+        last = docs[-1]["_id"]
+        rows, entries = [], []
+        for d in docs:
+            row, entry = enrichment_store.compact(d)
+            if entry is not None:
+                rows.append(row)
+                entries.append(entry)
+        if dry_run:
+            done += len(rows)
+            continue
+        if rows:
+            await enrichment_store.save(entries)
+            await db.histories.bulk_write(
+                [UpdateOne({"_id": r["_id"], "enrichment": {"$exists": False}},
+                           {"$set": {"items": r["items"], "enrichment": r["enrichment"]}}) for r in rows],
+                ordered=False,
+            )
+        done += len(rows)
+        print(f"compacted {done}")
+    return done
+
+
+async def main(batch: int, dry_run: bool):
+    await connect()
+    try:
+        before = await _sizes()
+        n = await migrate(batch, dry_run)
+        print(f"{'would compact' if dry_run else 'compacted'} {n} history rows")
+        after = await _sizes()
+        for name in before:
+            print(f"{name}: size {before[name]['size']} -> {after[name]['size']} bytes, "
+                  f"storageSize {before[name]['storageSize']} -> {after[name]['storageSize']} bytes")
+    finally:
+        close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch", type=int, default=500)
+    ap.add_argument("--dry-run", action="store_true")
+    a = ap.parse_args()
+    asyncio.run(main(a.batch, a.dry_run))
@@ -0,0 +1,57 @@
+"""Ingest mandi price files and publish per-crop market info.
+
+    python -m app.jobs.ingest_market_prices prices_2024.csv [more.csv ...]   # daily drop: append
+    python -m app.jobs.ingest_market_prices --replace history/*.parquet      # rebuild from scratch
+    python -m app.jobs.ingest_market_prices --no-publish today.csv           # store only
+
+Files are Agmarknet-style exports (commodity, state/district/market,
+arrival date, modal price); Parquet needs pyarrow. Rows land in the columnar
+store at MARKET_STORE_PATH, where a re-sent (crop, market, day) replaces the
+earlier price, so re-running a drop is harmless. Monthly means, the rolling
+trend and last six months are then recomputed for every crop and upserted into
+`market_prices`, which workers reload every MARKET_REFRESH_S.
+"""
+import argparse, asyncio, time
+from datetime import datetime
+from app.config import settings
+from app.db import close, connect, db
+from app.engine import catalog
+from app.engine.market_store import PriceStore, read_price_file, summarize
+
+
+def ingest(paths, store_path: str, replace: bool) -> PriceStore:
+    store = PriceStore() if replace else PriceStore.load(store_path)
+    for path in paths:
+        t0 = time.perf_counter()
+        counts = store.append(read_price_file(path))
+        print(f"{path}: {counts} in {time.perf_counter() - t0:.2f}s")
+    store.save(store_path)
+    return store
+
+
+async def publish(summary) -> None:
+    await connect()
+    try:
+        now = datetime.utcnow()
+        for crop, info in summary.items():
+            await db.market_prices.update_one({"_id": crop}, {"$set": {**info, "updatedAt": now}}, upsert=True)
+    finally:
+        close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("paths", nargs="*", help="CSV or Parquet files (none: just republish the store)")
+    ap.add_argument("--store", default=settings.market_store_path)
+    ap.add_argument("--replace", action="store_true", help="start from an empty store instead of appending")
+    ap.add_argument("--no-publish", action="store_true", help="update the store without writing to Mongo")
+    a = ap.parse_args()
+
+    catalog.reload()  # commodities map onto the configured catalog's crop names
+    store = ingest(a.paths, a.store, a.replace)
+    summary = summarize(store, settings.market_trend_window, settings.market_trend_pct / 100)
+    for crop, info in sorted(summary.items()):
+        print(f"{crop:11s} {info['trend']:8s} slope {info['slopePct']}%/month as of {info['asOf']}")
+    if not a.no_publish:
+        asyncio.run(publish(summary))
+        print(f"published {len(summary)} crops")
@@ -0,0 +1,53 @@
+"""Convert legacy ISO-string `histories.createdAt` values to BSON dates.
+
+    python -m app.jobs.migrate_history_dates [--batch 1000] [--dry-run]
+
+Safe to re-run: only string values are touched. Also drops the old
+user_created_idx, which user_created_id_idx supersedes.
+"""
+import argparse, asyncio
+from datetime import datetime
+from pymongo import UpdateOne
+from app.db import close, connect, db, ensure_indexes
+
+
+async def migrate(batch: int, dry_run: bool) -> int:
+    if dry_run:
+        return await db.histories.count_documents({"createdAt": {"$type": "string"}})
+    done = 0
+    while True:
+        docs = await db.histories.find({"createdAt": {"$type": "string"}}, {"createdAt": 1}).limit(batch).to_list(batch)
+        if not docs:
+            break
+        ops = []
+        for d in docs:
+            try:
+                ops.append(UpdateOne({"_id": d["_id"]}, {"$set": {"createdAt": datetime.fromisoformat(d["createdAt"])}}))
+            except ValueError:
+                # unparseable: fall back to the insert time baked into the ObjectId
+                ops.append(UpdateOne({"_id": d["_id"]}, {"$set": {"createdAt": d["_id"].generation_time.replace(tzinfo=None)}}))
+        await db.histories.bulk_write(ops, ordered=False)
+        done += len(ops)
+        print(f"converted {done}")
+    return done
+
+
+async def main(batch: int, dry_run: bool):
+    await connect()
+    try:
+        n = await migrate(batch, dry_run)
+        if not dry_run:
+            await ensure_indexes()
+            if "user_created_idx" in await db.histories.index_information():
+                await db.histories.drop_index("user_created_idx")
+        print(f"{'would convert' if dry_run else 'converted'} {n} history rows")
+    finally:
+        close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch", type=int, default=1000)
+    ap.add_argument("--dry-run", action="store_true")
+    a = ap.parse_args()
+    asyncio.run(main(a.batch, a.dry_run))
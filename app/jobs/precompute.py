@@ -0,0 +1,66 @@
+"""Precompute climate-free recommendations for every soil x season x month.
+
+    python -m app.jobs.precompute [--concurrency 8] [--force]
+
+Incremental and resumable: a combination is only (re)generated when its stored
+fingerprint differs from the current catalog entries / prompt, and each result is
+saved as soon as it's done. Fallback results are not stored, so re-running
+picks them up again. Uses CROP_CATALOG_PATH, like the API workers, so the
+fingerprints match theirs.
+"""
+import argparse, asyncio
+from datetime import datetime
+from app.db import close, connect, db
+from app.engine import catalog
+from app.engine.llm_batch import abatch_enrich
+from app.engine.pipeline import merge, rank
+from app.engine.precomputed import combo_key, fingerprint, grid
+
+
+async def run(concurrency: int, force: bool):
+    stored = {d["_id"]: d.get("fingerprint") async for d in db.precomputed.find({}, {"fingerprint": 1})}
+    todo, total = [], 0
+    for soil, season, month in grid():
+        base_items, crop_min = rank(soil, season, None)
+        total += 1
+        key, fp = combo_key(soil, season, month), fingerprint(base_items)
+        if force or stored.get(key) != fp:
+            todo.append((key, fp, soil, season, month, base_items, crop_min))
+    print(f"{len(todo)} of {total} combinations to (re)generate ({len(stored)} stored)")
+
+    sem = asyncio.Semaphore(concurrency)
+    counts = {"ok": 0, "fallback": 0}
+
+    async def one(key, fp, soil, season, month, base_items, crop_min):
+        async with sem:
+            res = await abatch_enrich(crops=crop_min, soil=soil, season=season, month=month, climate=None)
+        if res.get("fallback"):
+            counts["fallback"] += 1
+            return
+        await db.precomputed.update_one(
+            {"_id": key},
+            {"$set": {"soil": soil, "season": season, "month": month, "fingerprint": fp,
+                      "items": merge(base_items, res["items"]), "updatedAt": datetime.utcnow()}},
+            upsert=True,
+        )
+        counts["ok"] += 1
+
+    await asyncio.gather(*[one(*t) for t in todo])
+    print(f"stored {counts['ok']}, skipped {counts['fallback']} fallback results (re-run to retry)")
+
+
+async def main(concurrency: int, force: bool):
+    await connect()
+    try:
+        await run(concurrency, force)
+    finally:
+        close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--force", action="store_true", help="regenerate every combination")
+    a = ap.parse_args()
+    catalog.reload()  # rank and fingerprint against the catalog the workers serve
+    asyncio.run(main(a.concurrency, a.force))
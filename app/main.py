@@ -1,88 +1,140 @@
+import asyncio
+import orjson
+from typing import Any, Dict, List
 from fastapi import FastAPI
+from pydantic import ValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from app.config import settings
 from app.db import setup_mongo
 from app.auth import router as auth_router
-from app.schema import RecommendRequest, RecommendResponse
-from app.engine.scorer import score, to_items
-from app.engine.explainer import explain 
-from app.engine.llm_enricher import llm_enrich
-from app.engine.market import get_market_info
-from app.engine.llm_batch import batch_enrich
+from app.schema import RecommendRequest, RecommendResponse, BatchRecommendRequest, BatchRecommendResponse
+from app.engine.pipeline import merge, rank
+from app.engine import catalog, climate_grid, enrich_cache, market, precomputed, registry
+from app.engine.enrich_cache import cached_enrich, enrichment_key, stats as enrich_cache_stats
+from app.engine.llm_batch import astream_enrich
 from app.history import router as history_router
 from datetime import datetime
 from fastapi import Depends,HTTPException
 from app.security import current_user
+from app.ratelimit import rate_limited
 from bson import ObjectId
-from app.db import db
-from app.billing import router as billing_router
-from app.plans import get_subscription
-from app.usage import get_usage, increment_usage
+from app.billing import router as billing_router, webhook_inbox
+from app.gateway import close_gateway
+from app.plans import PLANS, get_subscription, sub_changes
+from app.usage import QuotaExceeded, get_usage, quota_reservation, release_usage, reserve_usage
+from app.writeback import writer
+from app import enrichment_store, history_archive
+from app import metrics
 
-app = FastAPI(title="Ideal Crop Suggester - Engine (OpenAI-enriched)", version="0.0.3")
+app = FastAPI(title="Ideal Crop Suggester - Engine (OpenAI-enriched)", version="0.0.3",
+              default_response_class=ORJSONResponse)
 app.state.settings = settings
-setup_mongo(app)
+setup_mongo(app, services=[writer, webhook_inbox, market.refresher, catalog.watcher,
+                           precomputed.refresher, sub_changes, history_archive.archiver])
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_credentials=True,
     allow_methods=["*"], allow_headers=["*"]
 )
+app.add_middleware(metrics.RequestMetrics)
+
+metrics.Gauge("writeback_queue_depth", "History/usage writes waiting to flush.",
+              lambda: writer.stats()["queue_depth"])
+metrics.Gauge("enrich_coalescing_ratio", "Share of cache-miss enrichments that joined an identical call in flight.",
+              enrich_cache.coalescing_ratio)
+metrics.Gauge("enrich_background_inflight", "LLM calls still running after their request's budget ran out.",
+              lambda: enrich_cache_stats()["background_inflight"])
 
 @app.get("/health")
 def health():
     return {"ok": True}
 
+@app.get("/health/cache")
+def cache_health():
+    return {"enrich": enrich_cache_stats()}
+
+@app.get("/health/precomputed")
+def precomputed_health():
+    return precomputed.stats()
+
+@app.get("/health/catalog")
+def catalog_health():
+    return catalog.stats()
+
+@app.get("/health/archive")
+def archive_health():
+    return history_archive.stats()
+
+@app.get("/health/climate")
+def climate_health():
+    return climate_grid.stats()
+
+@app.get("/health/market")
+def market_health():
+    return market.stats()
+
+@app.get("/health/webhooks")
+def webhooks_health():
+    return webhook_inbox.stats()
+
+@app.get("/health/writeback")
+def writeback_health():
+    return {**writer.stats(), "enrichments": enrichment_store.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("startup")
+async def _load_precomputed():
+    catalog.reload_safely()  # a bad CROP_CATALOG_PATH is logged; the built-in catalog serves
+    climate_grid.load()
+    await precomputed.load()
+    if settings.warmup_on_start:
+        await registry.warm_up()
+
+@app.on_event("shutdown")
+async def _close_gateway():
+    await close_gateway()
+
 app.include_router(auth_router, prefix="/auth", tags=["Auth"])
 app.include_router(history_router, prefix="/history", tags=["History"])
 app.include_router(billing_router, prefix="/billing", tags=["Billing"])
 
-@app.post("/recommend", response_model=RecommendResponse)
-async def recommend(body: RecommendRequest,user=Depends(current_user)):
-    sub = await get_subscription(user["id"])
-    used = await get_usage(user["id"])
-    if used >= sub["monthly_quota"]:
-        raise HTTPException(402, detail="Quota exceeded. Upgrade your plan.")
-    
-    climate = body.climate.model_dump() if body.climate else None
-    ranked = score(body.soilType, body.season, climate)
-    base_items = to_items(ranked)[:3]
-
-    crop_min = [
-        {
-            "crop": it["crop"],
-            "duration_days": it["duration_days"],
-            "expected_yield_qpa": it["expected_yield_qpa"]
-        }
-        for it in base_items
-    ]
-
-    enriched = batch_enrich(
-        crops=crop_min,
-        soil=body.soilType,
-        season=body.season,
-        month=body.month,
-        climate=climate
-    )["items"]
-
-    enrich_by_crop = {e["crop"]: e for e in enriched}
-
-    final = []
-
-    for it in base_items:
-        e = enrich_by_crop.get(it["crop"], {})
-        final.append({
-            **it,
-            "explanation": e.get("explanation", ""),
-            "best_practices": e.get("best_practices", []),
-            "market": e.get("market", {"trend":"steady","last6m":[]}),
-            "pest_disease": e.get("pest_disease", {"risks":[]}),
-        })
-
-    await increment_usage(user["id"], 1)
-    
-    doc = {
-        "userId": ObjectId(user["id"]),
+def _climate(body: RecommendRequest):
+    """The client's Climate, gaps filled from the normals grid when it sent a location."""
+    return _climates([body])[0]
+
+def _climates(bodies: List[RecommendRequest]):
+    with metrics.STAGE.time("climate"):
+        return climate_grid.fill_many([(b.climate.model_dump() if b.climate else None,
+                                        b.location.model_dump() if b.location else None, b.month)
+                                       for b in bodies])
+
+def _rank(body: RecommendRequest, climate):
+    with metrics.STAGE.time("score"):
+        base_items, crop_min = rank(body.soilType, body.season, climate)
+    return climate, base_items, crop_min
+
+def _budget(sub) -> float:
+    """Seconds the plan waits on the LLM before settling for a stale or fallback answer."""
+    return PLANS.get(sub["planId"], PLANS["free"])["latency_budget_s"]
+
+def _has_climate(climate) -> bool:
+    return bool(climate) and any(v is not None for v in climate.values())
+
+def _prevalidated(content) -> ORJSONResponse:
+    """Recommendation payloads are validated where they're produced (enrichment is
+    parsed into schema.Enrichment, base items come from the catalog), so returning
+    a Response skips FastAPI's second pass through response_model; the model stays
+    on the route for the OpenAPI schema."""
+    return ORJSONResponse(content)
+
+def _history_doc(user_id: str, body: RecommendRequest, climate, final):
+    return {
+        "userId": ObjectId(user_id),
         "request": {
             "soilType": body.soilType,
             "season": body.season,
@@ -90,8 +142,173 @@ async def recommend(body: RecommendRequest,user=Depends(current_user)):
             "climate": climate or {}
         },
         "items": final,
-        "createdAt": datetime.utcnow().isoformat()
+        "createdAt": datetime.utcnow()
     }
-    await db.histories.insert_one(doc)
 
-    return {"items": final}
+@app.post("/recommend", response_model=RecommendResponse, dependencies=[Depends(rate_limited)])
+async def recommend(body: RecommendRequest,user=Depends(current_user)):
+    sub = await get_subscription(user["id"])
+    try:
+        # the credit is taken up front and handed back if anything below fails
+        async with quota_reservation(user["id"], sub["monthly_quota"]) as mk:
+            climate = _climate(body)
+            # no climate -> the whole answer may already be in the offline grid
+            final = None if _has_climate(climate) else await precomputed.lookup(body.soilType, body.season, body.month)
+            freshness = "fresh"
+            if final is None:
+                climate, base_items, crop_min = _rank(body, climate)
+
+                res = await cached_enrich(
+                    crops=crop_min,
+                    soil=body.soilType,
+                    season=body.season,
+                    month=body.month,
+                    climate=climate,
+                    budget_s=_budget(sub)
+                )
+                freshness = res["freshness"]
+
+                final = merge(base_items, res["items"])
+
+            # queued writes commit the reservation now; the writer hands the credit
+            # back if the row is dropped later
+            await writer.put_history(_history_doc(user["id"], body, climate, final), charge=(user["id"], mk))
+    except QuotaExceeded:
+        raise HTTPException(402, detail="Quota exceeded. Upgrade your plan.")
+
+    return _prevalidated({"items": final, "freshness": freshness})
+
+@app.post("/recommend/stream", dependencies=[Depends(rate_limited)])
+async def recommend_stream(body: RecommendRequest, user=Depends(current_user)):
+    """NDJSON variant of /recommend for slow links.
+
+    Lines, in order: {"type":"base","items":[...ranked, unenriched...]}, then one
+    {"type":"item","item":{...full CropItem...}} per crop as its enrichment is parsed,
+    then {"type":"done","freshness":...}. The credit is reserved when the stream starts but only
+    kept, and the history row only written, once the stream completes. If a concurrent request
+    takes the last credit in between, the only line is {"type":"error","status":402,...}.
+    """
+    climate, base_items, crop_min = _rank(body, _climate(body))
+    sub = await get_subscription(user["id"])
+    # the common 402 as a real status; reserve_usage below is the authoritative check
+    if await get_usage(user["id"]) >= sub["monthly_quota"]:
+        raise HTTPException(402, detail="Quota exceeded. Upgrade your plan.")
+
+    base_by_crop = {it["crop"]: it for it in base_items}
+
+    def _line(obj) -> bytes:
+        return orjson.dumps(obj) + b"\n"
+
+    async def _stream():
+        # reserve inside the generator: a client gone before the first chunk never
+        # starts it, and then nothing was taken
+        try:
+            mk = await reserve_usage(user["id"], sub["monthly_quota"])
+        except QuotaExceeded:
+            yield _line({"type": "error", "status": 402, "detail": "Quota exceeded. Upgrade your plan."})
+            return
+        committed = False
+        try:
+            yield _line({"type": "base", "items": base_items})
+
+            key = enrichment_key(crop_min, body.soilType, body.season, body.month, climate)
+            hit = await enrich_cache.lookup(key)
+            pending = enrich_cache.inflight(key) if hit is None else None
+            if pending is not None:
+                # a /recommend is already asking the LLM for this key; wait for it rather than ask again
+                try:
+                    res = await asyncio.shield(pending)
+                    hit = None if res.get("fallback") else res
+                except Exception:
+                    pass
+            enriched, fresh = [], True
+            if hit is not None:
+                pairs = _replay(hit["items"])
+            else:
+                pairs = astream_enrich(crops=crop_min, soil=body.soilType, season=body.season,
+                                       month=body.month, climate=climate)
+            async for e, is_fallback in pairs:
+                fresh = fresh and not is_fallback
+                if e.get("crop") not in base_by_crop:
+                    continue
+                enriched.append(e)
+                yield _line({"type": "item", "item": merge([base_by_crop[e["crop"]]], [e])[0]})
+            if hit is None and fresh:
+                await enrich_cache.store(key, {"items": enriched})
+
+            final = merge(base_items, enriched)
+            await writer.put_history(_history_doc(user["id"], body, climate, final), charge=(user["id"], mk))
+            committed = True
+            yield _line({"type": "done", "freshness": "fresh" if fresh else "fallback"})
+        finally:
+            # client went away or something failed: give the credit back
+            if not committed:
+                await release_usage(user["id"], 1, mk)
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+async def _replay(items):
+    for e in items:
+        yield e, False
+
+@app.post("/recommend/batch", response_model=BatchRecommendResponse, dependencies=[Depends(rate_limited)])
+async def recommend_batch(body: BatchRecommendRequest, user=Depends(current_user)):
+    """Many farms in one call: identical (soil, season, month, climate band) inputs share
+    one enrichment, quota is reserved once for the batch and histories are written together.
+    Invalid or failed items are reported per index instead of failing the batch."""
+    results: List[Dict[str, Any]] = [{"index": i} for i in range(len(body.items))]
+    valid: Dict[int, RecommendRequest] = {}
+    for i, raw in enumerate(body.items):
+        try:
+            valid[i] = RecommendRequest.model_validate(raw)
+        except ValidationError as e:
+            results[i].update(ok=False, error=f"invalid request: {e.errors(include_url=False)[0]['msg']}")
+
+    if not valid:
+        return _prevalidated({"results": results})
+
+    sub = await get_subscription(user["id"])
+    try:
+        async with quota_reservation(user["id"], sub["monthly_quota"], len(valid)) as mk:
+            docs = await _run_batch(user["id"], valid, results, _budget(sub), mk)
+    except QuotaExceeded:
+        raise HTTPException(402, detail=f"Quota exceeded: batch needs {len(valid)} credits. Upgrade your plan.")
+
+    # hand back credits for items that didn't produce a recommendation
+    failed = len(valid) - len(docs)
+    if failed:
+        await release_usage(user["id"], failed, mk)
+
+    return _prevalidated({"results": results})
+
+async def _run_batch(user_id: str, valid: Dict[int, RecommendRequest], results: List[Dict[str, Any]],
+                     budget_s: float | None = None, mk: str | None = None):
+    # one grid pass for every coordinate in the batch
+    climates = dict(zip(valid, _climates(list(valid.values()))))
+    ranked: Dict[int, Any] = {i: _rank(req, climates[i]) for i, req in valid.items()}
+    groups: Dict[str, List[int]] = {}
+    for i, (climate, _, crop_min) in ranked.items():
+        req = valid[i]
+        groups.setdefault(enrichment_key(crop_min, req.soilType, req.season, req.month, climate), []).append(i)
+
+    async def _enrich(first: int):
+        req, (climate, _, crop_min) = valid[first], ranked[first]
+        return await cached_enrich(crops=crop_min, soil=req.soilType, season=req.season,
+                                   month=req.month, climate=climate, budget_s=budget_s)
+
+    outcomes = await asyncio.gather(*[_enrich(idx[0]) for idx in groups.values()], return_exceptions=True)
+
+    docs = []
+    for idx, out in zip(groups.values(), outcomes):
+        for i in idx:
+            if isinstance(out, BaseException):
+                results[i].update(ok=False, error="enrichment failed")
+                continue
+            climate, base_items, _ = ranked[i]
+            final = merge(base_items, out["items"])
+            results[i].update(ok=True, items=final, freshness=out["freshness"])
+            docs.append(_history_doc(user_id, valid[i], climate, final))
+
+    if docs:
+        await writer.put_histories(docs, charge=(user_id, mk) if mk else None)
+    return docs
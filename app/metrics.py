@@ -0,0 +1,235 @@
+# app/metrics.py
+import bisect, time
+from collections import deque
+from functools import wraps
+from typing import Callable, Dict, List, Sequence, Tuple
+from pymongo import monitoring
+
+# In-process metrics, rendered in the Prometheus text format on GET /metrics.
+# Updated from the event loop only (one per worker), so an observation is a
+# bisect and a few adds with no locking. The Mongo listener runs on Motor's
+# executor threads; it queues timings that render() folds in at scrape time.
+
+_registry: List["_Metric"] = []
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _esc(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _fmt_labels(names: Sequence[str], values: Tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_esc(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        _registry.append(self)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, by: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + by
+
+    def render(self) -> List[str]:
+        return self._header() + [f"{self.name}{_fmt_labels(self.labels, k)} {v}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {}   # labels -> [bucket counts, sum, count]
+
+    def observe(self, value: float, *labels) -> None:
+        s = self._series.get(labels)
+        if s is None:
+            s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        s[0][bisect.bisect_left(self.buckets, value)] += 1
+        s[1] += value
+        s[2] += 1
+
+    def time(self, *labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        out = self._header()
+        names = self.labels + ("le",)
+        for k, (counts, total, n) in self._series.items():
+            acc = 0
+            for le, c in zip(self.buckets + ("+Inf",), counts):
+                acc += c
+                out.append(f"{self.name}_bucket{_fmt_labels(names, k + (le,))} {acc}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labels, k)} {total}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labels, k)} {n}")
+        return out
+
+
+class Gauge(_Metric):
+    """Read at scrape time from `fn`, so the hot path pays nothing."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float]):
+        super().__init__(name, help)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self.fn())
+        except Exception:
+            return []
+        return self._header() + [f"{self.name} {value}"]
+
+
+class _Timer:
+    __slots__ = ("hist", "labels", "t0")
+
+    def __init__(self, hist: Histogram, labels: Tuple):
+        self.hist, self.labels = hist, labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.t0, *self.labels)
+        return False
+
+
+def timed(hist: Histogram, *labels):
+    """Decorator form of hist.time() for coroutine functions."""
+    def deco(fn):
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - t0, *labels)
+        return wrapper
+    return deco
+
+
+def render() -> str:
+    _drain_mongo()
+    lines: List[str] = []
+    for m in _registry:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------
+# What we measure
+# ---------------------------
+REQUESTS = Histogram("http_request_seconds", "Request latency by route template and status.",
+                     ("method", "route", "status"))
+STAGE = Histogram("stage_seconds", "Time spent in each step of request handling.", ("stage",))
+
+LLM_CALLS = Counter("llm_calls_total", "LLM calls by engine and outcome (ok|error).", ("engine", "outcome"))
+LLM_SECONDS = Histogram("llm_call_seconds", "LLM call latency by engine.", ("engine",))
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by the model, by engine and kind (input|output).",
+                     ("engine", "kind"))
+LLM_PARSE_FAILURES = Counter("llm_parse_failures_total",
+                             "Unusable model output by engine; kind=salvaged kept the valid items, "
+                             "kind=invalid fell back.", ("engine", "kind"))
+ENRICH_FALLBACKS = Counter("enrich_fallbacks_total",
+                           "LLM errors/unparseable output replaced by deterministic items, by engine.", ("engine",))
+ENRICH_FLIGHTS = Counter("enrich_flights_total",
+                         "Cache-miss enrichments by role: leader started the LLM call, follower joined "
+                         "one already in flight for the same key.", ("role",))
+ENRICH_RESULTS = Counter("enrich_results_total", "Enrichment served by cached_enrich, by freshness.", ("freshness",))
+
+MONGO_OPS = Histogram("mongo_op_seconds", "Mongo command latency by collection and command.", ("collection", "op"))
+MONGO_FAILURES = Counter("mongo_op_failures_total", "Failed Mongo commands by collection and command.",
+                         ("collection", "op"))
+
+WEBHOOK_EVENTS = Counter("webhook_events_total",
+                         "Billing webhook events: received/duplicate at ingest, then the processing outcome.",
+                         ("outcome",))
+
+
+def record_llm(engine: str, resp) -> None:
+    """Count a successful call and whatever token usage the response carries."""
+    LLM_CALLS.inc(engine, "ok")
+    usage = getattr(resp, "usage_metadata", None) or {}
+    if usage.get("input_tokens"):
+        LLM_TOKENS.inc(engine, "input", by=usage["input_tokens"])
+    if usage.get("output_tokens"):
+        LLM_TOKENS.inc(engine, "output", by=usage["output_tokens"])
+
+
+# (seconds, collection, command, failed); deque appends are thread-safe.
+# Bounded so an unscraped worker doesn't grow it forever.
+_mongo_pending: deque = deque(maxlen=100_000)
+
+def _drain_mongo() -> None:
+    while _mongo_pending:
+        dt, coll, op, failed = _mongo_pending.popleft()
+        MONGO_OPS.observe(dt, coll, op)
+        if failed:
+            MONGO_FAILURES.inc(coll, op)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """pymongo command monitoring -> MONGO_OPS; pass to the client via event_listeners."""
+
+    def __init__(self):
+        self._inflight: Dict[int, Tuple[str, str]] = {}
+
+    def started(self, event):
+        name = event.command_name
+        coll = event.command.get("collection") if name == "getMore" else event.command.get(name)
+        if isinstance(coll, str):       # skip hello/ping/endSessions and friends
+            self._inflight[event.request_id] = (coll, name)
+
+    def succeeded(self, event):
+        key = self._inflight.pop(event.request_id, None)
+        if key is not None:
+            _mongo_pending.append((event.duration_micros / 1e6, *key, False))
+
+    def failed(self, event):
+        key = self._inflight.pop(event.request_id, None)
+        if key is not None:
+            _mongo_pending.append((event.duration_micros / 1e6, *key, True))
+
+
+class RequestMetrics:
+    """ASGI middleware feeding REQUESTS. Labels use the matched route's path
+    template (never the raw path) to keep cardinality bounded."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+        t0 = time.perf_counter()
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = scope.get("route")
+            REQUESTS.observe(time.perf_counter() - t0, scope["method"],
+                             getattr(route, "path", "unmatched"), status)
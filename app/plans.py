@@ -2,20 +2,47 @@
 from datetime import datetime, timedelta
 from typing import Literal, Optional, Dict, Any
 from bson import ObjectId
-from app.db import db
+import asyncio
+from app.cache import TTLCache
+from app.config import settings
+from app.db import PeriodicService, db
+from app.metrics import STAGE, timed
 from app.usage import get_usage
 
 PlanId = Literal["free","lite","pro"]
 
 PLANS: Dict[PlanId, Dict[str, Any]] = {
     "free": {"id":"free","name":"Free","price_inr":0,"monthly_quota":1,  # 1 trial credit
-             "features":{"market":False,"pest":False}},
+             "features":{"market":False,"pest":False},
+             "rate_limit":{"per_min":6,"burst":3},     # expensive routes, per user
+             "latency_budget_s":4},                    # LLM wait before stale/fallback
     "lite": {"id":"lite","name":"Lite","price_inr":199,"monthly_quota":50,
-             "features":{"market":True,"pest":True}},
+             "features":{"market":True,"pest":True},
+             "rate_limit":{"per_min":20,"burst":5},
+             "latency_budget_s":6},
     "pro":  {"id":"pro","name":"Pro","price_inr":499,"monthly_quota":500,
-             "features":{"market":True,"pest":True}},
+             "features":{"market":True,"pest":True},
+             "rate_limit":{"per_min":60,"burst":10},
+             "latency_budget_s":8},
 }
 
+# Resolved subscription per user (per worker). Written through by
+# activate_subscription / ensure_free_on_register; entries never outlive validTill.
+# Changes made on other workers (a payment verified or a webhook handled there)
+# reach this one through `sub_changes`, which polls `updatedAt`.
+_subs = TTLCache(settings.sub_cache_max_entries, settings.sub_cache_ttl_s)
+
+# Last plan seen per user, long-lived, so the rate limiter can pick a tier
+# without touching the DB. Refreshed on every get_subscription.
+_plan_hints = TTLCache(settings.sub_cache_max_entries, 86400)
+
+def plan_hint(user_id: str) -> Optional[str]:
+    return _plan_hints.get(str(user_id))
+
+def invalidate_subscription(user_id: str) -> None:
+    _subs.pop(str(user_id))
+    _plan_hints.pop(str(user_id))
+
 def month_key(dt: Optional[datetime]=None) -> str:
     d = dt or datetime.utcnow()
     return f"{d.year:04d}-{d.month:02d}"
@@ -34,17 +61,61 @@ async def ensure_free_on_register(user_id: str):
         }},
         upsert=True
     )
+    invalidate_subscription(user_id)
 
-async def get_subscription(user_id: str) -> Dict[str, Any]:
-    sub = await db.subscriptions.find_one({"userId": ObjectId(user_id)})
+def _resolve(user_id: str, sub: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """The effective plan for a subscription doc (or none), cached for this worker."""
     now = datetime.utcnow()
-    if not sub or not sub.get("active"):
-        return {"planId":"free","active":True,"validTill":None,
-                "features":PLANS["free"]["features"],"monthly_quota":PLANS["free"]["monthly_quota"]}
-    pid: PlanId = sub.get("planId","free")  # type: ignore
-    plan = PLANS.get(pid, PLANS["free"])
-    return {"planId": pid, "active":True, "validTill": sub.get("validTill"),
-            "features": plan["features"], "monthly_quota": plan["monthly_quota"]}
+    valid_till = sub.get("validTill") if sub else None
+    if not sub or not sub.get("active") or (valid_till is not None and valid_till <= now):
+        # lapsed paid plans fall back to free
+        res = {"planId":"free","active":True,"validTill":None,
+               "features":PLANS["free"]["features"],"monthly_quota":PLANS["free"]["monthly_quota"]}
+        valid_till = None
+    else:
+        pid: PlanId = sub.get("planId","free")  # type: ignore
+        plan = PLANS.get(pid, PLANS["free"])
+        res = {"planId": pid, "active":True, "validTill": valid_till,
+               "features": plan["features"], "monthly_quota": plan["monthly_quota"]}
+    _plan_hints.set(str(user_id), res["planId"])
+    if settings.sub_cache_ttl_s > 0:
+        ttl = settings.sub_cache_ttl_s
+        if valid_till is not None:
+            ttl = min(ttl, (valid_till - now).total_seconds())
+        _subs.set(user_id, dict(res), ttl=ttl)
+    return res
+
+@timed(STAGE, "subscription")
+async def get_subscription(user_id: str) -> Dict[str, Any]:
+    if settings.sub_cache_ttl_s > 0:
+        cached = _subs.get(user_id)
+        if cached is not None:
+            return dict(cached)
+    return _resolve(user_id, await db.subscriptions.find_one({"userId": ObjectId(user_id)}))
+
+# Writers stamp updatedAt with their own clock; re-reading a few seconds back
+# covers skew between workers (re-resolving a doc twice is harmless).
+_CHANGES_OVERLAP = timedelta(seconds=5)
+_changes_since: Optional[datetime] = None
+
+async def poll_subscription_changes() -> int:
+    """Re-resolve the subscriptions changed since the last poll into both caches;
+    rows changed. One indexed query per tick, however many users are cached."""
+    global _changes_since
+    start = datetime.utcnow()
+    if _changes_since is None:   # nothing cached before the first tick
+        _changes_since = start
+        return 0
+    n = 0
+    async for sub in db.subscriptions.find({"updatedAt": {"$gt": _changes_since - _CHANGES_OVERLAP}}):
+        _resolve(str(sub["userId"]), sub)
+        n += 1
+    _changes_since = start
+    return n
+
+sub_changes = PeriodicService("subscription-changes", poll_subscription_changes,
+                              lambda: settings.sub_changes_poll_s,
+                              enabled=lambda: settings.sub_changes_poll_s > 0 and settings.sub_cache_ttl_s > 0)
 
 async def activate_subscription(user_id: str, plan_id: PlanId, days: int = 30):
     now = datetime.utcnow()
@@ -55,11 +126,11 @@ async def activate_subscription(user_id: str, plan_id: PlanId, days: int = 30):
          "$setOnInsert": {"createdAt": now}},
         upsert=True
     )
+    invalidate_subscription(user_id)
 
 async def subscription_summary(user_id: str) -> Dict[str, Any]:
-    """Pack plan + usage into one dict for responses."""
-    sub = await get_subscription(user_id)
-    used = await get_usage(user_id)
+    """Pack plan + usage into one dict for responses (both cached; concurrent reads on a miss)."""
+    sub, used = await asyncio.gather(get_subscription(user_id), get_usage(user_id))
     remaining = max(sub["monthly_quota"] - used, 0)
     return {
         "planId": sub["planId"],
@@ -0,0 +1,87 @@
+# app/ratelimit.py
+import math, time
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+from fastapi import Header, HTTPException
+from pymongo import ReturnDocument
+from app.config import settings
+from app.db import db
+from app.plans import PLANS, plan_hint
+from app.security import token_subject
+
+
+class MemoryStore:
+    """Per-worker token buckets: key -> [tokens, last_refill]."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, List[float]] = {}
+
+    async def take(self, key: str, rate: float, burst: float, cost: float) -> Tuple[bool, float]:
+        return self.take_now(key, rate, burst, cost)
+
+    def take_now(self, key: str, rate: float, burst: float, cost: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        b = self._buckets.get(key)
+        if b is None:
+            if len(self._buckets) >= self.max_keys:
+                # forgetting a bucket only resets it to full; drop the oldest
+                del self._buckets[next(iter(self._buckets))]
+            b = self._buckets[key] = [burst, now]
+        else:
+            b[0] = min(burst, b[0] + (now - b[1]) * rate)
+            b[1] = now
+        if b[0] >= cost:
+            b[0] -= cost
+            return True, 0.0
+        return False, (cost - b[0]) / rate
+
+
+class MongoStore:
+    """Buckets shared by all workers, one atomic pipeline update per check.
+    Idle buckets expire through the TTL index on `expiresAt`."""
+
+    async def take(self, key: str, rate: float, burst: float, cost: float) -> Tuple[bool, float]:
+        now = time.time()
+        refilled = {"$min": [burst, {"$add": [
+            {"$ifNull": ["$tokens", burst]},
+            {"$multiply": [{"$subtract": [now, {"$ifNull": ["$ts", now]}]}, rate]},
+        ]}]}
+        doc = await db.rate_limits.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "ts": now,
+                          "expiresAt": datetime.utcnow() + timedelta(seconds=burst / rate + 60)}},
+                {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc["allowed"]:
+            return True, 0.0
+        return False, (cost - doc["tokens"]) / rate
+
+
+_store = MongoStore() if settings.rate_limit_backend == "mongo" else MemoryStore(settings.rate_limit_max_keys)
+
+
+def set_store(store) -> None:
+    global _store
+    _store = store
+
+
+async def rate_limited(authorization: str = Header(...)):
+    """Route dependency: per-user token bucket sized by the user's plan.
+
+    Declared in the route decorator's `dependencies`, so it runs before
+    current_user and rejects with 429 before any DB or LLM work (memory store).
+    """
+    if not settings.rate_limit_enabled:
+        return
+    uid = token_subject(authorization)
+    rl = PLANS.get(plan_hint(uid) or "free", PLANS["free"])["rate_limit"]
+    ok, retry_after = await _store.take(uid, rl["per_min"] / 60, rl["burst"], 1)
+    if not ok:
+        raise HTTPException(429, "Too many requests, slow down.",
+                            headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
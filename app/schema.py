@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Literal, Optional, Tuple, List, Dict
 
 Soil = Literal["clay","sandy","loamy","black","silt","peat","chalk"]
@@ -29,6 +29,11 @@ class MarketInfo(BaseModel):
     trend: Literal["rising","steady","falling"]
     last6m: List[MarketPoint]
 
+    @field_validator("last6m", mode="before")
+    @classmethod
+    def _six(cls, v):
+        return (v or [])[:6]
+
 class RiskItem(BaseModel):
     name: str
     likelihood: Literal["low","medium","high"]
@@ -37,6 +42,28 @@ class RiskItem(BaseModel):
 class PestDisease(BaseModel):
     risks: List[RiskItem]
 
+    @field_validator("risks", mode="before")
+    @classmethod
+    def _three(cls, v):
+        return (v or [])[:3]
+
+# One crop's enrichment as the LLM returns it; parsed straight from the raw JSON
+# (see engine/llm_json.py), so the sizes are clamped here instead of afterwards.
+class Enrichment(BaseModel):
+    crop: str
+    explanation: str = ""
+    best_practices: List[str] = []
+    market: MarketInfo = Field(default_factory=lambda: MarketInfo(trend="steady", last6m=[]))
+    pest_disease: PestDisease = Field(default_factory=lambda: PestDisease(risks=[]))
+
+    @field_validator("best_practices", mode="before")
+    @classmethod
+    def _three(cls, v):
+        return (v or [])[:3]
+
+class EnrichmentBatch(BaseModel):
+    items: List[Enrichment] = []
+
 class CropItem(BaseModel):
     crop: str
     fit_score: float
@@ -48,5 +75,24 @@ class CropItem(BaseModel):
     market: MarketInfo
     pest_disease: PestDisease
 
+# fresh: LLM answer or cache hit; stale: latency budget ran out, last good answer
+# for the same inputs; fallback: deterministic text
+Freshness = Literal["fresh","stale","fallback"]
+
 class RecommendResponse(BaseModel):
     items: List[CropItem]
+    freshness: Freshness = "fresh"
+
+# Batch endpoint: items are validated one by one so a bad entry doesn't sink the batch
+class BatchRecommendRequest(BaseModel):
+    items: List[Dict] = Field(min_length=1, max_length=100)
+
+class BatchItemResult(BaseModel):
+    index: int
+    ok: bool
+    items: Optional[List[CropItem]] = None
+    freshness: Optional[Freshness] = None
+    error: Optional[str] = None
+
+class BatchRecommendResponse(BaseModel):
+    results: List[BatchItemResult]
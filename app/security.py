@@ -1,14 +1,27 @@
 import time, jwt
 from fastapi import Header, HTTPException
 from bson import ObjectId
+from app.cache import TTLCache
 from app.config import settings
 from app.db import db
+from app.metrics import STAGE, timed
 
-def create_token(user_id: str) -> str:
-    payload = {"sub": user_id, "exp": int(time.time()) + 60 * settings.jwt_expire_min}
-    return jwt.encode(payload, settings.jwt_secret, algorithm="HS256")
+# Resolved principals per worker. Anything that changes a user document must
+# call invalidate_user() so the next request re-reads it.
+_principals = TTLCache(settings.user_cache_max_entries, settings.user_cache_ttl_s)
 
-async def current_user(authorization: str = Header(...)):
+# Verified token -> (subject, exp). Lets the rate limiter and current_user share
+# one signature check per token per worker.
+_tokens = TTLCache(settings.user_cache_max_entries, 300)
+
+def invalidate_user(user_id: str) -> None:
+    _principals.pop(str(user_id))
+
+def token_subject(authorization: str) -> str:
+    """Subject of a valid `Bearer` token; raises 401 otherwise. No DB access."""
+    hit = _tokens.get(authorization)
+    if hit is not None and hit[1] > time.time():
+        return hit[0]
     if not authorization.startswith("Bearer "):
         raise HTTPException(401, "Missing token")
     token = authorization.split(" ", 1)[1]
@@ -17,9 +30,24 @@ async def current_user(authorization: str = Header(...)):
     except Exception:
         raise HTTPException(401, "Invalid token")
     uid = payload.get("sub")
+    _tokens.set(authorization, (uid, payload.get("exp", 0)))
+    return uid
+
+def create_token(user_id: str) -> str:
+    payload = {"sub": user_id, "exp": int(time.time()) + 60 * settings.jwt_expire_min}
+    return jwt.encode(payload, settings.jwt_secret, algorithm="HS256")
+
+@timed(STAGE, "auth")
+async def current_user(authorization: str = Header(...)):
+    uid = token_subject(authorization)
+    cached = _principals.get(uid) if settings.user_cache_ttl_s > 0 else None
+    if cached is not None:
+        return dict(cached)  # handlers may mutate what they get
     user = await db.users.find_one({"_id": ObjectId(uid)})
     if not user:
         raise HTTPException(401, "User not found")
     # normalize id to string for responses
     user["id"] = str(user["_id"])
+    if settings.user_cache_ttl_s > 0:
+        _principals.set(uid, dict(user))
     return user
@@ -1,19 +1,43 @@
+from contextlib import asynccontextmanager
 from datetime import datetime
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from app.cache import TTLCache
+from app.config import settings
 from app.db import db
+from app.metrics import STAGE, timed
 # from app.plans import month_key
 
+class QuotaExceeded(Exception):
+    pass
+
 def month_key(dt: datetime | None = None) -> str:
     d = dt or datetime.utcnow()
     return f"{d.year:04d}-{d.month:02d}"
 
+# Monthly count per (user, month) for display paths (summary polling). Quota
+# enforcement never reads it; reserve_usage is authoritative.
+_counts = TTLCache(settings.usage_cache_max_entries, settings.usage_cache_ttl_s)
+
+def _remember(user_id: str, mk: str, count: int) -> None:
+    if settings.usage_cache_ttl_s > 0:
+        _counts.set((str(user_id), mk), count)
+
+def invalidate_usage(user_id: str, mk: str | None = None) -> None:
+    _counts.pop((str(user_id), mk or month_key()))
+
+@timed(STAGE, "usage_read")
 async def get_usage(user_id: str) -> int:
     mk = month_key()
+    if settings.usage_cache_ttl_s > 0:
+        cached = _counts.get((str(user_id), mk))
+        if cached is not None:
+            return cached
     doc = await db.usage.find_one({"userId": ObjectId(user_id), "monthKey": mk})
     # return int(doc["count"]) if doc and "count" in doc else 0
-    if not doc:
-        return 0
-    return int(doc.get("count", 0))
+    count = int(doc.get("count", 0)) if doc else 0
+    _remember(user_id, mk, count)
+    return count
 
 async def increment_usage(user_id: str, inc: int = 1) -> int:
     mk = month_key()
@@ -26,5 +50,45 @@ async def increment_usage(user_id: str, inc: int = 1) -> int:
     doc = res or await db.usage.find_one({"userId": ObjectId(user_id), "monthKey": mk})
     # return int(doc["count"]) if doc and "count" in doc else inc
     if not doc:
+        invalidate_usage(user_id, mk)
         return inc
+    _remember(user_id, mk, int(doc.get("count", inc)))
     return int(doc.get("count", inc))
+
+@timed(STAGE, "usage_reserve")
+async def reserve_usage(user_id: str, quota: int, n: int = 1) -> str:
+    """Check-and-increment in one conditional update; raises QuotaExceeded.
+
+    Returns the month key charged, so a release lands on the same counter even
+    across a month boundary.
+    """
+    if n > quota:
+        raise QuotaExceeded()
+    mk = month_key()
+    flt = {"userId": ObjectId(user_id), "monthKey": mk, "count": {"$lte": quota - n}}
+    upd = {"$inc": {"count": n}, "$setOnInsert": {"createdAt": datetime.utcnow()}}
+    try:
+        doc = await db.usage.find_one_and_update(flt, upd, upsert=True, return_document=True)
+    except DuplicateKeyError:
+        # The counter exists but didn't match: either it's over the limit, or a
+        # concurrent first-of-month insert won the race. Retry without upsert.
+        doc = await db.usage.find_one_and_update(flt, upd, return_document=True)
+    if not doc:
+        raise QuotaExceeded()
+    _remember(user_id, mk, int(doc["count"]))
+    return mk
+
+async def release_usage(user_id: str, n: int, mk: str) -> None:
+    from app.writeback import writer
+    invalidate_usage(user_id, mk)
+    await writer.put_usage(user_id, mk, -n)
+
+@asynccontextmanager
+async def quota_reservation(user_id: str, quota: int, n: int = 1):
+    """Reserve n credits for the body of the block; released if the block raises."""
+    mk = await reserve_usage(user_id, quota, n)
+    try:
+        yield mk
+    except BaseException:
+        await release_usage(user_id, n, mk)
+        raise
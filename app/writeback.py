@@ -0,0 +1,189 @@
+# app/writeback.py
+import asyncio, logging, time
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.config import settings
+from app.db import db
+from app import enrichment_store
+from app.metrics import STAGE, timed
+
+log = logging.getLogger(__name__)
+
+
+class WriteBehind:
+    """Bounded in-process queue for writes that don't need to finish before the response.
+
+    History docs are coalesced into insert_many batches and usage $inc's are merged per
+    (userId, monthKey). A batch closes at `batch_max` items or `flush_ms` after its first
+    item. Producers wait when the queue is full (backpressure). When the drain task isn't
+    running (scripts, tests) writes go straight to Mongo.
+
+    A history row may carry the (userId, monthKey) credit it was paid with; if the row is
+    dropped after all retries, that credit is handed back in the same flush.
+    """
+
+    def __init__(self, maxsize: int, batch_max: int, flush_ms: int, max_retries: int):
+        self.maxsize = maxsize
+        self.batch_max = max(1, batch_max)
+        self.flush_s = flush_ms / 1000
+        self.max_retries = max_retries
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {"enqueued": 0, "flushes": 0, "histories_written": 0, "usage_updates": 0,
+                         "retries": 0, "dropped": 0, "credits_released": 0, "flush_ms_total": 0.0,
+                         "flush_ms_max": 0.0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self.queue = asyncio.Queue(self.maxsize)
+            self._task = asyncio.create_task(self._drain(), name="write-behind")
+
+    async def stop(self) -> None:
+        """Flush everything queued, then stop the drain task."""
+        if not self.running:
+            return
+        await self.queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    @timed(STAGE, "history_write")
+    async def put_history(self, doc: Dict[str, Any], charge: Optional[Tuple[str, str]] = None) -> None:
+        """Rows are stored compacted: enrichment payloads go to `enrichments` by hash.
+        Inline (not running), a failed write raises, so the caller's reservation rolls back."""
+        row, entry = enrichment_store.compact(doc)
+        if not self.running:
+            if entry:
+                await enrichment_store.save([entry])
+            await db.histories.insert_one(row)
+            return
+        self.counters["enqueued"] += 1
+        await self.queue.put(("history", (row, entry, charge)))
+
+    @timed(STAGE, "history_write")
+    async def put_histories(self, docs: List[Dict[str, Any]], charge: Optional[Tuple[str, str]] = None) -> None:
+        """`charge`, if given, is one credit per doc."""
+        if not self.running:
+            rows, entries = zip(*[enrichment_store.compact(d) for d in docs])
+            await enrichment_store.save(e for e in entries if e)
+            await db.histories.insert_many(list(rows), ordered=False)
+            return
+        for doc in docs:
+            await self.put_history(doc, charge)
+
+    async def put_usage(self, user_id: str, month_key: str, inc: int) -> None:
+        if not self.running:
+            await db.usage.update_one({"userId": ObjectId(user_id), "monthKey": month_key}, {"$inc": {"count": inc}})
+            from app.usage import invalidate_usage
+            invalidate_usage(user_id, month_key)
+            return
+        self.counters["enqueued"] += 1
+        await self.queue.put(("usage", (user_id, month_key, inc)))
+
+    async def _drain(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_s
+            while len(batch) < self.batch_max:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            except Exception:
+                log.exception("write-behind flush failed")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    @timed(STAGE, "writeback_flush")
+    async def _flush(self, batch: List[Tuple[str, Any]]) -> None:
+        t0 = time.perf_counter()
+        compacted = [p for kind, p in batch if kind == "history"]
+        entries = [e for _, e, _ in compacted if e]
+        docs = [row for row, _, _ in compacted]
+        # payloads first, so no row points at a hash that isn't there; if they can't be
+        # written, store those rows whole instead
+        if entries and not await self._retry(lambda: enrichment_store.save(entries), len(entries), drop=False):
+            docs = [enrichment_store.inline(row, e[1]) if e else row for row, e, _ in compacted]
+        incs: Dict[Tuple[str, str], int] = {}
+        for kind, p in batch:
+            if kind == "usage":
+                uid, mk, inc = p
+                incs[(uid, mk)] = incs.get((uid, mk), 0) + inc
+
+        if docs:
+            if await self._retry(lambda: db.histories.insert_many(docs, ordered=False), len(docs)):
+                self.counters["histories_written"] += len(docs)
+            else:
+                # the rows are gone: give back the credits they were paid with
+                for _, _, charge in compacted:
+                    if charge is not None:
+                        incs[charge] = incs.get(charge, 0) - 1
+                        self.counters["credits_released"] += 1
+        ops = [UpdateOne({"userId": ObjectId(uid), "monthKey": mk}, {"$inc": {"count": n}})
+               for (uid, mk), n in incs.items() if n]
+        if ops and await self._retry(lambda: db.usage.bulk_write(ops, ordered=False), len(ops)):
+            self.counters["usage_updates"] += len(ops)
+            from app.usage import invalidate_usage
+            for uid, mk in incs:
+                invalidate_usage(uid, mk)
+
+        ms = (time.perf_counter() - t0) * 1000
+        self.counters["flushes"] += 1
+        self.counters["flush_ms_total"] += ms
+        self.counters["flush_ms_max"] = max(self.counters["flush_ms_max"], ms)
+
+    async def _retry(self, op, n: int, drop: bool = True) -> bool:
+        """False once retries run out; `drop=False` when the caller has a fallback."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                await op()
+                return True
+            except BulkWriteError as e:
+                # a retried insert_many can collide with rows the first attempt already wrote
+                if all(err.get("code") == 11000 for err in e.details.get("writeErrors", [])) \
+                        and not e.details.get("writeConcernErrors"):
+                    return True
+                err = e
+            except Exception as e:
+                err = e
+            if attempt < self.max_retries:
+                self.counters["retries"] += 1
+                await asyncio.sleep(min(0.05 * 2 ** attempt, 2.0))
+        if drop:
+            self.counters["dropped"] += n
+            log.error("write-behind gave up after %d attempts, dropping %d writes: %r", self.max_retries + 1, n, err)
+        else:
+            log.warning("write-behind gave up after %d attempts on %d writes: %r", self.max_retries + 1, n, err)
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        c = dict(self.counters)
+        c["queue_depth"] = self.queue.qsize() if self.queue is not None else 0
+        c["flush_ms_avg"] = round(c["flush_ms_total"] / c["flushes"], 3) if c["flushes"] else 0.0
+        c["flush_ms_total"] = round(c["flush_ms_total"], 3)
+        c["flush_ms_max"] = round(c["flush_ms_max"], 3)
+        return c
+
+
+writer = WriteBehind(
+    maxsize=settings.writeback_queue_max,
+    batch_max=settings.writeback_batch_max,
+    flush_ms=settings.writeback_flush_ms,
+    max_retries=settings.writeback_max_retries,
+)
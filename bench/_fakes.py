@@ -0,0 +1,237 @@
+"""Local stand-ins used by the benchmarks (no Atlas, no OpenAI)."""
+import asyncio, json, os, random, re, time
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+# one user drives most benches; ratelimit_overhead turns it back on
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+
+def _payload(messages) -> str:
+    # Echo back every crop named in the prompt so the response parses cleanly.
+    text = " ".join(getattr(m, "content", str(m)) for m in messages) if isinstance(messages, list) else str(messages)
+    names = re.findall(r"'crop': '([^']+)'", text)
+    return json.dumps({"items": [{
+        "crop": n,
+        "explanation": f"{n} fits.",
+        "best_practices": ["a", "b", "c"],
+        "pest_disease": {"risks": [{"name": "aphid", "likelihood": "low", "tip": "scout"}]},
+    } for n in names]})
+
+
+class FakeLLM:
+    """Duck-types the bits of ChatOpenAI the engines use; sleeps to simulate latency.
+    A `fail_rate` share of calls raise after the delay, like a timeout or 5xx would."""
+
+    def __init__(self, latency: float = 0.05, fail_rate: float = 0.0, seed: int = 11):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.calls = 0
+        self.failures = 0
+        self._rnd = random.Random(seed)
+
+    def _maybe_fail(self):
+        if self.fail_rate and self._rnd.random() < self.fail_rate:
+            self.failures += 1
+            raise RuntimeError("fake LLM failure")
+
+    def _reply(self, messages):
+        # token counts roughly as the real client reports them
+        return SimpleNamespace(content=_payload(messages),
+                               usage_metadata={"input_tokens": 400, "output_tokens": 600})
+
+    def invoke(self, messages, **_):
+        self.calls += 1
+        time.sleep(self.latency)
+        self._maybe_fail()
+        return self._reply(messages)
+
+    async def ainvoke(self, messages, **_):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        return self._reply(messages)
+
+    async def astream(self, messages, chunks: int = 20, **_):
+        # the whole latency is spread evenly over the token stream
+        self.calls += 1
+        text = _payload(messages)
+        step = max(1, len(text) // chunks)
+        # a failing stream breaks off somewhere in the middle
+        cut = self._rnd.randrange(len(text)) if self.fail_rate and self._rnd.random() < self.fail_rate else None
+        for i in range(0, len(text), step):
+            await asyncio.sleep(self.latency * step / len(text))
+            if cut is not None and i >= cut:
+                self.failures += 1
+                raise RuntimeError("fake LLM stream broke off")
+            yield SimpleNamespace(content=text[i:i + step])
+
+
+_OPS = {
+    "$lt": lambda a, b: a is not None and a < b,
+    "$lte": lambda a, b: a is not None and a <= b,
+    "$gt": lambda a, b: a is not None and a > b,
+    "$gte": lambda a, b: a is not None and a >= b,
+    "$ne": lambda a, b: a != b,
+    "$in": lambda a, b: a in b,
+    "$exists": lambda a, b: (a is not None) == b,
+}
+
+
+def _match(doc, flt):
+    for k, v in flt.items():
+        if k == "$or":
+            if not any(_match(doc, f) for f in v):
+                return False
+        elif isinstance(v, dict) and v and all(op in _OPS for op in v):
+            if not all(_OPS[op](doc.get(k), arg) for op, arg in v.items()):
+                return False
+        elif doc.get(k) != v:
+            return False
+    return True
+
+
+def _equalities(flt):
+    return {k: v for k, v in flt.items() if not (isinstance(v, dict) and v and all(op in _OPS for op in v))}
+
+
+class FakeCursor:
+    def __init__(self, coll, flt, projection=None):
+        self._coll, self._flt, self._proj = coll, flt, projection
+        self._sort, self._skip, self._limit = [], 0, 0
+
+    def sort(self, key, direction=None):
+        self._sort = [(key, direction)] if isinstance(key, str) else list(key)
+        return self
+
+    def skip(self, n):
+        self._skip = n
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def _project(self, d):
+        if not self._proj:
+            return dict(d)
+        out = {}
+        for path in [k for k, v in self._proj.items() if v] + ["_id"]:
+            head, _, rest = path.partition(".")
+            if head not in d:
+                continue
+            if not rest:
+                out[head] = d[head]
+            elif isinstance(d[head], list):  # "items.crop": keep that field of every element
+                prev = out.get(head) or [{} for _ in d[head]]
+                out[head] = [dict(p, **{rest: e[rest]}) for p, e in zip(prev, d[head]) if rest in e]
+        return out
+
+    def _run(self):
+        rows = [d for d in self._coll.docs if _match(d, self._flt)]
+        for key, direction in reversed(self._sort):
+            rows.sort(key=lambda d: (d.get(key) is not None, d.get(key)), reverse=direction == -1)
+        rows = rows[self._skip:]
+        return rows[:self._limit] if self._limit else rows
+
+    async def to_list(self, length=None):
+        await self._coll._rt()
+        return [self._project(d) for d in self._run()][:length]
+
+    def __aiter__(self):
+        async def gen():
+            for d in await self.to_list():
+                yield d
+        return gen()
+
+
+class FakeCollection:
+    """Tiny in-memory subset of a Motor collection; `latency` simulates a round trip."""
+
+    def __init__(self, latency: float = 0.0):
+        self.docs = []
+        self._ids = set()
+        self.latency = latency
+
+    async def _rt(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def create_index(self, *_, **__):
+        return None
+
+    def find(self, flt=None, projection=None, **_):
+        return FakeCursor(self, flt or {}, projection)
+
+    async def find_one(self, flt, *_, **__):
+        await self._rt()
+        for d in self.docs:
+            if _match(d, flt):
+                return dict(d)
+        return None
+
+    def _insert(self, doc):
+        from bson import ObjectId
+        from pymongo.errors import DuplicateKeyError
+        if "_id" in doc and doc["_id"] in self._ids:
+            raise DuplicateKeyError("E11000 duplicate key _id (fake)")
+        doc.setdefault("_id", ObjectId())
+        self._ids.add(doc["_id"])
+        self.docs.append(doc)
+        return doc["_id"]
+
+    async def insert_one(self, doc):
+        await self._rt()
+        return SimpleNamespace(inserted_id=self._insert(doc))
+
+    async def insert_many(self, docs, ordered=True):
+        await self._rt()
+        return SimpleNamespace(inserted_ids=[self._insert(d) for d in docs])
+
+    async def find_one_and_update(self, flt, update, upsert=False, **_):
+        await self._rt()
+        return self._apply(flt, update, upsert)
+
+    def _apply(self, flt, update, upsert):
+        doc = next((d for d in self.docs if _match(d, flt)), None)
+        if doc is None:
+            if not upsert:
+                return None
+            eq = _equalities(flt)
+            # behave like the unique indexes these filters are written against
+            if any(_match(d, eq) for d in self.docs):
+                from pymongo.errors import DuplicateKeyError
+                raise DuplicateKeyError("E11000 duplicate key (fake)")
+            doc = dict(eq, **update.get("$setOnInsert", {}))
+            self._insert(doc)
+        doc.update(update.get("$set", {}))
+        for k, v in update.get("$inc", {}).items():
+            doc[k] = doc.get(k, 0) + v
+        return dict(doc)
+
+    async def update_one(self, flt, update, upsert=False, **_):
+        await self._rt()
+        self._apply(flt, update, upsert)
+
+    async def delete_many(self, flt):
+        await self._rt()
+        gone = [d for d in self.docs if _match(d, flt)]
+        for d in gone:
+            self._ids.discard(d["_id"])
+        self.docs[:] = [d for d in self.docs if not _match(d, flt)]
+        return SimpleNamespace(deleted_count=len(gone))
+
+    async def bulk_write(self, ops, ordered=True):
+        await self._rt()
+        for op in ops:  # pymongo UpdateOne keeps filter/update on private attrs
+            self._apply(op._filter, op._doc, op._upsert)
+
+
+def install_fake_db(latency: float = 0.0):
+    from app.db import db
+    for name in ("users", "histories", "subscriptions", "orders", "usage", "enrich_cache", "precomputed",
+                 "webhook_inbox", "rate_limits", "market_prices", "enrichments",
+                 "history_archive"):
+        setattr(db, name, FakeCollection(latency))
+    return db
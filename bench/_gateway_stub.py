@@ -0,0 +1,37 @@
+"""Local stand-in for the Razorpay Orders API with configurable latency."""
+import asyncio, itertools
+from fastapi import FastAPI, Request
+
+
+def make_stub(latency: float = 0.05, fail_rate: float = 0.0):
+    app = FastAPI()
+    app.state.orders, app.state.latency, app.state.fail_rate = {}, latency, fail_rate
+    seq = itertools.count(1)
+    import random
+    rnd = random.Random(1)
+
+    async def delay():
+        await asyncio.sleep(app.state.latency)
+        return rnd.random() < app.state.fail_rate
+
+    @app.post("/orders")
+    async def create(req: Request):
+        if await delay():
+            return _error()
+        body = await req.json()
+        order = {"id": f"order_{next(seq):08d}", "entity": "order", "status": "created", **body}
+        app.state.orders[order["id"]] = order
+        return order
+
+    @app.get("/orders/{order_id}")
+    async def fetch(order_id: str):
+        if await delay():
+            return _error()
+        return app.state.orders.get(order_id) or _error(404)
+
+    return app
+
+
+def _error(code: int = 503):
+    from fastapi.responses import JSONResponse
+    return JSONResponse({"error": {"code": "SERVER_ERROR"}}, status_code=code)
@@ -0,0 +1,63 @@
+import time
+
+
+def pct(samples, q: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(q * len(s)))] if s else 0.0
+
+
+def summary_ms(samples) -> dict:
+    return {"n": len(samples), "p50_ms": round(pct(samples, 0.50) * 1e3, 3),
+            "p95_ms": round(pct(samples, 0.95) * 1e3, 3), "p99_ms": round(pct(samples, 0.99) * 1e3, 3)}
+
+
+async def timed(coro):
+    t0 = time.perf_counter()
+    res = await coro
+    return res, time.perf_counter() - t0
+
+
+class serve:
+    """Run the app under uvicorn on a local port inside the current event loop.
+
+    ASGITransport buffers whole responses, so anything timing bytes on the wire
+    (streaming, keep-alive) needs a real server.
+    """
+
+    def __init__(self, app, port: int = 8765):
+        import uvicorn
+        self.url = f"http://127.0.0.1:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+
+    async def __aenter__(self):
+        import asyncio
+        self.task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            await asyncio.sleep(0.01)
+        return self.url
+
+    async def __aexit__(self, *exc):
+        self.server.should_exit = True
+        await self.task
+
+
+class serve_thread:
+    """Like `serve`, but on its own thread and loop, so stand-ins for external
+    services keep answering even while the app under test blocks its loop."""
+
+    def __init__(self, app, port: int = 8766):
+        import uvicorn
+        self.url = f"http://127.0.0.1:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+
+    def __enter__(self):
+        import threading
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self.url
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
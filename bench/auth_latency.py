@@ -0,0 +1,45 @@
+"""p50/p99 of /auth/me and /history/ with and without the principal cache.
+
+    python -m bench.auth_latency --mongo-ms 2 -n 500
+"""
+import argparse, asyncio
+from bench import _fakes
+from bench._util import summary_ms, timed
+
+import httpx
+from bson import ObjectId
+from app.config import settings
+from app.main import app
+from app.security import _principals, create_token
+
+
+async def run(n: int, mongo_ms: float, concurrency: int):
+    db = _fakes.install_fake_db(mongo_ms / 1e3)
+    uid = ObjectId()
+    await db.users.insert_one({"_id": uid, "email": "me@example.com", "name": "me"})
+    headers = {"Authorization": f"Bearer {create_token(str(uid))}"}
+    sem = asyncio.Semaphore(concurrency)
+    ttl = settings.user_cache_ttl_s or 60
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one(path):
+            async with sem:
+                r, dt = await timed(client.get(path, headers=headers))
+                assert r.status_code == 200, r.text
+                return dt
+
+        for label, cache_ttl in (("no-cache", 0), ("cache", ttl)):
+            settings.user_cache_ttl_s = cache_ttl
+            _principals.clear()
+            for path in ("/auth/me", "/history/"):
+                lat = await asyncio.gather(*[one(path) for _ in range(n)])
+                print(f"{label:9s} {path:10s} {summary_ms(lat)}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=2000)
+    ap.add_argument("--mongo-ms", type=float, default=2.0)
+    ap.add_argument("-c", "--concurrency", type=int, default=1)
+    a = ap.parse_args()
+    asyncio.run(run(a.n, a.mongo_ms, a.concurrency))
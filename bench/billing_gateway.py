@@ -0,0 +1,70 @@
+"""Concurrent /billing/create-order against a local gateway stub.
+
+    python -m bench.billing_gateway -n 200 --latency 0.05
+
+Modes: `blocking` (sync HTTP client per call, like the old SDK path),
+`unpooled` (new async client per call) and `pooled` (the shared gateway client).
+"""
+import argparse, asyncio, time
+from bench import _fakes
+from bench._gateway_stub import make_stub
+from bench._util import serve_thread
+
+import httpx
+from bson import ObjectId
+from app.config import settings
+from app.gateway import RazorpayGateway, set_gateway
+from app.main import app
+from app.security import create_token
+
+
+class _Blocking:
+    def __init__(self, base):
+        self.base = base
+
+    async def create_order(self, payload):
+        with httpx.Client(base_url=self.base) as c:
+            return c.post("/orders", json=payload).json()
+
+
+class _Unpooled:
+    def __init__(self, base):
+        self.base = base
+
+    async def create_order(self, payload):
+        gw = RazorpayGateway(self.base, "k", "s", 10, 2, 20)
+        try:
+            return await gw.create_order(payload)
+        finally:
+            await gw.aclose()
+
+
+async def run(n: int, latency: float):
+    db = _fakes.install_fake_db()
+    settings.razorpay_key_id, settings.razorpay_key_secret = "rzp_test", "secret"
+    uid = ObjectId()
+    await db.users.insert_one({"_id": uid, "email": "pay@example.com"})
+    headers = {"Authorization": f"Bearer {create_token(str(uid))}"}
+
+    with serve_thread(make_stub(latency), port=8766) as stub:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for mode, gw in (("blocking", _Blocking(stub)), ("unpooled", _Unpooled(stub)),
+                             ("pooled", RazorpayGateway(stub, "k", "s", 10, 2, 20))):
+                set_gateway(gw)
+                t0 = time.perf_counter()
+                res = await asyncio.gather(*[client.post("/billing/create-order", json={"planId": "lite"}, headers=headers)
+                                             for _ in range(n)])
+                dt = time.perf_counter() - t0
+                ok = sum(r.status_code == 200 for r in res)
+                print(f"{mode:9s} n={n} ok={ok} wall={dt:.2f}s throughput={n / dt:.1f} req/s")
+                if hasattr(gw, "aclose"):
+                    await gw.aclose()
+    set_gateway(None)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=200)
+    ap.add_argument("--latency", type=float, default=0.05)
+    a = ap.parse_args()
+    asyncio.run(run(a.n, a.latency))
@@ -0,0 +1,78 @@
+"""Scoring latency against catalogs of 10, 1k and 50k crops.
+
+    python -m bench.catalog_scale --sizes 10,1000,50000
+
+Sizes above the built-in 10 are synthetic varieties (1-3 soils, 1-2 seasons,
+some climate rules) written to a JSON file and hot-loaded through
+catalog.reload(). Per request, compares a full stable sort of every crop (the
+old path) with the indexed top-3 selection the routes use, with and without
+climate, and checks both pick the same crops.
+"""
+import argparse, json, os, random, tempfile, time
+from bench import _fakes  # noqa: F401  (env defaults)
+import numpy as np
+from app.engine import catalog
+from app.engine.crops import CROPS
+from app.engine.scorer import CLIMATE_FIELDS, SEASONS, SOILS
+
+
+def synthetic(n: int, seed: int = 1):
+    rnd = random.Random(seed)
+    out = list(CROPS)
+    while len(out) < n:
+        base = rnd.choice(CROPS)
+        entry = {"crop": f"{base['crop']} v{len(out)}",
+                 "soils": {s: round(rnd.uniform(0.3, 0.95), 2) for s in rnd.sample(SOILS, rnd.randint(1, 3))},
+                 "seasons": {s: round(rnd.uniform(0.3, 0.95), 2) for s in rnd.sample(SEASONS, rnd.randint(1, 2))},
+                 "duration": base["duration"] + rnd.randint(-15, 15), "yield": base["yield"]}
+        if rnd.random() < 0.3:
+            lo = rnd.uniform(5, 25)
+            entry["climate"] = {"tempC": {"range": [round(lo, 1), round(lo + 10, 1)], "bonus": 0.04, "penalty": -0.02}}
+        out.append(entry)
+    return out[:n]
+
+
+def requests(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    return [(rnd.choice(SOILS), rnd.choice(SEASONS),
+             None if rnd.random() < 0.5 else {f: rnd.uniform(5, 40) for f in CLIMATE_FIELDS}) for _ in range(n)]
+
+
+def per_request(fn, reqs):
+    t0 = time.perf_counter()
+    for soil, season, climate in reqs:
+        fn(soil, season, climate)
+    return (time.perf_counter() - t0) / len(reqs) * 1e6
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10,1000,50000")
+    ap.add_argument("-n", type=int, default=2000, help="requests per measurement")
+    a = ap.parse_args()
+
+    reqs = requests(a.n)
+    with_climate = [r for r in reqs if r[2]]
+    without = [r for r in reqs if not r[2]]
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in a.sizes.split(",")):
+            path = os.path.join(tmp, f"catalog_{size}.json")
+            with open(path, "w") as f:
+                json.dump(synthetic(size), f)
+            t0 = time.perf_counter()
+            catalog.reload(path)
+            t_load = time.perf_counter() - t0
+            cat = catalog.current()
+
+            def full_sort(soil, season, climate):
+                return cat.score(soil, season, climate)[:3]
+
+            def top3(soil, season, climate):
+                return cat.score(soil, season, climate, k=3)
+
+            same = all([c["crop"] for c, _ in full_sort(*r)] == [c["crop"] for c, _ in top3(*r)] for r in reqs[:300])
+            cands = np.mean([len(cat.candidates(SOILS.index(s), SEASONS.index(e))) for s, e, _ in reqs])
+            print(f"crops={size:>6} reload {t_load * 1e3:7.1f} ms  candidates/request {cands:8.0f}  "
+                  f"climate: full sort {per_request(full_sort, with_climate):8.1f} µs  "
+                  f"top-3 {per_request(top3, with_climate):7.1f} µs  "
+                  f"no climate: top-3 {per_request(top3, without):5.1f} µs  same picks {same}")
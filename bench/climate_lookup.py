@@ -0,0 +1,67 @@
+"""Climate normals lookups: one request vs. a vectorized batch.
+
+    python -m bench.climate_lookup -n 10000
+
+Builds a synthetic 0.25 deg grid over India through app.jobs.build_climate_grid
+(temperature falling linearly with latitude, so bilinear lookups can be checked
+exactly), opens it memory-mapped, then times fill() per request and one
+fill_many() for n coordinates with both interpolation methods.
+"""
+import argparse, csv, os, random, tempfile, time
+from bench import _fakes  # noqa: F401  (env defaults)
+import numpy as np
+from app.config import settings
+from app.engine import climate_grid
+from app.jobs.build_climate_grid import build, read
+from app.engine.climate_grid import ClimateGrid
+
+LAT, LNG, STEP = (6.0, 38.0), (68.0, 98.0), 0.25
+
+
+def temp(lat, month):
+    return 35 - 0.5 * (lat - LAT[0]) - 3 * abs(month - 6)
+
+
+def write_csv(path):
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["lat", "lon", "month", "tempC", "humidity", "rain_mm"])
+        for lat in np.arange(LAT[0], LAT[1] + 1e-9, STEP):
+            for lng in np.arange(LNG[0], LNG[1] + 1e-9, STEP):
+                for m in range(1, 13):
+                    w.writerow([round(lat, 2), round(lng, 2), m, temp(lat, m), 60 + (lng - LNG[0]),
+                                max(0, 250 - 40 * abs(m - 7))])
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=10000)
+    n = ap.parse_args().n
+    rnd = random.Random(3)
+    pts = [({"tempC": None, "humidity": None, "rain_mm": None},
+            {"lat": rnd.uniform(*LAT), "lng": rnd.uniform(*LNG)}, rnd.randint(1, 12)) for _ in range(n)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src, out = os.path.join(tmp, "normals.csv"), os.path.join(tmp, "grid.npy")
+        write_csv(src)
+        t0 = time.perf_counter()
+        fields, rows = read(src)
+        values, lat0, lng0, step = build(rows, fields, None)
+        ClimateGrid.save(out, values, lat0, lng0, step, fields)
+        t_build = time.perf_counter() - t0
+        climate_grid.load(out)
+        print(f"grid {values.shape} ({values.nbytes / 1e6:.1f} MB) built in {t_build:.2f}s")
+
+        for method in ("nearest", "bilinear"):
+            settings.climate_interp = method
+            t0 = time.perf_counter()
+            for p in pts[:2000]:
+                climate_grid.fill(*p)
+            single = (time.perf_counter() - t0) / 2000
+            t0 = time.perf_counter()
+            filled = climate_grid.fill_many(pts)
+            batch = time.perf_counter() - t0
+            err = max(abs(f["tempC"] - temp(p[1]["lat"], p[2])) for f, p in zip(filled, pts))
+            print(f"{method:8s} fill(): {single * 1e6:6.1f} µs/request  "
+                  f"fill_many({n}): {batch * 1e3:6.1f} ms ({batch / n * 1e6:.2f} µs/point)  max tempC err {err:.2f}")
+        climate_grid._grid = None  # release the memmap before the directory goes
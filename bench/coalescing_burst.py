@@ -0,0 +1,75 @@
+"""A burst of identical /recommend requests (a district advisory going out).
+
+    python -m bench.coalescing_burst -n 300 --latency 1.0
+    python -m bench.coalescing_burst -n 300 --latency 1.0 --fail    # the one LLM call fails
+
+Many users send the same soil/season/month at once against a slow fake LLM,
+first with ENRICH_COALESCE off, then on. Reports LLM calls, wall time, p50/p95,
+freshness counts and the coalescing ratio. With --fail every call raises, to
+check that followers land on the fallback path with their leader.
+"""
+import argparse, asyncio, time
+from bench import _fakes
+from bench._util import summary_ms
+
+import httpx
+from bson import ObjectId
+from app.config import settings
+from app.main import app
+from app.engine import enrich_cache, llm_batch
+from app.security import create_token
+
+BODY = {"soilType": "black", "season": "kharif", "month": 7}
+
+
+async def burst(client, users, n: int):
+    lat, fresh = [], {}
+
+    async def one(i):
+        t0 = time.perf_counter()
+        r = await client.post("/recommend", json=BODY, headers=users[i % len(users)])
+        lat.append(time.perf_counter() - t0)
+        f = r.json().get("freshness", r.status_code)
+        fresh[f] = fresh.get(f, 0) + 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(n)])
+    return time.perf_counter() - t0, lat, fresh
+
+
+async def run(n: int, latency: float, fail: bool):
+    db = _fakes.install_fake_db()
+    users = []
+    for i in range(50):
+        uid = ObjectId()
+        await db.users.insert_one({"_id": uid, "email": f"burst{i}@example.com"})
+        await db.subscriptions.insert_one({"userId": uid, "planId": "pro", "active": True})
+        users.append({"Authorization": f"Bearer {create_token(str(uid))}"})
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120) as client:
+        for coalesce in (False, True):
+            settings.enrich_coalesce = coalesce
+            llm_batch._llm = _fakes.FakeLLM(latency, fail_rate=1.0 if fail else 0.0)
+            llm_batch._prompt()
+            enrich_cache._local.clear()
+            enrich_cache._last_good.clear()
+            db.enrich_cache.docs.clear()
+            db.enrich_cache._ids.clear()
+            before = dict(enrich_cache._flights)
+            wall, lat, fresh = await burst(client, users, n)
+            leaders = enrich_cache._flights["leader"] - before["leader"]
+            followers = enrich_cache._flights["follower"] - before["follower"]
+            while enrich_cache._background:      # calls that outlived the budget still hold LLM slots
+                await asyncio.sleep(0.05)
+            print(f"coalesce={str(coalesce):5s} llm_calls={llm_batch._llm.calls:4d} wall={wall:6.2f}s "
+                  f"{summary_ms(lat)} freshness={fresh} "
+                  f"ratio={followers / max(1, leaders + followers):.3f}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=300)
+    ap.add_argument("--latency", type=float, default=1.0)
+    ap.add_argument("--fail", action="store_true")
+    a = ap.parse_args()
+    asyncio.run(run(a.n, a.latency, a.fail))
@@ -0,0 +1,36 @@
+"""Import time and RSS of a fresh worker, lazy engines vs. everything loaded up front.
+
+    python -m bench.cold_start -n 5
+"""
+import argparse, json, statistics, subprocess, sys
+
+_PROBE = """
+import os, resource, sys, time
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+t0 = time.perf_counter()
+import app.main
+if sys.argv[1] == "eager":
+    from app.engine import registry
+    for name in registry.ENGINES:
+        registry.engine(name)
+    registry.json_model()
+dt = time.perf_counter() - t0
+print(dt, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+"""
+
+
+def probe(mode: str):
+    out = subprocess.run([sys.executable, "-c", _PROBE, mode], capture_output=True, text=True, check=True).stdout
+    dt, rss = map(float, out.split())
+    return dt, rss
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=5)
+    n = ap.parse_args().n
+    for mode in ("lazy", "eager"):
+        runs = [probe(mode) for _ in range(n)]
+        print(json.dumps({"mode": mode, "n": n,
+                          "import_s": round(statistics.median(r[0] for r in runs), 3),
+                          "rss_mb": round(statistics.median(r[1] for r in runs), 1)}))
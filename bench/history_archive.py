@@ -0,0 +1,90 @@
+"""Hot/archive history tiers: what moves, what it costs on disk, lookup latency.
+
+    python -m bench.history_archive -n 5000 --months 24 --hot-days 180
+
+Spreads N synthetic histories (see bench.history_storage) evenly over the
+last --months, writes them compacted through the write-behind path, then runs
+one archive pass into a temp directory. Reports hot collection bytes before
+and after, archive bytes on disk and the codec, then times GET /history/{id}
+(history.get_history) for hot and archived rows and checks both return the
+original doc.
+"""
+import argparse, asyncio, os, random, struct, tempfile, time
+from bench import _fakes
+from bench._util import summary_ms
+from bench.history_storage import bson_bytes, synthetic
+
+from bson import ObjectId
+from datetime import datetime, timedelta
+from app import history_archive
+from app.config import settings
+from app.history import get_history
+from app.writeback import writer
+
+
+def stamp(docs, months: int, now: datetime):
+    """createdAt evenly over the window, with _ids minted at the same instant."""
+    span = timedelta(days=30 * months)
+    for i, d in enumerate(docs):
+        t = now - span + span * (i / len(docs))
+        d["createdAt"] = t.replace(microsecond=(t.microsecond // 1000) * 1000)  # BSON keeps ms
+        d["_id"] = ObjectId(struct.pack(">I", int(t.timestamp())) + os.urandom(8))
+    return docs
+
+
+async def timed_gets(docs, by_id, samples: int):
+    lat, bad = [], 0
+    for d in random.Random(5).sample(docs, min(samples, len(docs))):
+        t0 = time.perf_counter()
+        got = await get_history(str(d["_id"]), user={"id": str(d["userId"])})
+        lat.append(time.perf_counter() - t0)
+        want = dict(by_id[d["_id"]], _id=str(d["_id"]), id=str(d["_id"]), userId=str(d["userId"]))
+        bad += got != want
+    return summary_ms(lat), bad
+
+
+async def run(n: int, distinct: int, months: int, hot_days: int, samples: int):
+    db = _fakes.install_fake_db()
+    now = datetime.utcnow()
+    originals = stamp(synthetic(n, distinct), months, now)
+    by_id = {d["_id"]: dict(d) for d in originals}
+    await writer.put_histories([dict(d) for d in originals])
+    hot_before = bson_bytes(db.histories.docs)
+
+    with tempfile.TemporaryDirectory() as root:
+        settings.history_archive_dir = root
+        settings.history_hot_days = hot_days
+        t0 = time.perf_counter()
+        res = await history_archive.run_once(now)
+        t_run = time.perf_counter() - t0
+        on_disk = sum(os.path.getsize(os.path.join(dp, f)) for dp, _, fs in os.walk(root) for f in fs)
+        files = sum(len(fs) for _, _, fs in os.walk(root))
+        s = history_archive.stats()
+        print(f"histories={n} over {months} months, hot_days={hot_days}: {res} in {t_run:.2f}s")
+        print(f"hot collection: {hot_before / 1e6:.2f} MB -> {bson_bytes(db.histories.docs) / 1e6:.2f} MB "
+              f"({len(db.histories.docs)} rows)")
+        print(f"archive: {on_disk / 1e6:.2f} MB in {files} user-month files, codec={s['codec']} "
+              f"ratio={s.get('compression_ratio')}; index rows {len(db.history_archive.docs)}")
+
+        hot_ids = {d["_id"] for d in db.histories.docs}
+        hot = [d for d in originals if d["_id"] in hot_ids]
+        cold = [d for d in originals if d["_id"] not in hot_ids]
+        for label, docs in (("hot", hot), ("archived", cold)):
+            if docs:
+                lat, bad = await timed_gets(docs, by_id, samples)
+                print(f"get_history {label:8s} {lat} mismatches={bad}")
+
+        settings.history_archive_days = 365
+        expired = await history_archive.expire((now - timedelta(days=365)).strftime("%Y-%m"))
+        print(f"expire >365d: {expired} month buckets, index rows left {len(db.history_archive.docs)}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=5000)
+    ap.add_argument("--distinct", type=int, default=300)
+    ap.add_argument("--months", type=int, default=24)
+    ap.add_argument("--hot-days", type=int, default=180)
+    ap.add_argument("--samples", type=int, default=300)
+    a = ap.parse_args()
+    asyncio.run(run(a.n, a.distinct, a.months, a.hot_days, a.samples))
@@ -0,0 +1,101 @@
+"""History storage with enrichment payloads inline vs deduplicated by hash.
+
+    python -m bench.history_storage -n 20000 --distinct 300
+
+Builds N synthetic history docs the way /recommend does (ranked crops merged
+with an enrichment) drawing on K distinct enrichment answers, as the shared
+enrichment cache would hand out. Loads them whole into the fake Mongo, runs
+the compact_histories migration over them, and reports BSON bytes before and
+after (rows plus the `enrichments` collection). Then times rehydration of
+history pages and checks every rehydrated doc equals its original.
+"""
+import argparse, asyncio, copy, random, time
+from bench import _fakes
+from bench._util import summary_ms
+
+import bson
+from bson import ObjectId
+from datetime import datetime, timedelta
+from app import enrichment_store
+from app.engine.pipeline import merge, rank
+from app.engine.scorer import SEASONS, SOILS
+from app.jobs.compact_histories import migrate
+
+PESTS = ("aphid", "stem borer", "leaf blight", "whitefly", "rust", "wilt")
+
+
+def enrichment(rnd: random.Random, crops):
+    """An LLM-sized answer: a paragraph, a handful of practices, a few risks."""
+    return [{
+        "crop": c["crop"],
+        "explanation": " ".join(f"{c['crop']} suits this field because of reason {rnd.randint(0, 9999)}."
+                                for _ in range(5)),
+        "best_practices": [f"practice {rnd.randint(0, 9999)}: sow, irrigate and weed on schedule" for _ in range(5)],
+        "pest_disease": {"risks": [{"name": p, "likelihood": rnd.choice(("low", "medium", "high")),
+                                    "tip": f"scout weekly; treat at threshold {rnd.randint(1, 20)}"}
+                                   for p in rnd.sample(PESTS, 3)]},
+    } for c in crops]
+
+
+def synthetic(n: int, distinct: int, seed: int = 3):
+    rnd = random.Random(seed)
+    answers = []
+    for _ in range(distinct):
+        soil, season, month = rnd.choice(SOILS), rnd.choice(SEASONS), rnd.randint(1, 12)
+        climate = {"tempC": round(rnd.uniform(15, 35), 1), "humidity": rnd.randint(30, 90)}
+        base, crop_min = rank(soil, season, climate)
+        answers.append((soil, season, month, climate, base, enrichment(rnd, crop_min)))
+    users = [ObjectId() for _ in range(max(1, n // 20))]
+    t0 = datetime(2026, 1, 1)
+    docs = []
+    for i in range(n):
+        soil, season, month, climate, base, enriched = rnd.choice(answers)
+        docs.append({"_id": ObjectId(), "userId": rnd.choice(users),
+                     "request": {"soilType": soil, "season": season, "month": month, "climate": climate},
+                     "items": merge(base, enriched), "createdAt": t0 + timedelta(seconds=i)})
+    return docs
+
+
+def bson_bytes(docs) -> int:
+    return sum(len(bson.encode(d)) for d in docs)
+
+
+async def run(n: int, distinct: int, page: int):
+    db = _fakes.install_fake_db()
+    originals = synthetic(n, distinct)
+    await db.histories.insert_many(copy.deepcopy(originals))
+    before = bson_bytes(db.histories.docs)
+
+    t0 = time.perf_counter()
+    compacted = await migrate(batch=500, dry_run=False)
+    t_migrate = time.perf_counter() - t0
+    rows, payloads = bson_bytes(db.histories.docs), bson_bytes(db.enrichments.docs)
+    print(f"histories={n} distinct enrichments={distinct} compacted={compacted} in {t_migrate:.2f}s")
+    print(f"before: histories {before / 1e6:8.2f} MB")
+    print(f"after:  histories {rows / 1e6:8.2f} MB + enrichments {payloads / 1e6:6.2f} MB "
+          f"({len(db.enrichments.docs)} docs) = {(rows + payloads) / 1e6:.2f} MB, "
+          f"{(rows + payloads) / before:.1%} of before")
+    assert await migrate(batch=500, dry_run=True) == 0, "re-run found uncompacted rows"
+
+    by_id = {d["_id"]: d for d in originals}
+    stored = sorted(db.histories.docs, key=lambda d: d["_id"])
+    for label, clear in (("cold", True), ("warm", False)):
+        lat, bad = [], 0
+        for i in range(0, len(stored), page):
+            if clear:
+                enrichment_store._payloads.clear()
+            docs = [dict(d) for d in stored[i:i + page]]
+            t0 = time.perf_counter()
+            await enrichment_store.rehydrate(docs)
+            lat.append(time.perf_counter() - t0)
+            bad += sum(d != by_id[d["_id"]] for d in docs)
+        print(f"rehydrate {label} page={page}: {summary_ms(lat)} mismatches={bad}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=20000)
+    ap.add_argument("--distinct", type=int, default=300)
+    ap.add_argument("--page", type=int, default=20)
+    a = ap.parse_args()
+    asyncio.run(run(a.n, a.distinct, a.page))
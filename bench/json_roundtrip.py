@@ -0,0 +1,58 @@
+"""Parse + serialize cost per recommendation: the old stdlib path against the
+one-pass pydantic parse and orjson response.
+
+    python -m bench.json_roundtrip -n 20000
+"""
+import argparse, json, time
+from bench import _fakes
+
+from langchain_core.messages import HumanMessage
+from app.engine import llm_batch
+from app.engine.pipeline import merge, rank
+from app.main import _prevalidated
+from app.schema import RecommendResponse
+
+
+def _old_clamp(it):
+    it["best_practices"] = (it.get("best_practices") or [])[:3]
+    it.setdefault("market", {"trend": "steady", "last6m": []})
+    it["market"]["last6m"] = (it["market"].get("last6m") or [])[:6]
+    it.setdefault("pest_disease", {"risks": []})
+    it["pest_disease"]["risks"] = (it["pest_disease"].get("risks") or [])[:3]
+    return it
+
+
+def old_path(content, base_items):
+    enriched = [_old_clamp(it) for it in json.loads(content)["items"]]
+    final = merge(base_items, enriched)
+    # what FastAPI does with a dict return + response_model: validate, dump, stdlib encode
+    validated = RecommendResponse.model_validate({"items": final, "freshness": "fresh"})
+    return json.dumps(validated.model_dump(mode="json"), ensure_ascii=False).encode()
+
+
+def new_path(content, base_items):
+    enriched = llm_batch._parse(content)["items"]
+    return _prevalidated({"items": merge(base_items, enriched), "freshness": "fresh"}).body
+
+
+def bench(fn, n, content, base_items):
+    fn(content, base_items)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn(content, base_items)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=20000)
+    n = ap.parse_args().n
+
+    base_items, crop_min = rank("loamy", "kharif", None)
+    content = _fakes._payload([HumanMessage(content=str(crop_min))])
+    assert json.loads(old_path(content, base_items)) == json.loads(new_path(content, base_items))
+
+    old = bench(old_path, n, content, base_items)
+    new = bench(new_path, n, content, base_items)
+    print(f"stdlib + response_model  {old:7.1f} us/recommendation")
+    print(f"one-pass + orjson        {new:7.1f} us/recommendation  ({old / new:.1f}x)")
@@ -0,0 +1,53 @@
+"""What /recommend returns when the LLM is slower than the plan's latency budget.
+
+    python -m bench.latency_budget --latency 2.0 --budget 0.3
+"""
+import argparse, asyncio, time
+from datetime import datetime, timedelta
+from bench import _fakes
+
+import httpx
+from bson import ObjectId
+from app.main import app
+from app.engine import enrich_cache, llm_batch
+from app.plans import PLANS
+from app.security import create_token
+
+
+async def run(latency: float, budget: float):
+    db = _fakes.install_fake_db()
+    llm_batch._llm = _fakes.FakeLLM(latency)
+    llm_batch._prompt()
+    uid = ObjectId()
+    await db.users.insert_one({"_id": uid, "email": "b@example.com"})
+    await db.subscriptions.insert_one({"userId": uid, "planId": "pro", "active": True})
+    PLANS["pro"]["latency_budget_s"] = budget
+    headers = {"Authorization": f"Bearer {create_token(str(uid))}"}
+    body = {"soilType": "clay", "season": "kharif", "month": 8, "climate": {"tempC": 31}}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=30) as client:
+        async def call(label):
+            t0 = time.perf_counter()
+            r = await client.post("/recommend", json=body, headers=headers)
+            print(f"{label:34s} {time.perf_counter() - t0:6.3f}s  {r.json()['freshness']}")
+
+        await call("cold cache")
+        await asyncio.sleep(latency + 0.1)          # background call lands
+        await call("after background refresh")
+
+        # age the entry past freshness: local tier dropped, shared doc marked stale
+        enrich_cache._local.clear()
+        for d in db.enrich_cache.docs:
+            d["freshUntil"] = datetime.utcnow() - timedelta(seconds=1)
+        await call("entry stale, LLM slow")
+        await asyncio.sleep(latency + 0.1)
+        await call("after background refresh")
+    print("outcomes", enrich_cache.stats()["outcomes"])
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=2.0)
+    ap.add_argument("--budget", type=float, default=0.3)
+    a = ap.parse_args()
+    asyncio.run(run(a.latency, a.budget))
@@ -0,0 +1,272 @@
+"""Offline load test: the whole app against local stand-ins, JSON report per route.
+
+    python -m bench.loadtest --duration 20 -c 64 --out run.json
+    python -m bench.loadtest --duration 20 -c 64 --baseline run.json   # exit 1 on regression
+    python -m bench.loadtest --mix recommend=1 --llm-ms 800 --llm-fail 0.05
+    python -m bench.loadtest --mongo-uri mongodb://localhost:27017/loadtest   # a local mongod instead of the fake
+
+Stand-ins: bench._fakes (Mongo collections, ChatOpenAI with latency and failure
+rate) and bench._gateway_stub (Razorpay Orders API on a local port). The
+write-behind queue and webhook inbox run as in production.
+"""
+import argparse, asyncio, hashlib, hmac, json, random, subprocess, sys, time
+from bench import _fakes
+from bench._gateway_stub import make_stub
+from bench._util import pct, serve, serve_thread
+
+import httpx
+from bson import ObjectId
+from app.billing import webhook_inbox
+from app.config import settings
+from app.engine import llm_batch
+from app.gateway import RazorpayGateway, set_gateway
+from app.main import app
+from app.plans import PLANS
+from app.security import create_token
+from app.writeback import writer
+
+SECRET = "whsec_loadtest"
+SOILS = ["clay", "sandy", "loamy", "black", "silt", "peat", "chalk"]
+SEASONS = ["kharif", "rabi", "zaid"]
+DEFAULT_MIX = "recommend=45,history=25,subscription=25,webhook=5"
+
+
+def parse_mix(spec: str):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ROUTES:
+            raise SystemExit(f"unknown route in --mix: {name} (have {', '.join(ROUTES)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class World:
+    """Seeded users, orders and the gateway's view of them."""
+
+    def __init__(self, rnd: random.Random, users: int, gateway_orders: dict):
+        self.rnd = rnd
+        self.users = []
+        self.orders = []
+        self.gateway_orders = gateway_orders
+        self.webhooks_sent = 0
+        self._users = users
+
+    async def seed(self, db):
+        plans = ["free", "lite", "pro"]
+        for i in range(self._users):
+            uid = ObjectId()
+            plan = plans[i % 3]
+            await db.users.insert_one({"_id": uid, "email": f"load{i}@example.com", "name": f"load{i}"})
+            if plan != "free":
+                await db.subscriptions.insert_one({"userId": uid, "planId": plan, "active": True})
+            self.users.append((str(uid), {"Authorization": f"Bearer {create_token(str(uid))}"}))
+            # half the orders are ours, half only the gateway knows (webhook -> fetch_order)
+            order_id = f"order_load_{i:06d}"
+            receipt = f"{uid}|lite|0"
+            if i % 2:
+                await db.orders.insert_one({"order_id": order_id, "userId": uid, "planId": "lite",
+                                            "receipt": receipt, "status": "created"})
+            self.gateway_orders[order_id] = {"id": order_id, "receipt": receipt, "amount": 19900,
+                                             "currency": "INR", "status": "created"}
+            self.orders.append(order_id)
+
+    def user(self):
+        return self.rnd.choice(self.users)
+
+
+async def r_recommend(client, w: World):
+    _, headers = w.user()
+    body = {"soilType": w.rnd.choice(SOILS), "season": w.rnd.choice(SEASONS), "month": w.rnd.randint(1, 12)}
+    if w.rnd.random() < 0.5:
+        body["climate"] = {"tempC": round(w.rnd.uniform(10, 40), 1), "rain_mm": round(w.rnd.uniform(0, 300))}
+    return await client.post("/recommend", json=body, headers=headers)
+
+
+async def r_history(client, w: World):
+    _, headers = w.user()
+    return await client.get("/history/", params={"limit": 20, "view": w.rnd.choice(["full", "summary"])},
+                            headers=headers)
+
+
+async def r_subscription(client, w: World):
+    _, headers = w.user()
+    return await client.get("/billing/me/subscription", headers=headers)
+
+
+async def r_webhook(client, w: World):
+    # ~10% are gateway retries of an earlier event
+    i = w.rnd.randrange(len(w.orders)) if w.rnd.random() < 0.1 or w.webhooks_sent >= len(w.orders) \
+        else w.webhooks_sent
+    w.webhooks_sent += 1
+    body = json.dumps({"event": "payment.captured", "payload": {"payment": {"entity": {
+        "id": f"pay_load_{i:06d}", "order_id": w.orders[i], "amount": 19900, "currency": "INR"}}}})
+    sig = hmac.new(SECRET.encode(), body.encode(), hashlib.sha256).hexdigest()
+    return await client.post("/billing/webhook", content=body,
+                             headers={"x-razorpay-signature": sig, "content-type": "application/json"})
+
+
+ROUTES = {
+    "recommend": ("POST /recommend", r_recommend),
+    "history": ("GET /history/", r_history),
+    "subscription": ("GET /billing/me/subscription", r_subscription),
+    "webhook": ("POST /billing/webhook", r_webhook),
+}
+
+
+async def drive(client, world: World, mix, concurrency: int, duration: float, total: int):
+    names, weights = list(mix), list(mix.values())
+    samples = {n: [] for n in names}
+    statuses = {n: {} for n in names}
+    sent = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal sent
+        while (total and sent < total) or (not total and time.perf_counter() < deadline):
+            sent += 1
+            name = world.rnd.choices(names, weights)[0]
+            t0 = time.perf_counter()
+            try:
+                code = (await ROUTES[name][1](client, world)).status_code
+            except Exception as e:
+                code = type(e).__name__
+            samples[name].append(time.perf_counter() - t0)
+            statuses[name][str(code)] = statuses[name].get(str(code), 0) + 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return samples, statuses, time.perf_counter() - t0
+
+
+def _route_report(lat, codes, elapsed):
+    ok = sum(n for c, n in codes.items() if c.startswith("2"))
+    return {"count": len(lat), "ok": ok, "statuses": codes,
+            "rps": round(len(lat) / elapsed, 1),
+            "p50_ms": round(pct(lat, 0.50) * 1e3, 2), "p95_ms": round(pct(lat, 0.95) * 1e3, 2),
+            "p99_ms": round(pct(lat, 0.99) * 1e3, 2)}
+
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(report, baseline, tolerance: float):
+    """Routes whose p50/p95 rose, or whose throughput fell, by more than `tolerance`."""
+    out = []
+    for route, cur in report["routes"].items():
+        old = baseline.get("routes", {}).get(route)
+        if not old:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if old[metric] and cur[metric] > old[metric] * (1 + tolerance):
+                out.append({"route": route, "metric": metric, "baseline": old[metric], "current": cur[metric]})
+        if old["rps"] and cur["rps"] < old["rps"] * (1 - tolerance):
+            out.append({"route": route, "metric": "rps", "baseline": old["rps"], "current": cur["rps"]})
+    return out
+
+
+async def run(a):
+    rnd = random.Random(a.seed)
+    if a.mongo_uri:
+        from app.db import close, connect, db, ensure_indexes
+        settings.mongodb_uri = a.mongo_uri
+        await connect()
+        await ensure_indexes()
+    else:
+        db = _fakes.install_fake_db(a.mongo_ms / 1e3)
+    llm_batch._llm = _fakes.FakeLLM(a.llm_ms / 1e3, a.llm_fail, seed=a.seed)
+    llm_batch._prompt()
+    settings.razorpay_webhook_secret = SECRET
+    settings.rate_limit_enabled = a.rate_limit
+    if not a.real_quotas:
+        for p in PLANS.values():
+            p["monthly_quota"] = 10 ** 9
+
+    stub = make_stub(a.gateway_ms / 1e3, a.gateway_fail)
+    world = World(rnd, a.users, stub.state.orders)
+    await world.seed(db)
+    mix = parse_mix(a.mix)
+
+    with serve_thread(stub, port=a.gateway_port) as stub_url:
+        set_gateway(RazorpayGateway(stub_url, "rzp_test", "secret", settings.gateway_timeout_s,
+                                    settings.gateway_max_retries, settings.gateway_max_connections))
+        writer.start()
+        webhook_inbox.start()
+        try:
+            if a.http:
+                async with serve(app, port=a.port) as url, \
+                        httpx.AsyncClient(base_url=url, timeout=60,
+                                          limits=httpx.Limits(max_connections=a.concurrency)) as client:
+                    samples, statuses, elapsed = await drive(client, world, mix, a.concurrency, a.duration, a.n)
+            else:
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load",
+                                             timeout=60) as client:
+                    samples, statuses, elapsed = await drive(client, world, mix, a.concurrency, a.duration, a.n)
+        finally:
+            await webhook_inbox.stop()
+            await writer.stop()
+            if a.mongo_uri:
+                close()
+
+    all_lat = [x for v in samples.values() for x in v]
+    all_codes = {}
+    for codes in statuses.values():
+        for c, n in codes.items():
+            all_codes[c] = all_codes.get(c, 0) + n
+    return {
+        "app_version": app.version,
+        "git": _git_rev(),
+        "python": sys.version.split()[0],
+        "config": {k: getattr(a, k) for k in ("duration", "n", "concurrency", "users", "mix", "llm_ms", "llm_fail",
+                                              "mongo_ms", "gateway_ms", "gateway_fail", "http", "rate_limit",
+                                              "real_quotas", "seed")} | {"mongo": "uri" if a.mongo_uri else "fake"},
+        "elapsed_s": round(elapsed, 3),
+        "routes": {ROUTES[n][0]: _route_report(samples[n], statuses[n], elapsed) for n in mix if samples[n]},
+        "total": _route_report(all_lat, all_codes, elapsed),
+        "llm": {"calls": llm_batch._llm.calls, "failures": llm_batch._llm.failures},
+        "writeback": writer.stats(),
+        "webhooks": webhook_inbox.stats(),
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds to run (ignored with -n)")
+    ap.add_argument("-n", type=int, default=0, help="total requests instead of a duration")
+    ap.add_argument("-c", "--concurrency", type=int, default=32)
+    ap.add_argument("--users", type=int, default=300)
+    ap.add_argument("--mix", default=DEFAULT_MIX, help=f"route=weight,... (default {DEFAULT_MIX})")
+    ap.add_argument("--llm-ms", type=float, default=300.0)
+    ap.add_argument("--llm-fail", type=float, default=0.02)
+    ap.add_argument("--mongo-ms", type=float, default=1.0, help="simulated round trip of the fake collections")
+    ap.add_argument("--mongo-uri", help="use a real (local) MongoDB instead of the fake collections")
+    ap.add_argument("--gateway-ms", type=float, default=50.0)
+    ap.add_argument("--gateway-fail", type=float, default=0.0)
+    ap.add_argument("--gateway-port", type=int, default=8767)
+    ap.add_argument("--http", action="store_true", help="serve over a local uvicorn socket instead of in-process ASGI")
+    ap.add_argument("--port", type=int, default=8768)
+    ap.add_argument("--rate-limit", action="store_true", help="keep the per-user rate limiter on")
+    ap.add_argument("--real-quotas", action="store_true", help="keep plan quotas (free users get 402s quickly)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="write the JSON report here as well as to stdout")
+    ap.add_argument("--baseline", help="earlier report to compare against; exit 1 on regression")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="allowed p95/throughput drift vs baseline")
+    a = ap.parse_args()
+
+    baseline = None
+    if a.baseline:
+        with open(a.baseline) as f:
+            baseline = json.load(f)
+    report = asyncio.run(run(a))
+    if baseline is not None:
+        report["regressions"] = compare(report, baseline, a.tolerance)
+    text = json.dumps(report, indent=2)
+    if a.out:
+        with open(a.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    sys.exit(1 if report.get("regressions") else 0)
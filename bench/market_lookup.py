@@ -0,0 +1,78 @@
+"""Mandi price ingest and MarketInfo lookups on synthetic data.
+
+    python -m bench.market_lookup --markets 300 --days 730
+
+Writes a CSV with one modal price per crop x market x day (each crop with its
+own drift), times a full ingest, an incremental one-day drop, the
+aggregate/trend pass, and the per-request lookup the routes now do instead of
+an LLM call. Checks the trend each crop was generated with is the one found.
+"""
+import argparse, csv, os, random, tempfile, time
+from datetime import date, timedelta
+from bench import _fakes  # noqa: F401  (env defaults)
+from app.engine import market
+from app.engine.catalog import current
+from app.engine.market_store import PriceStore, read_price_file, summarize
+
+DRIFT = {"rising": 0.03, "steady": 0.0, "falling": -0.03}  # per month
+
+
+def write_csv(path, crops, markets: int, start: date, days: int, seed: int):
+    rnd = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["State", "District", "Market", "Commodity", "Variety", "Arrival_Date", "Modal_x0020_Price"])
+        for d in range(days):
+            day = start + timedelta(days=d)
+            for crop, trend in crops:
+                base = 2500 * (1 + DRIFT[trend]) ** (d / 30)
+                for m in range(markets):
+                    w.writerow(["State", f"D{m % 40}", f"M{m}", crop.title(), "Other",
+                                day.strftime("%d/%m/%Y"), round(base * rnd.uniform(0.9, 1.1), 0)])
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--markets", type=int, default=300)
+    ap.add_argument("--days", type=int, default=730)
+    ap.add_argument("--lookups", type=int, default=200_000)
+    a = ap.parse_args()
+
+    trends = list(DRIFT)
+    crops = [(c["crop"], trends[i % 3]) for i, c in enumerate(current().entries)]
+    start = date(2023, 1, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        full, drop, store_path = (os.path.join(tmp, n) for n in ("full.csv", "drop.csv", "store.npz"))
+        write_csv(full, crops, a.markets, start, a.days, seed=1)
+        write_csv(drop, crops, a.markets, start + timedelta(days=a.days), 1, seed=2)
+        mb = os.path.getsize(full) / 1e6
+
+        t0 = time.perf_counter()
+        store = PriceStore()
+        counts = store.append(read_price_file(full))
+        store.save(store_path)
+        t_full = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        store = PriceStore.load(store_path)
+        store.append(read_price_file(drop))
+        store.save(store_path)
+        t_drop = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        summary = summarize(store, 6, 0.015)
+        t_sum = time.perf_counter() - t0
+        store_mb = os.path.getsize(store_path) / 1e6
+
+    market._table = summary
+    names = [c for c, _ in crops]
+    t0 = time.perf_counter()
+    for i in range(a.lookups):
+        market.market_for(names[i % len(names)])
+    t_lookup = (time.perf_counter() - t0) / a.lookups
+
+    wrong = [(c, t, summary[c]["trend"]) for c, t in crops if summary[c]["trend"] != t]
+    print(f"rows={counts['stored']:,} csv={mb:.1f} MB store={store_mb:.1f} MB")
+    print(f"full ingest {t_full:.2f}s ({counts['stored'] / t_full:,.0f} rows/s)  "
+          f"one-day drop {t_drop * 1e3:.0f} ms  aggregate+trend {t_sum * 1e3:.1f} ms")
+    print(f"lookup {t_lookup * 1e6:.2f} µs  trends {'all as generated' if not wrong else wrong}")
@@ -0,0 +1,78 @@
+"""Cost of the metrics hot path, and what it adds up to per /recommend.
+
+    python -m bench.metrics_overhead -n 200000
+"""
+import argparse, asyncio, time
+from bench import _fakes
+
+import httpx
+from bson import ObjectId
+from app import metrics
+from app.engine import llm_batch
+from app.main import app
+from app.security import create_token
+
+
+def per_call_ns(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e9
+
+
+async def per_await_ns(coro_fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await coro_fn()
+    return (time.perf_counter() - t0) / n * 1e9
+
+
+
+async def run(n: int):
+    hist = metrics.Histogram("bench_seconds", "bench", ("stage",))
+    observe = per_call_ns(lambda: hist.observe(0.003, "x"), n)
+
+    def timer():
+        with hist.time("x"):
+            pass
+    timer_ns = per_call_ns(timer, n)
+
+    async def plain():
+        return None
+    decorated = metrics.timed(hist, "x")(plain)
+    deco_ns = await per_await_ns(decorated, n) - await per_await_ns(plain, n)
+
+    print(f"Histogram.observe      {observe:6.0f} ns")
+    print(f"with hist.time(...)    {timer_ns:6.0f} ns")
+    print(f"@timed coroutine       {deco_ns:6.0f} ns over an undecorated await")
+
+    db = _fakes.install_fake_db()
+    llm_batch._llm = _fakes.FakeLLM(0.0)
+    uid = ObjectId()
+    await db.users.insert_one({"_id": uid, "email": "m@example.com"})
+    await db.subscriptions.insert_one({"userId": uid, "planId": "pro", "active": True})
+    headers = {"Authorization": f"Bearer {create_token(str(uid))}"}
+    body = {"soilType": "clay", "season": "kharif", "climate": {"tempC": 30}}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.post("/recommend", json=body, headers=headers)
+        before = sum(s[2] for m in metrics._registry if isinstance(m, metrics.Histogram) for s in m._series.values())
+        reqs = 200
+        t0 = time.perf_counter()
+        for _ in range(reqs):
+            await client.post("/recommend", json=body, headers=headers)
+        per_req = (time.perf_counter() - t0) / reqs * 1e6
+        after = sum(s[2] for m in metrics._registry if isinstance(m, metrics.Histogram) for s in m._series.values())
+        await client.get("/metrics")
+        t0 = time.perf_counter()
+        text = (await client.get("/metrics")).text
+        scrape_ms = (time.perf_counter() - t0) * 1e3
+    obs = (after - before) / reqs
+    print(f"/recommend (cache hit) {per_req:6.0f} us/request, {obs:.0f} timings each "
+          f"~ {obs * deco_ns / 1e3:.1f} us of metrics ({obs * deco_ns / 1e3 / per_req:.1%})")
+    print(f"scrape                 {scrape_ms:.2f} ms, {len(text.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=200000)
+    asyncio.run(run(ap.parse_args().n))
@@ -0,0 +1,70 @@
+"""Fire many parallel /recommend calls at a user with one credit left.
+
+    python -m bench.quota_race -n 100
+
+Exactly one call may succeed; the rest must get 402 and the counter must end
+at the quota. A second round makes the history write fail and checks that the
+reserved credit is released. A third does the same with the write-behind queue
+running, as in production: the response has already gone out when the queued
+row is dropped, so the writer must hand the credit back.
+"""
+import argparse, asyncio
+from collections import Counter
+from bench import _fakes
+
+import httpx
+from bson import ObjectId
+from app.main import app
+from app.engine import llm_batch
+from app.plans import PLANS, month_key
+from app.security import create_token
+from app.writeback import writer
+
+
+async def run(n: int):
+    db = _fakes.install_fake_db()
+    llm_batch._llm = _fakes.FakeLLM(0.01)
+    uid = ObjectId()
+    await db.users.insert_one({"_id": uid, "email": "race@example.com"})  # no subscription -> free plan
+    headers = {"Authorization": f"Bearer {create_token(str(uid))}"}
+    body = {"soilType": "black", "season": "kharif"}
+    quota = PLANS["free"]["monthly_quota"]
+
+    def used():
+        doc = next((d for d in db.usage.docs if d["userId"] == uid and d["monthKey"] == month_key()), None)
+        return doc["count"] if doc else 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app, raise_app_exceptions=False), base_url="http://bench") as client:
+        res = await asyncio.gather(*[client.post("/recommend", json=body, headers=headers) for _ in range(n)])
+        codes = Counter(r.status_code for r in res)
+        print(f"parallel={n} quota={quota} statuses={dict(codes)} used={used()}")
+        assert codes[200] == quota and codes[402] == n - quota and used() == quota
+
+        # free the credit, then fail the history write: the reservation must be rolled back
+        db.usage.docs.clear()
+
+        async def boom(*_, **__):
+            raise RuntimeError("history write failed")
+        db.histories.insert_one = boom
+        r = await client.post("/recommend", json=body, headers=headers)
+        print(f"failed write -> status={r.status_code} used={used()}")
+        assert r.status_code == 500 and used() == 0
+
+        db.histories.insert_many = boom
+        writer.max_retries = 1
+        writer.start()
+        try:
+            r = await client.post("/recommend", json=body, headers=headers)
+            charged = used()
+            await writer.queue.join()
+            print(f"queued write dropped -> status={r.status_code} used={charged} then {used()} "
+                  f"credits_released={writer.stats()['credits_released']}")
+            assert r.status_code == 200 and charged == 1 and used() == 0
+        finally:
+            await writer.stop()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=100)
+    asyncio.run(run(ap.parse_args().n))
@@ -0,0 +1,67 @@
+"""Per-check cost of the rate-limit dependency, and what a hammering client sees.
+
+    python -m bench.ratelimit_overhead -n 200000 --users 1000
+"""
+import argparse, asyncio, time
+from bench import _fakes
+
+import httpx
+from bson import ObjectId
+from app.config import settings
+from app.main import app
+from app.ratelimit import MemoryStore, rate_limited, set_store
+from app.security import create_token
+
+
+async def overhead(n: int, users: int):
+    headers = [f"Bearer {create_token(str(ObjectId()))}" for _ in range(users)]
+    settings.rate_limit_enabled = True
+    store = MemoryStore(settings.rate_limit_max_keys)
+    set_store(store)
+
+    t0 = time.perf_counter()
+    for i in range(n):
+        store.take_now(str(i % users), 1e6, 1e6, 1)
+    bucket_us = (time.perf_counter() - t0) / n * 1e6
+
+    for h in headers:           # first sight of a token pays one signature check
+        await rate_limited(h)
+    t0 = time.perf_counter()
+    for i in range(n):
+        try:
+            await rate_limited(headers[i % users])
+        except Exception:
+            pass
+    dep_us = (time.perf_counter() - t0) / n * 1e6
+    print(f"bucket only       {bucket_us:.2f} us/check")
+    print(f"dependency (warm) {dep_us:.2f} us/check  ({users} users)")
+
+
+async def hammer(burst: int, mongo_ms: float):
+    db = _fakes.install_fake_db(mongo_ms / 1e3)
+    settings.rate_limit_enabled = True
+    set_store(MemoryStore(settings.rate_limit_max_keys))
+    uid = ObjectId()
+    await db.users.insert_one({"_id": uid, "email": "bot@example.com", "name": "bot"})
+    headers = {"Authorization": f"Bearer {create_token(str(uid))}"}
+    body = {"soilType": "loamy", "season": "kharif", "month": 7}
+    codes, retry = {}, None
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+                                 base_url="http://bench") as client:
+        for _ in range(burst):
+            r = await client.post("/recommend", json=body, headers=headers)
+            codes[r.status_code] = codes.get(r.status_code, 0) + 1
+            if r.status_code == 429:
+                retry = r.headers.get("Retry-After")
+    print(f"free user, {burst} back-to-back /recommend: {dict(sorted(codes.items()))} (Retry-After={retry}s)")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=200000)
+    ap.add_argument("--users", type=int, default=1000)
+    ap.add_argument("--burst", type=int, default=20)
+    ap.add_argument("--mongo-ms", type=float, default=1.0)
+    a = ap.parse_args()
+    asyncio.run(overhead(a.n, a.users))
+    asyncio.run(hammer(a.burst, a.mongo_ms))
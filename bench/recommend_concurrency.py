@@ -0,0 +1,49 @@
+"""Drive N concurrent /recommend calls against a sleeping fake LLM.
+
+    python -m bench.recommend_concurrency --mode sync    # old blocking path
+    python -m bench.recommend_concurrency --mode async   # abatch_enrich
+"""
+import argparse, asyncio, time
+from bench import _fakes
+
+import httpx
+from bson import ObjectId
+from app.main import app
+from app.engine import enrich_cache
+from app.engine import llm_batch
+from app.plans import PLANS
+from app.security import create_token
+
+
+async def run(n: int, latency: float, mode: str):
+    db = _fakes.install_fake_db()
+    llm_batch._llm = _fakes.FakeLLM(latency)
+    llm_batch._prompt()   # lazy langchain import; a one-off per worker, not what's measured here
+    if mode == "sync":
+        async def blocking(**kw):
+            return llm_batch.batch_enrich(**kw)
+        enrich_cache.abatch_enrich = blocking
+
+    uid = ObjectId()
+    await db.users.insert_one({"_id": uid, "email": "bench@example.com", "name": "bench"})
+    await db.subscriptions.insert_one({"userId": uid, "planId": "pro", "active": True})
+    PLANS["pro"]["monthly_quota"] = n * 10
+    headers = {"Authorization": f"Bearer {create_token(str(uid))}"}
+    body = {"soilType": "loamy", "season": "kharif", "month": 7}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        t0 = time.perf_counter()
+        res = await asyncio.gather(*[client.post("/recommend", json=body, headers=headers) for _ in range(n)])
+        dt = time.perf_counter() - t0
+    ok = sum(r.status_code == 200 for r in res)
+    print(f"mode={mode} n={n} ok={ok} llm_latency={latency:.3f}s wall={dt:.2f}s throughput={n / dt:.1f} req/s")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mode", choices=["sync", "async"], default="async")
+    ap.add_argument("-n", type=int, default=200)
+    ap.add_argument("--latency", type=float, default=0.05)
+    a = ap.parse_args()
+    asyncio.run(run(a.n, a.latency, a.mode))
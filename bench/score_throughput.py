@@ -0,0 +1,32 @@
+"""Compare per-request score() against one score_many() pass.
+
+    python -m bench.score_throughput -n 10000
+"""
+import argparse, random, time
+from app.engine.scorer import SEASONS, SOILS, score, score_many
+
+
+def profiles(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        climate = None if rnd.random() < 0.5 else {"tempC": rnd.uniform(5, 40), "rain_mm": rnd.uniform(0, 200)}
+        out.append((rnd.choice(SOILS), rnd.choice(SEASONS), climate))
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=10000)
+    n = ap.parse_args().n
+    reqs = profiles(n)
+
+    t0 = time.perf_counter()
+    for soil, season, climate in reqs:
+        score(soil, season, climate)
+    loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    score_many(reqs)
+    batch = time.perf_counter() - t0
+    print(f"n={n} score() loop: {n / loop:,.0f} profiles/s  score_many: {n / batch:,.0f} profiles/s")
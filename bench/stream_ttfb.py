@@ -0,0 +1,43 @@
+"""Time to first useful byte: /recommend vs /recommend/stream.
+
+    python -m bench.stream_ttfb --latency 2.0
+"""
+import argparse, asyncio, json, time
+from bench import _fakes
+from bench._util import serve
+
+import httpx
+from bson import ObjectId
+from app.main import app
+from app.engine import enrich_cache, llm_batch
+from app.security import create_token
+
+
+async def run(latency: float):
+    db = _fakes.install_fake_db()
+    llm_batch._llm = _fakes.FakeLLM(latency)
+    uid = ObjectId()
+    await db.users.insert_one({"_id": uid, "email": "s@example.com"})
+    await db.subscriptions.insert_one({"userId": uid, "planId": "pro", "active": True})
+    headers = {"Authorization": f"Bearer {create_token(str(uid))}"}
+    body = {"soilType": "clay", "season": "kharif", "month": 8}
+
+    async with serve(app) as url, httpx.AsyncClient(base_url=url, timeout=30) as client:
+        t0 = time.perf_counter()
+        r = await client.post("/recommend", json=body, headers=headers)
+        print(f"/recommend         status={r.status_code} first+last byte {time.perf_counter() - t0:.3f}s")
+
+        enrich_cache._local.clear()
+        db.enrich_cache.docs.clear()
+        t0 = time.perf_counter()
+        async with client.stream("POST", "/recommend/stream", json=body, headers=headers) as r:
+            async for line in r.aiter_lines():
+                if line:
+                    print(f"/recommend/stream  +{time.perf_counter() - t0:.3f}s {json.loads(line)['type']}")
+    print(f"histories={len(db.histories.docs)} usage={db.usage.docs[0]['count']}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=2.0)
+    asyncio.run(run(ap.parse_args().latency))
@@ -0,0 +1,51 @@
+"""/billing/me/subscription latency under polling load, cache off vs on.
+
+    python -m bench.summary_polling --users 50 --polls 20 --mongo-ms 3
+"""
+import argparse, asyncio
+from bench import _fakes
+from bench._util import summary_ms, timed
+
+import httpx
+from bson import ObjectId
+from app.config import settings
+from app.main import app
+from app.plans import _subs, activate_subscription
+from app.security import create_token
+from app.usage import _counts
+
+
+async def run(users: int, polls: int, mongo_ms: float):
+    db = _fakes.install_fake_db(mongo_ms / 1e3)
+    tokens = []
+    for i in range(users):
+        uid = ObjectId()
+        await db.users.insert_one({"_id": uid, "email": f"p{i}@example.com"})
+        if i % 2:
+            await activate_subscription(str(uid), "lite")
+        tokens.append({"Authorization": f"Bearer {create_token(str(uid))}"})
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def poller(h):
+            out = []
+            for _ in range(polls):
+                r, dt = await timed(client.get("/billing/me/subscription", headers=h))
+                assert r.status_code == 200, r.text
+                out.append(dt)
+                await asyncio.sleep(0.005)
+            return out
+
+        for label, sub_ttl, usage_ttl in (("no-cache", 0, 0), ("cache", 30, 10)):
+            settings.sub_cache_ttl_s, settings.usage_cache_ttl_s = sub_ttl, usage_ttl
+            _subs.clear(), _counts.clear()
+            lat = [x for xs in await asyncio.gather(*[poller(h) for h in tokens]) for x in xs]
+            print(f"{label:9s} {summary_ms(lat)}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--polls", type=int, default=20)
+    ap.add_argument("--mongo-ms", type=float, default=3.0)
+    a = ap.parse_args()
+    asyncio.run(run(a.users, a.polls, a.mongo_ms))
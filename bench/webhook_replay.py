@@ -0,0 +1,78 @@
+"""Replay signed payment webhooks at /billing/webhook.
+
+    python -m bench.webhook_replay -n 5000 --dup 0.1 --mongo-ms 1
+    python -m bench.webhook_replay --file recorded.ndjson   # one raw webhook body per line
+
+Reports ack latency (route only) and inbox processing throughput (time until
+every stored event is done or dead-lettered).
+"""
+import argparse, asyncio, hashlib, hmac, json, random, time
+from bench import _fakes
+from bench._util import summary_ms, timed
+
+import httpx
+from bson import ObjectId
+from app.billing import webhook_inbox
+from app.config import settings
+from app.main import app
+
+SECRET = "whsec_bench"
+
+
+def synthetic(db, n: int, dup: float):
+    rnd = random.Random(3)
+    bodies = []
+    for i in range(n):
+        uid, order_id = ObjectId(), f"order_{i:08d}"
+        db.orders.docs.append({"order_id": order_id, "userId": uid, "planId": "lite",
+                               "receipt": f"{uid}|lite|0", "status": "created"})
+        bodies.append(json.dumps({"event": "payment.captured", "payload": {"payment": {"entity": {
+            "id": f"pay_{i:08d}", "order_id": order_id, "amount": 19900, "currency": "INR"}}}}))
+    # gateway retries: resend a share of events
+    bodies += [rnd.choice(bodies) for _ in range(int(n * dup))]
+    rnd.shuffle(bodies)
+    return bodies
+
+
+async def run(n: int, dup: float, mongo_ms: float, file: str | None, concurrency: int):
+    db = _fakes.install_fake_db(mongo_ms / 1e3)
+    settings.razorpay_webhook_secret = SECRET
+    bodies = [l.strip() for l in open(file) if l.strip()] if file else synthetic(db, n, dup)
+    webhook_inbox.start()
+    sem = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def send(body: str):
+            sig = hmac.new(SECRET.encode(), body.encode(), hashlib.sha256).hexdigest()
+            async with sem:
+                r, dt = await timed(client.post("/billing/webhook", content=body,
+                                                headers={"x-razorpay-signature": sig, "content-type": "application/json"}))
+            assert r.status_code == 200, r.text
+            return dt
+
+        t0 = time.perf_counter()
+        acks = await asyncio.gather(*[send(b) for b in bodies])
+        t_ack = time.perf_counter() - t0
+        while any(d["status"] in ("pending", "processing") for d in db.webhook_inbox.docs):
+            await asyncio.sleep(0.01)
+        t_all = time.perf_counter() - t0
+    await webhook_inbox.stop()
+
+    stored = len(db.webhook_inbox.docs)
+    print(json.dumps({
+        "sent": len(bodies), "stored": stored, "ack": summary_ms(acks),
+        "ack_throughput_rps": round(len(bodies) / t_ack, 1),
+        "processing_throughput_eps": round(stored / t_all, 1),
+        "inbox": webhook_inbox.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=5000)
+    ap.add_argument("--dup", type=float, default=0.1, help="share of events re-sent, like gateway retries")
+    ap.add_argument("--mongo-ms", type=float, default=1.0)
+    ap.add_argument("--file")
+    ap.add_argument("-c", "--concurrency", type=int, default=32)
+    a = ap.parse_args()
+    asyncio.run(run(a.n, a.dup, a.mongo_ms, a.file, a.concurrency))
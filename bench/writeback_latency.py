@@ -0,0 +1,53 @@
+"""/recommend latency with inline Mongo writes vs the write-behind queue.
+
+    python -m bench.writeback_latency --mongo-ms 5 -n 300
+"""
+import argparse, asyncio
+from bench import _fakes
+from bench._util import summary_ms, timed
+
+import httpx
+from bson import ObjectId
+from app.main import app
+from app.engine import llm_batch
+from app.plans import PLANS
+from app.security import create_token
+from app.writeback import writer
+
+
+async def run(n: int, mongo_ms: float, concurrency: int):
+    db = _fakes.install_fake_db(mongo_ms / 1e3)
+    llm_batch._llm = _fakes.FakeLLM(0.0)
+    uid = ObjectId()
+    await db.users.insert_one({"_id": uid, "email": "w@example.com"})
+    await db.subscriptions.insert_one({"userId": uid, "planId": "pro", "active": True})
+    PLANS["pro"]["monthly_quota"] = 10 * n
+    headers = {"Authorization": f"Bearer {create_token(str(uid))}"}
+    body = {"soilType": "sandy", "season": "rabi", "month": 11}
+    sem = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one():
+            async with sem:
+                r, dt = await timed(client.post("/recommend", json=body, headers=headers))
+                assert r.status_code == 200, r.text
+                return dt
+
+        await one()  # warm the enrichment cache so only Mongo writes differ
+        for label in ("inline", "write-behind"):
+            if label == "write-behind":
+                writer.start()
+            before = len(db.histories.docs)
+            lat = await asyncio.gather(*[one() for _ in range(n)])
+            await writer.stop()
+            print(f"{label:12s} {summary_ms(lat)} rows_written={len(db.histories.docs) - before}")
+    print("writer", writer.stats())
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=300)
+    ap.add_argument("--mongo-ms", type=float, default=5.0)
+    ap.add_argument("-c", "--concurrency", type=int, default=8)
+    a = ap.parse_args()
+    asyncio.run(run(a.n, a.mongo_ms, a.concurrency))